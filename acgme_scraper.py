@@ -6,10 +6,12 @@ Includes OCR fallback and robust error handling.
 """
 
 import argparse
+import json
 import logging
 import os
 import random
 import re
+import signal
 import sys
 import time
 from typing import Optional
@@ -19,17 +21,120 @@ from PIL import Image
 import pytesseract
 from playwright.sync_api import Page, sync_playwright
 
+from ocr_service import TEXT_CACHE, OcrService, find_academic_year
+from page_cache import DEFAULT_TTL, PageCache
+from rate_limiter import classify_error, site_controller
+from routing import acgme_blocker
+from schema import TABLE_FORMATS, existing_table, read_table, table_path, write_table
+from state_store import STATE_DB, StateStore, normalize_program_id
+
 ACGME_URL = "https://apps.acgme.org/ads/Public/Programs/Search"
 CSV_FILE = "freida_programs_output.csv"
 NEW_CSV_FILE = "freida_programs_output_with_academic_year.csv"
 SUCCESS_CSV_FILE = "freida_programs_output_success.csv"
 FAILED_CSV_FILE = "freida_programs_output_failed.csv"
+REPORT_URL_CACHE_FILE = "acgme_report_urls.json"
+REPORT_URL_MARKER = "/AccreditationHistoryReport?programId="
+# The search used to wait a fixed 3.5 s; results are now polled for instead
+LEGACY_SEARCH_WAIT_MS = 3500
+SEARCH_TIMEOUT_MS = 15000
+SEARCH_POLL_MS = 100
+# Extra time allowed for rendering after the search request has finished
+SEARCH_SETTLE_MS = 750
+# Requests that carry the program search (form post or results XHR)
+SEARCH_REQUEST_PATTERN = re.compile(r"/ads/Public/Programs/Search", re.IGNORECASE)
+RETRY_IDLE_TIMEOUT_MS = 2000
+
+# One round trip for everything the extraction needs from a page: the cell
+# texts of every table row and the candidate accreditation-history links
+# (with their index among all <a> elements, for clicking)
+PAGE_SNAPSHOT_JS = """() => {
+    const rows = Array.from(document.querySelectorAll('table tr')).map(
+        row => Array.from(row.querySelectorAll('td')).map(cell => cell.innerText.trim()));
+    const links = [];
+    document.querySelectorAll('a').forEach((link, index) => {
+        const text = link.innerText.trim();
+        const href = link.getAttribute('href') || '';
+        if (text === 'View Accreditation History' || href.includes('AccreditationHistoryReport')) {
+            links.push({index, text, href});
+        }
+    });
+    return {rows, links};
+}"""
+
+# Set by main() with --ocr-workers: screenshots are OCR'd in a process pool
+# while the browser moves on, instead of inline
+OCR_SERVICE: Optional[OcrService] = None
+
+SEARCH_OUTCOME_JS = """() => {
+    const links = document.querySelectorAll('a');
+    for (const link of links) {
+        const href = link.getAttribute('href') || '';
+        if (link.textContent.trim() === 'View Accreditation History'
+                || href.includes('AccreditationHistoryReport')) {
+            return 'results';
+        }
+    }
+    if (document.body && document.body.innerText.includes('No Programs found')) {
+        return 'empty';
+    }
+    return null;
+}"""
 
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s')
 
 
+class ReportUrlCache:
+    """
+    Persistent program_id -> AccreditationHistoryReport URL mapping, so later
+    runs and retries can skip the search-and-click sequence. Stored as a JSON
+    object and rewritten atomically whenever a URL is added or dropped.
+    """
+
+    def __init__(self, path: str = REPORT_URL_CACHE_FILE):
+        self.path = path
+        self._urls = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as file_obj:
+                    self._urls = json.load(file_obj)
+            except (OSError, ValueError) as err:
+                logging.warning("Ignoring unreadable report URL cache %s: %s", path, err)
+        logging.debug("Loaded %d cached report URLs from %s", len(self._urls), path)
+
+    def get(self, program_id) -> Optional[str]:
+        """
+        Returns the cached report URL for program_id, or None.
+        """
+        return self._urls.get(str(program_id))
+
+    def set(self, program_id, url: str) -> None:
+        """
+        Records the report URL for program_id.
+        """
+        if self._urls.get(str(program_id)) != url:
+            self._urls[str(program_id)] = url
+            self._save()
+
+    def discard(self, program_id) -> None:
+        """
+        Forgets the report URL for program_id (e.g. after it stopped working).
+        """
+        if self._urls.pop(str(program_id), None) is not None:
+            self._save()
+
+    def _save(self) -> None:
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file_obj:
+            json.dump(self._urls, file_obj, indent=0, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def __len__(self):
+        return len(self._urls)
+
+
 def human_like_click(page: Page, locator) -> None:
     """
     Simulates a human-like mouse click on a web element using Playwright.
@@ -50,6 +155,68 @@ def human_like_click(page: Page, locator) -> None:
         locator.click(timeout=5000, force=True)
 
 
+def is_search_request(request, program_id: str) -> bool:
+    """
+    Returns True if a finished request is the program search itself rather
+    than analytics, fonts or other assets loaded around it.
+    """
+    if request.resource_type not in ('xhr', 'fetch', 'document'):
+        return False
+    url = request.url if isinstance(request.url, str) else ''
+    post_data = request.post_data if isinstance(request.post_data, str) else ''
+    return (SEARCH_REQUEST_PATTERN.search(url) is not None or
+            str(program_id) in url or str(program_id) in post_data)
+
+
+def wait_for_search_outcome(
+    page: Page, program_id: str, timeout_ms: int = SEARCH_TIMEOUT_MS, submit=None
+) -> Optional[str]:
+    """
+    Waits until the search shows a "View Accreditation History" link ('results')
+    or the "No Programs found" message ('empty'), whichever comes first.
+    Returns None when neither appears within SEARCH_SETTLE_MS of the search
+    request finishing, or within timeout_ms, so the caller can fall back to
+    reading the page text. `submit`, when given, is called to send the search
+    once the request listener is in place.
+    """
+    started = time.monotonic()
+    request_done_at = []
+
+    def on_request_finished(request):
+        if not request_done_at and is_search_request(request, program_id):
+            request_done_at.append(time.monotonic())
+
+    page.on("requestfinished", on_request_finished)
+    outcome = None
+    try:
+        if submit is not None:
+            submit()
+        for _ in range(max(1, timeout_ms // SEARCH_POLL_MS)):
+            try:
+                state = page.evaluate(SEARCH_OUTCOME_JS)
+            except Exception as err:
+                # The search may navigate, which destroys the execution context
+                logging.debug("Search outcome check failed for %s: %s", program_id, err)
+                state = None
+            if state in ('results', 'empty'):
+                outcome = state
+                break
+            if state is not None:
+                logging.debug("Unexpected search outcome %r for %s", state, program_id)
+                break
+            if request_done_at and \
+                    time.monotonic() - request_done_at[0] >= SEARCH_SETTLE_MS / 1000:
+                break
+            page.wait_for_timeout(SEARCH_POLL_MS)
+    finally:
+        page.remove_listener("requestfinished", on_request_finished)
+    elapsed_ms = (time.monotonic() - started) * 1000
+    logging.info(
+        "Search for %s settled as %s in %.0f ms (%.0f ms saved vs fixed wait)",
+        program_id, outcome or 'unknown', elapsed_ms, LEGACY_SEARCH_WAIT_MS - elapsed_ms)
+    return outcome
+
+
 def extract_year_from_image(image_path: str) -> Optional[str]:
     """
     Uses OCR to extract the academic year from a screenshot image.
@@ -58,11 +225,10 @@ def extract_year_from_image(image_path: str) -> Optional[str]:
     try:
         text = pytesseract.image_to_string(Image.open(image_path))
         logging.debug("OCR text from %s:\n%s", image_path, text)
-        matches = re.findall(r'\b(20\d{2} - 20\d{2})\b', text)
-        for match in matches:
-            if match and match != '-':
-                logging.debug("Extracted academic year from OCR: %s", match)
-                return match
+        year = find_academic_year(text)
+        if year:
+            logging.debug("Extracted academic year from OCR: %s", year)
+            return year
         logging.warning(
             "No valid academic year found in OCR text for %s",
             image_path)
@@ -72,6 +238,126 @@ def extract_year_from_image(image_path: str) -> Optional[str]:
         return None
 
 
+def ocr_screenshot(
+    program_id: str, screenshot_path: str, image_bytes: Optional[bytes] = None
+) -> Optional[str]:
+    """
+    OCRs a saved screenshot. When OCR_SERVICE is set the image is queued for
+    the worker pool instead and None is returned; the result is reconciled
+    later by the caller's run loop.
+    """
+    if not (screenshot_path and os.path.exists(screenshot_path)):
+        return None
+    if OCR_SERVICE is not None:
+        if not isinstance(image_bytes, bytes):
+            with open(screenshot_path, "rb") as file_obj:
+                image_bytes = file_obj.read()
+        OCR_SERVICE.submit(normalize_program_id(program_id), image_bytes)
+        return None
+    return extract_year_from_image(screenshot_path)
+
+
+def ocr_pending(program_id: str) -> bool:
+    """
+    Returns True if a screenshot of program_id is queued on OCR_SERVICE and
+    its result has not been collected yet.
+    """
+    return OCR_SERVICE is not None and OCR_SERVICE.has_pending(normalize_program_id(program_id))
+
+
+def table_screenshot_ocr(page: Page, program_id: str):
+    """
+    Screenshots just the accreditation table into memory and OCRs it through
+    the text cache (or queues it on OCR_SERVICE). Returns (attempted, year);
+    attempted is False when there is no table to capture.
+    """
+    try:
+        table = page.locator('table')
+        if table.count() == 0:
+            return False, None
+        image_bytes = table.first.screenshot(timeout=5000)
+    except Exception as err:
+        logging.debug("Could not capture table for %s: %s", program_id, err)
+        return False, None
+    if not isinstance(image_bytes, bytes) or not image_bytes:
+        return False, None
+    if OCR_SERVICE is not None:
+        OCR_SERVICE.submit(normalize_program_id(program_id), image_bytes)
+        return True, None
+    year = TEXT_CACHE.year(image_bytes)
+    logging.debug(
+        "Table OCR for %s: %s (cache %d hits, %d misses)",
+        program_id, year, TEXT_CACHE.hits, TEXT_CACHE.misses)
+    return True, year
+
+
+def screenshot_and_ocr(page: Page, program_id: str) -> Optional[str]:
+    """
+    OCRs the accreditation table from an in-memory element screenshot; when
+    there is no table, or it yields no year, saves a full-page debug
+    screenshot and OCRs that instead (see ocr_screenshot).
+    """
+    attempted, year = table_screenshot_ocr(page, program_id)
+    if year or (attempted and OCR_SERVICE is not None):
+        return year
+    screenshot_path = f"debug_acgme_{program_id}.png"
+    try:
+        image_bytes = page.screenshot(path=screenshot_path, full_page=True)
+        logging.debug("Saved screenshot to %s", screenshot_path)
+    except Exception as ss_err:
+        logging.error(
+            "Could not save screenshot for %s: %s",
+            program_id,
+            ss_err)
+        return None
+    return ocr_screenshot(program_id, screenshot_path, image_bytes)
+
+
+def snapshot_page(page: Page) -> Optional[dict]:
+    """
+    Returns {'rows': [[cell text, ...], ...], 'links': [{'index', 'text',
+    'href'}, ...]} for the current page in a single page.evaluate call, or
+    None if the page could not be evaluated.
+    """
+    started = time.perf_counter()
+    try:
+        snapshot = page.evaluate(PAGE_SNAPSHOT_JS)
+    except Exception as err:
+        logging.debug("Page snapshot failed: %s", err)
+        return None
+    if not isinstance(snapshot, dict):
+        return None
+    logging.debug(
+        "Page snapshot: %d rows, %d history links in %.1f ms",
+        len(snapshot.get('rows', [])), len(snapshot.get('links', [])),
+        (time.perf_counter() - started) * 1000)
+    return snapshot
+
+
+def table_rows_by_element(page: Page) -> list:
+    """
+    Reads the cell texts of every table row element by element (one round
+    trip per row and cell). Used when snapshot_page is unavailable, and as
+    the baseline in bench_acgme_dom.py.
+    """
+    return [
+        [cell.inner_text().strip() for cell in row.query_selector_all('td')]
+        for row in page.query_selector_all('table tr')]
+
+
+def history_links_by_element(page: Page) -> list:
+    """
+    Element-by-element counterpart of the snapshot's history links.
+    """
+    links = []
+    for index, anchor in enumerate(page.query_selector_all('a')):
+        text = anchor.inner_text().strip() if anchor else ''
+        href = (anchor.get_attribute('href') if anchor else '') or ''
+        if text == 'View Accreditation History' or 'AccreditationHistoryReport' in href:
+            links.append({'index': index, 'text': text, 'href': href})
+    return links
+
+
 def extract_academic_year_from_table(
     page: Page, program_id: str, screenshot_path: Optional[str] = None
 ) -> Optional[str]:
@@ -81,16 +367,17 @@ def extract_academic_year_from_table(
     """
     try:
         page.wait_for_selector('table', timeout=30000)
-        rows = page.query_selector_all('table tr')
+        snapshot = snapshot_page(page)
+        rows = snapshot['rows'] if snapshot is not None else table_rows_by_element(page)
         logging.debug(
             "Found %d rows in accreditation table for %s",
             len(rows),
             program_id)
         if len(rows) > 1:
             for i in range(1, len(rows)):
-                cells = rows[i].query_selector_all('td')
+                cells = rows[i]
                 if cells:
-                    year = cells[0].inner_text().strip()
+                    year = cells[0]
                     if year and year != '-':
                         logging.debug("Extracted academic year: %s", year)
                         return year
@@ -100,75 +387,71 @@ def extract_academic_year_from_table(
                         i,
                         program_id)
             logging.error("No valid academic year found for %s", program_id)
-            screenshot_path = f"debug_acgme_{program_id}.png"
-            try:
-                page.screenshot(path=screenshot_path, full_page=True)
-                logging.debug("Saved screenshot to %s", screenshot_path)
-            except Exception as ss_err:
-                logging.error(
-                    "Could not save screenshot for %s: %s",
-                    program_id,
-                    ss_err)
-                screenshot_path = None
-            if screenshot_path and os.path.exists(screenshot_path):
-                ocr_year = extract_year_from_image(screenshot_path)
-                if ocr_year:
-                    return ocr_year
-            return None
+            return screenshot_and_ocr(page, program_id)
         logging.error("No data rows found in table for %s", program_id)
-        screenshot_path = f"debug_acgme_{program_id}.png"
-        try:
-            page.screenshot(path=screenshot_path, full_page=True)
-            logging.debug("Saved screenshot to %s", screenshot_path)
-        except Exception as ss_err:
-            logging.error(
-                "Could not save screenshot for %s: %s",
-                program_id,
-                ss_err)
-            screenshot_path = None
-        if screenshot_path and os.path.exists(screenshot_path):
-            ocr_year = extract_year_from_image(screenshot_path)
-            if ocr_year:
-                return ocr_year
-        return None
+        return screenshot_and_ocr(page, program_id)
     except Exception as err:
         logging.error(
             "Exception in extract_academic_year_from_table for %s: %s",
             program_id,
             err)
-        screenshot_path = f"debug_acgme_{program_id}.png"
-        try:
-            page.screenshot(path=screenshot_path, full_page=True)
-            logging.debug("Saved screenshot to %s", screenshot_path)
-        except Exception as ss_err:
-            logging.error(
-                "Could not save screenshot for %s: %s",
-                program_id,
-                ss_err)
-            screenshot_path = None
-        if screenshot_path and os.path.exists(screenshot_path):
-            ocr_year = extract_year_from_image(screenshot_path)
-            if ocr_year:
-                return ocr_year
-        return None
+        return screenshot_and_ocr(page, program_id)
 
 
-def get_first_academic_year(page: Page, program_id: str) -> Optional[str]:
+def get_first_academic_year(
+    page: Page, program_id: str, url_cache: Optional[ReportUrlCache] = None
+) -> Optional[str]:
     """
     Navigates to the ACGME program page and attempts to extract the first academic year.
+    With a url_cache, a known report URL is opened directly and the search is
+    only used when it is missing or fails; newly reached report URLs are cached.
+    """
+    if url_cache is not None:
+        cached_url = url_cache.get(program_id)
+        if cached_url:
+            logging.debug("Opening cached report URL for %s: %s", program_id, cached_url)
+            try:
+                page.goto(cached_url, timeout=30000)
+                year = extract_academic_year_from_table(page, program_id, None)
+            except Exception as err:
+                logging.warning("Cached report URL failed for %s: %s", program_id, err)
+                year = None
+            if year:
+                return year
+            if ocr_pending(program_id):
+                # The cached report page was screenshotted for OCR; its year comes later
+                logging.debug("Cached report URL for %s is queued for OCR", program_id)
+                return None
+            logging.info("Cached report URL gave no year for %s; searching again", program_id)
+            url_cache.discard(program_id)
+    year = search_first_academic_year(page, program_id)
+    if url_cache is not None:
+        current_url = page.url
+        if isinstance(current_url, str) and REPORT_URL_MARKER in current_url:
+            url_cache.set(program_id, current_url)
+    return year
+
+
+def search_first_academic_year(page: Page, program_id: str) -> Optional[str]:
+    """
+    Searches ACGME for the program and follows "View Accreditation History"
+    to extract the first academic year.
     Uses multiple fallback strategies for robustness.
     """
     logging.debug("Navigating to %s for program_id=%s", ACGME_URL, program_id)
     page.goto(ACGME_URL)
     page.fill('input[type="text"]', str(program_id))
-    page.press('input[type="text"]', 'Enter')
-    page.wait_for_timeout(3500)
-    body_text = page.inner_text('body')
-    logging.debug("Body text after search: %s", body_text[:200])
-    if "No Programs found" in body_text:
+    outcome = wait_for_search_outcome(
+        page, program_id, submit=lambda: page.press('input[type="text"]', 'Enter'))
+    if outcome == 'empty':
         logging.debug("No results for %s", program_id)
         return None
-    screenshot_path = None
+    if outcome is None:
+        body_text = page.inner_text('body')
+        logging.debug("Body text after search: %s", body_text[:200])
+        if "No Programs found" in body_text:
+            logging.debug("No results for %s", program_id)
+            return None
     try:
         locator = page.locator('text="View Accreditation History"').first
         locator.wait_for(state="attached", timeout=5000)
@@ -185,26 +468,15 @@ def get_first_academic_year(page: Page, program_id: str) -> Optional[str]:
                 "Click by text locator failed for %s: %s",
                 program_id,
                 click_err)
-            if "/AccreditationHistoryReport?programId=" in page.url:
+            if REPORT_URL_MARKER in page.url:
                 logging.debug(
                     "Already navigated to Accreditation History page for %s, continuing extraction.",
                     program_id,
                 )
                 return extract_academic_year_from_table(page, program_id, None)
-            screenshot_path = f"debug_acgme_{program_id}.png"
-            try:
-                page.screenshot(path=screenshot_path, full_page=True)
-                logging.debug("Saved screenshot to %s", screenshot_path)
-            except Exception as ss_err:
-                logging.error(
-                    "Could not save screenshot for %s: %s",
-                    program_id,
-                    ss_err)
-                screenshot_path = None
-            if screenshot_path and os.path.exists(screenshot_path):
-                ocr_year = extract_year_from_image(screenshot_path)
-                if ocr_year:
-                    return ocr_year
+            ocr_year = screenshot_and_ocr(page, program_id)
+            if ocr_year:
+                return ocr_year
             try:
                 btn_locator = page.locator(
                     'a.btn.btn-primary:has-text("View Accreditation History")'
@@ -222,49 +494,35 @@ def get_first_academic_year(page: Page, program_id: str) -> Optional[str]:
                     "Click by class+text failed for %s: %s",
                     program_id,
                     btn_err)
-                if "/AccreditationHistoryReport?programId=" in page.url:
+                if REPORT_URL_MARKER in page.url:
                     logging.debug(
                         "Already navigated to Accreditation History page for %s, continuing extraction.",
                         program_id,
                     )
                     return extract_academic_year_from_table(
                         page, program_id, None)
-                screenshot_path = f"debug_acgme_{program_id}.png"
-                try:
-                    page.screenshot(path=screenshot_path, full_page=True)
-                    logging.debug("Saved screenshot to %s", screenshot_path)
-                except Exception as ss_err:
-                    logging.error(
-                        "Could not save screenshot for %s: %s",
-                        program_id,
-                        ss_err)
-                    screenshot_path = None
-                if screenshot_path and os.path.exists(screenshot_path):
-                    ocr_year = extract_year_from_image(screenshot_path)
-                    if ocr_year:
-                        return ocr_year
+                ocr_year = screenshot_and_ocr(page, program_id)
+                if ocr_year:
+                    return ocr_year
                 try:
-                    anchors = page.query_selector_all('a')
+                    snapshot = snapshot_page(page)
+                    links = snapshot['links'] if snapshot is not None \
+                        else history_links_by_element(page)
                     found = False
-                    for anchor in anchors:
-                        anchor_text = anchor.inner_text().strip() if anchor else ''
-                        anchor_href = anchor.get_attribute(
-                            'href') if anchor else ''
-                        if (anchor_text == 'View Accreditation History' or (
-                                anchor_href and 'AccreditationHistoryReport' in anchor_href)):
-                            logging.debug(
-                                "Fallback: found <a> with text/href for %s, trying human-like click...",
-                                program_id,
-                            )
-                            anchor.scroll_into_view_if_needed()
-                            with page.expect_navigation(timeout=30000):
-                                human_like_click(page, anchor)
-                            found = True
-                            logging.debug(
-                                "Clicked 'View Accreditation History' for %s (by <a> parse, human-like)",
-                                program_id,
-                            )
-                            break
+                    if links:
+                        logging.debug(
+                            "Fallback: found <a> with text/href for %s, trying human-like click...",
+                            program_id,
+                        )
+                        anchor = page.locator('a').nth(links[0]['index'])
+                        anchor.scroll_into_view_if_needed()
+                        with page.expect_navigation(timeout=30000):
+                            human_like_click(page, anchor)
+                        found = True
+                        logging.debug(
+                            "Clicked 'View Accreditation History' for %s (by <a> parse, human-like)",
+                            program_id,
+                        )
                     if not found:
                         logging.warning(
                             "No <a> tag found for fallback click for %s", program_id)
@@ -289,26 +547,16 @@ def get_first_academic_year(page: Page, program_id: str) -> Optional[str]:
                         "Fallback <a> parse/click failed for %s: %s",
                         program_id,
                         anchor_err)
-                    if "/AccreditationHistoryReport?programId=" in page.url:
+                    if REPORT_URL_MARKER in page.url:
                         logging.debug(
                             "Already navigated to Accreditation History page for %s, continuing extraction.",
                             program_id,
                         )
                         return extract_academic_year_from_table(
                             page, program_id, None)
-                    screenshot_path = f"debug_acgme_{program_id}.png"
-                    try:
-                        page.screenshot(path=screenshot_path, full_page=True)
-                        logging.debug(
-                            "Saved screenshot to %s", screenshot_path)
-                    except Exception as ss_err:
-                        logging.error(
-                            "Could not save screenshot for %s: %s", program_id, ss_err)
-                        screenshot_path = None
-                    if screenshot_path and os.path.exists(screenshot_path):
-                        ocr_year = extract_year_from_image(screenshot_path)
-                        if ocr_year:
-                            return ocr_year
+                    ocr_year = screenshot_and_ocr(page, program_id)
+                    if ocr_year:
+                        return ocr_year
                     return None
         year = extract_academic_year_from_table(page, program_id, None)
         if year is not None:
@@ -343,30 +591,72 @@ def get_first_academic_year(page: Page, program_id: str) -> Optional[str]:
                 "Could not save debug HTML for %s: %s",
                 program_id,
                 inner_err)
-        screenshot_path = f"debug_acgme_{program_id}.png"
-        if os.path.exists(screenshot_path):
-            ocr_year = extract_year_from_image(screenshot_path)
-            if ocr_year:
-                return ocr_year
+        return ocr_screenshot(program_id, f"debug_acgme_{program_id}.png")
+
+
+def block_signal(page: Page) -> Optional[str]:
+    """
+    Returns a description of the page if its title marks it as a block or
+    rate-limit page (403/429, "access denied", captcha), else None.
+    """
+    try:
+        title = page.title()
+    except Exception as err:
+        logging.debug("Could not read page title: %s", err)
+        return None
+    if isinstance(title, str) and classify_error(title) == 'blocked':
+        return f"blocked page: {title}"
+    return None
+
+
+def lookup_failure(program_id: str, year: Optional[str], errors: list) -> Optional[str]:
+    """
+    Returns the error to report to the rate controller for one ACGME lookup:
+    None if a year was found (or is pending OCR), the last block or timeout
+    signal seen by the retries, or a generic failure.
+    """
+    if year or ocr_pending(program_id):
         return None
+    return errors[-1] if errors else "no academic year found"
 
 
 def get_first_academic_year_with_retry(
-    page: Page, program_id: str, max_retries: int = 3
+    page: Page, program_id: str, max_retries: int = 3,
+    url_cache: Optional[ReportUrlCache] = None, errors: Optional[list] = None
 ) -> Optional[str]:
     """
     Retries extraction of the first academic year up to max_retries times.
+    Stops early, returning None, once a screenshot of the program is queued
+    for background OCR; its year is filled in when the OCR results are
+    collected (see record_ocr_years).
+    Exceptions and block pages seen by failed attempts are appended to
+    `errors`, when given, so the caller can report them to the rate controller.
     """
     for attempt in range(1, max_retries + 1):
         logging.debug("Attempt %d for program_id=%s", attempt, program_id)
-        year = get_first_academic_year(page, program_id)
+        try:
+            year = get_first_academic_year(page, program_id, url_cache=url_cache)
+            failure = None if year else block_signal(page)
+        except Exception as err:
+            logging.warning("Attempt %d for %s failed: %s", attempt, program_id, err)
+            year = None
+            failure = str(err)
         if year:
             return year
+        if failure and errors is not None:
+            errors.append(failure)
+        if ocr_pending(program_id):
+            logging.info(
+                "Academic year for %s is pending background OCR; not retrying", program_id)
+            return None
         if attempt < max_retries:
             logging.debug(
                 "Retrying program_id=%s after failure...",
                 program_id)
-            time.sleep(2)
+            try:
+                page.wait_for_load_state("networkidle", timeout=RETRY_IDLE_TIMEOUT_MS)
+            except Exception as err:
+                logging.debug("Page did not go idle before retry: %s", err)
     logging.error(
         "All %d attempts failed for program_id=%s",
         max_retries,
@@ -374,10 +664,145 @@ def get_first_academic_year_with_retry(
     return None
 
 
+def program_id_keys(*columns: pd.Series) -> list:
+    """
+    Returns join keys for program_id columns: nullable Int64 when every ID is
+    numeric, otherwise stripped strings (with pandas' '.0' float suffix removed).
+    All columns get the same key type so they can be matched directly.
+    """
+    numeric = [pd.to_numeric(column, errors='coerce') for column in columns]
+    if all(keys.notna().all() and (keys % 1 == 0).all() for keys in numeric):
+        return [keys.astype('Int64') for keys in numeric]
+    return [
+        column.astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
+        for column in columns]
+
+
+def merge_academic_years(target_df: pd.DataFrame, results_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Copies non-blank acgme_first_academic_year values from results_df into
+    target_df with a single keyed lookup on program_id. Rows of target_df
+    without a new year keep their current value. Returns target_df.
+    """
+    column = 'acgme_first_academic_year'
+    if column not in target_df.columns:
+        target_df[column] = None
+    years = results_df[column]
+    found = years.notna() & (years.astype(str).str.strip() != '')
+    target_keys, result_keys = program_id_keys(
+        target_df['program_id'], results_df.loc[found, 'program_id'])
+    updates = pd.Series(years[found].to_numpy(), index=result_keys.to_numpy())
+    updates = updates[~updates.index.duplicated(keep='last')]
+    new_years = target_keys.map(updates)
+    matched = new_years.notna().to_numpy()
+    target_df[column] = target_df[column].astype(object)
+    target_df.loc[matched, column] = new_years[matched].to_numpy()
+    return target_df
+
+
+def load_store_work(
+    store: StateStore, failed_only: bool = False, failed_record: Optional[str] = None,
+    fmt: str = 'csv'
+) -> pd.DataFrame:
+    """
+    Returns the programs still needing an ACGME year from the state store,
+    importing the current output table (in format fmt, or the other format if
+    only that exists) first if the store is empty.
+    """
+    if store.counts()['total'] == 0:
+        source = existing_table(table_path(NEW_CSV_FILE, fmt))
+        if not os.path.exists(source):
+            source = existing_table(table_path(CSV_FILE, fmt))
+        store.import_csv(source)
+    if failed_record:
+        id_list = [x.strip() for x in failed_record.split(',') if x.strip()]
+        ids = store.acgme_ids(('failed', 'pending'), id_list)
+    elif failed_only:
+        ids = store.acgme_ids(('failed',))
+    else:
+        ids = store.acgme_ids(('pending', 'failed'))
+    logging.info("Found %d records to process in %s", len(ids), store.path)
+    return pd.DataFrame({'program_id': ids})
+
+
+def record_ocr_years(store: Optional[StateStore], results: dict) -> dict:
+    """
+    Records years found by deferred OCR jobs in the store (without counting
+    another attempt) and returns {program_id: year} for the ones found.
+    """
+    found = {pid: year for pid, year in results.items() if year}
+    if store is not None:
+        for program_id, year in found.items():
+            store.set_acgme_result(program_id, year, count_attempt=False)
+    if found:
+        logging.info("Deferred OCR found years for %d programs: %s", len(found), found)
+    return found
+
+
+def run_worker(
+    context, store: StateStore, max_attempts: int = 3, max_records: Optional[int] = None,
+    url_cache: Optional[ReportUrlCache] = None
+) -> int:
+    """
+    Long-running worker: keeps one browser context alive and pulls program IDs
+    from the state store until none are left (each program gets up to
+    max_attempts runs), max_records have been processed, or SIGTERM/SIGINT
+    arrives. Each result is persisted as soon as it is known.
+    Returns the number of programs processed.
+    """
+    stop = {'requested': False}
+
+    def request_stop(signum, _frame):
+        logging.info("Received signal %d; finishing current program", signum)
+        stop['requested'] = True
+
+    previous_handlers = {
+        sig: signal.signal(sig, request_stop) for sig in (signal.SIGTERM, signal.SIGINT)}
+    page = context.new_page()
+    controller = site_controller('acgme')
+    processed = 0
+    try:
+        while not stop['requested']:
+            if max_records is not None and processed >= max_records:
+                logging.info("Reached --max-records=%d; stopping", max_records)
+                break
+            program_id = store.next_acgme_id(max_attempts)
+            if program_id is None:
+                logging.info("Work queue is empty; stopping")
+                break
+            if page.is_closed():
+                logging.warning("Page was closed; opening a new one")
+                page = context.new_page()
+            logging.info("Processing %s (%d done this run)...", program_id, processed)
+            controller.wait()
+            started = time.monotonic()
+            errors = []
+            year = get_first_academic_year_with_retry(
+                page, program_id, max_retries=1, url_cache=url_cache, errors=errors)
+            controller.record(
+                time.monotonic() - started, lookup_failure(program_id, year, errors))
+            store.set_acgme_result(program_id, year)
+            processed += 1
+            if OCR_SERVICE is not None:
+                record_ocr_years(store, OCR_SERVICE.completed())
+    finally:
+        for sig, handler in previous_handlers.items():
+            signal.signal(sig, handler)
+    if OCR_SERVICE is not None:
+        record_ocr_years(store, OCR_SERVICE.drain())
+    controller.log_summary()
+    counts = store.counts()
+    logging.info(
+        "Worker processed %d programs: %d done, %d failed, %d pending of %d",
+        processed, counts['done'], counts['failed'], counts['pending'], counts['total'])
+    return processed
+
+
 def main() -> None:
     """
     Main entry point for the script. Handles CLI arguments and orchestrates extraction.
     """
+    global OCR_SERVICE
     parser = argparse.ArgumentParser(
         description='Scrape ACGME academic years for programs. Supports retrying failed records and OCR fallback.')
     parser.add_argument(
@@ -390,17 +815,107 @@ def main() -> None:
         type=str,
         help='Comma-separated list of program_ids to retry from output CSV (e.g., --failed-record 1405621446,1400500932). Overrides --failed-only if set.'
     )
+    parser.add_argument(
+        '--no-block-resources',
+        action='store_true',
+        help='Let the browser load images, fonts and third-party requests.'
+    )
+    parser.add_argument(
+        '--state-db',
+        help='Read work from and record each result in this SQLite state store instead of rewriting the CSVs (see state_store.py export).'
+    )
+    parser.add_argument(
+        '--report-url-cache',
+        default=REPORT_URL_CACHE_FILE,
+        help='JSON file of known AccreditationHistoryReport URLs per program_id (empty string to disable).'
+    )
+    parser.add_argument(
+        '--cache-dir',
+        help='Serve and store ACGME pages in this on-disk cache (see page_cache.py).'
+    )
+    parser.add_argument(
+        '--cache-ttl',
+        type=float,
+        default=DEFAULT_TTL,
+        help='Seconds a cached page is used without revalidation (default: one day).'
+    )
+    parser.add_argument(
+        '--ocr-workers',
+        type=int,
+        default=0,
+        help='Run screenshot OCR in this many background processes (e.g. the number of cores) and reconcile the results at the end; 0 runs OCR inline.'
+    )
+    parser.add_argument(
+        '--format',
+        choices=TABLE_FORMATS,
+        default='csv',
+        help='Read and write the stage files as CSV or as typed Parquet (needs pyarrow).'
+    )
+    parser.add_argument(
+        '--daemon',
+        action='store_true',
+        help='Keep one browser open and work through every pending program in the state store (default pipeline_state.db) until none are left.'
+    )
+    parser.add_argument(
+        '--max-attempts',
+        type=int,
+        default=3,
+        help='In --daemon mode, how many times a program is tried before it is left as failed.'
+    )
+    parser.add_argument(
+        '--max-records',
+        type=int,
+        help='In --daemon mode, stop after this many programs.'
+    )
     args = parser.parse_args()
 
     logging.info("Starting script. Current working dir: %s", os.getcwd())
-    if args.failed_record:
-        if not os.path.exists(FAILED_CSV_FILE):
+    csv_file, new_csv_file, success_csv_file, failed_csv_file = (
+        table_path(path, args.format)
+        for path in (CSV_FILE, NEW_CSV_FILE, SUCCESS_CSV_FILE, FAILED_CSV_FILE))
+    url_cache = ReportUrlCache(args.report_url_cache) if args.report_url_cache else None
+    page_cache = PageCache(args.cache_dir, args.cache_ttl) if args.cache_dir else None
+    if args.daemon:
+        with StateStore(args.state_db or STATE_DB) as store:
+            load_store_work(store, fmt=args.format)
+            if args.ocr_workers > 0:
+                OCR_SERVICE = OcrService(args.ocr_workers)
+            with sync_playwright() as playwright:
+                browser = playwright.chromium.launch(headless=False)
+                context = browser.new_context()
+                if page_cache:
+                    page_cache.install(context)
+                blocker = None if args.no_block_resources else acgme_blocker()
+                if blocker:
+                    blocker.install(context)
+                run_worker(
+                    context, store, args.max_attempts, args.max_records, url_cache)
+                browser.close()
+                if blocker:
+                    blocker.log_summary()
+                if page_cache:
+                    page_cache.log_summary()
+            if OCR_SERVICE is not None:
+                OCR_SERVICE.close()
+        logging.info("Script finished.")
+        return
+    store = StateStore(args.state_db) if args.state_db else None
+    if store:
+        process_df = load_store_work(
+            store, args.failed_only, args.failed_record, args.format)
+        if len(process_df) == 0:
+            logging.info("No matching records to process. Exiting.")
+            store.close()
+            return
+        output_file = None
+    elif args.failed_record:
+        if not os.path.exists(failed_csv_file):
             logging.error(
                 "Failed CSV file '%s' not found for --failed-record.",
-                FAILED_CSV_FILE)
+                failed_csv_file)
             sys.exit(1)
-        df_failed = pd.read_csv(FAILED_CSV_FILE)
-        logging.info("Read %d rows from %s", len(df_failed), FAILED_CSV_FILE)
+        df_failed = read_table(failed_csv_file)
+        logging.info("Read %d rows from %s", len(df_failed), failed_csv_file)
         id_list = [x.strip()
                    for x in args.failed_record.split(',') if x.strip()]
         failed_df = df_failed[df_failed['program_id'].astype(
@@ -413,27 +928,32 @@ def main() -> None:
             logging.info("No matching records to process. Exiting.")
             return
         process_df = failed_df.copy()
-        output_file = FAILED_CSV_FILE
-    elif args.failed_only and os.path.exists(FAILED_CSV_FILE):
-        df_failed = pd.read_csv(FAILED_CSV_FILE)
-        logging.info("Read %d rows from %s", len(df_failed), FAILED_CSV_FILE)
+        output_file = failed_csv_file
+    elif args.failed_only and os.path.exists(failed_csv_file):
+        df_failed = read_table(failed_csv_file)
+        logging.info("Read %d rows from %s", len(df_failed), failed_csv_file)
         process_df = df_failed.copy()
-        output_file = FAILED_CSV_FILE
+        output_file = failed_csv_file
     else:
-        df_main = pd.read_csv(NEW_CSV_FILE) if os.path.exists(
-            NEW_CSV_FILE) else pd.read_csv(CSV_FILE)
-        logging.info(
-            "Read %d rows from %s", len(df_main),
-            'freida_programs_output_with_academic_year.csv' if os.path.exists(NEW_CSV_FILE) else 'freida_programs_output.csv'
-        )
+        source = new_csv_file if os.path.exists(new_csv_file) else existing_table(csv_file)
+        df_main = read_table(source)
+        logging.info("Read %d rows from %s", len(df_main), source)
         process_df = df_main[df_main['acgme_first_academic_year'].isnull() | (
             df_main['acgme_first_academic_year'].astype(str).str.strip() == '')].copy()
-        output_file = NEW_CSV_FILE
+        output_file = new_csv_file
 
+    if args.ocr_workers > 0:
+        OCR_SERVICE = OcrService(args.ocr_workers)
     academic_years = []
+    controller = site_controller('acgme')
     with sync_playwright() as playwright:
         browser = playwright.chromium.launch(headless=False)
         context = browser.new_context()
+        if page_cache:
+            page_cache.install(context)
+        blocker = None if args.no_block_resources else acgme_blocker()
+        if blocker:
+            blocker.install(context)
         page = context.new_page()
         if args.failed_record:
             iter_df = process_df
@@ -453,53 +973,61 @@ def main() -> None:
                 program_id,
                 idx + 1,
                 len(iter_df))
-            try:
-                year = get_first_academic_year_with_retry(
-                    page, program_id, max_retries=3)
-            except Exception as err:
-                logging.error(
-                    "Exception in get_first_academic_year_with_retry: %s", err)
-                year = None
+            controller.wait()
+            started = time.monotonic()
+            errors = []
+            year = get_first_academic_year_with_retry(
+                page, program_id, max_retries=3, url_cache=url_cache, errors=errors)
+            controller.record(
+                time.monotonic() - started, lookup_failure(program_id, year, errors))
             academic_years.append(year)
-            time.sleep(1.5)
+            if store:
+                store.set_acgme_result(program_id, year)
         browser.close()
+        if blocker:
+            blocker.log_summary()
+        if page_cache:
+            page_cache.log_summary()
+        controller.log_summary()
+    if OCR_SERVICE is not None:
+        ocr_years = record_ocr_years(store, OCR_SERVICE.drain())
+        OCR_SERVICE.close()
+        academic_years = [
+            year or ocr_years.get(normalize_program_id(program_id))
+            for program_id, year in zip(iter_df['program_id'], academic_years)]
     logging.info("Academic years collected: %s", academic_years)
+    if store:
+        counts = store.counts()
+        store.close()
+        logging.info(
+            "State store %s: %d done, %d failed, %d pending of %d",
+            args.state_db, counts['done'], counts['failed'], counts['pending'], counts['total'])
+        logging.info("Script finished.")
+        return
     iter_df = iter_df.copy()
     if 'acgme_first_academic_year' in iter_df.columns:
         iter_df = iter_df.drop(columns=['acgme_first_academic_year'])
     iter_df.insert(0, 'acgme_first_academic_year', academic_years)
-    if output_file == FAILED_CSV_FILE:
-        if os.path.exists(NEW_CSV_FILE):
-            main_df = pd.read_csv(NEW_CSV_FILE)
-            for _, row in iter_df.iterrows():
-                pid = row['program_id']
-                year = row['acgme_first_academic_year'] if 'acgme_first_academic_year' in row else None
-                if year and str(year).strip():
-                    main_df.loc[main_df['program_id'] == pid,
-                                'acgme_first_academic_year'] = year
-            main_df.to_csv(NEW_CSV_FILE, index=False)
+    if output_file == failed_csv_file:
+        if os.path.exists(new_csv_file):
+            main_df = merge_academic_years(read_table(new_csv_file), iter_df)
+            write_table(main_df, new_csv_file)
             df_full = main_df
         else:
             df_full = iter_df
     else:
-        full_df = pd.read_csv(output_file)
-        for _, row in iter_df.iterrows():
-            pid = row['program_id']
-            year = row['acgme_first_academic_year'] if 'acgme_first_academic_year' in row else None
-            if year and str(year).strip():
-                full_df.loc[full_df['program_id'] == pid,
-                            'acgme_first_academic_year'] = year
-        full_df.to_csv(output_file, index=False)
+        full_df = merge_academic_years(read_table(output_file), iter_df)
+        write_table(full_df, output_file)
         df_full = full_df
     success_df = df_full[df_full['acgme_first_academic_year'].notnull() & (
         df_full['acgme_first_academic_year'].astype(str).str.strip() != '')]
     failed_df = df_full[df_full['acgme_first_academic_year'].isnull() | (
         df_full['acgme_first_academic_year'].astype(str).str.strip() == '')]
-    success_df.to_csv(SUCCESS_CSV_FILE, index=False)
-    failed_df.to_csv(FAILED_CSV_FILE, index=False)
+    write_table(success_df, success_csv_file)
+    write_table(failed_df, failed_csv_file)
     logging.info(
         "Wrote %d good records to %s and %d failed records to %s",
-        len(success_df), SUCCESS_CSV_FILE, len(failed_df), FAILED_CSV_FILE
+        len(success_df), success_csv_file, len(failed_df), failed_csv_file
     )
     logging.info("Script finished.")
 
@@ -0,0 +1,84 @@
+"""
+bench_acgme_dom.py
+
+Latency benchmark of the single page.evaluate snapshot against the original
+element-by-element reads (query_selector_all + inner_text/get_attribute per
+row, cell and anchor) used on ACGME pages. Needs a Playwright Chromium.
+
+Usage:
+    python bench_acgme_dom.py                 # synthetic accreditation history page
+    python bench_acgme_dom.py report.html ... # saved pages (e.g. page.content() dumps)
+"""
+
+import statistics
+import sys
+import time
+
+from playwright.sync_api import sync_playwright
+
+import acgme_scraper
+
+
+def build_synthetic_page(rows=40, links=60):
+    """
+    Builds a page shaped like an ACGME accreditation history report: a table
+    of academic years and a page full of navigation links.
+    """
+    table_rows = ''.join(
+        f'<tr><td>{2024 - n} - {2025 - n}</td><td>Continued Accreditation</td>'
+        f'<td>Resident Complement: {n}</td><td>-</td></tr>'
+        for n in range(rows))
+    anchors = ''.join(f'<a href="/ads/Public/Page{n}">Link {n}</a>' for n in range(links))
+    return (
+        f'<html><body><nav>{anchors}</nav>'
+        '<a class="btn btn-primary" href="/ads/Public/Reports/AccreditationHistoryReport'
+        '?programId=1">View Accreditation History</a>'
+        '<table><tr><th>Academic Year</th><th>Status</th><th>Notes</th><th>-</th></tr>'
+        f'{table_rows}</table></body></html>')
+
+
+def time_call(func, repeat):
+    """
+    Returns the median latency of func() in milliseconds.
+    """
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def run_benchmark(pages, repeat=20):
+    """
+    Loads each page into Chromium and prints the median latency of both
+    extraction paths and the speed-up.
+    """
+    with sync_playwright() as playwright:
+        browser = playwright.chromium.launch(headless=True)
+        page = browser.new_page()
+        for n, html in enumerate(pages, 1):
+            page.set_content(html)
+            snapshot = acgme_scraper.snapshot_page(page)
+            assert snapshot['rows'] == acgme_scraper.table_rows_by_element(page)
+            assert snapshot['links'] == acgme_scraper.history_links_by_element(page)
+            element_ms = time_call(
+                lambda: (acgme_scraper.table_rows_by_element(page),
+                         acgme_scraper.history_links_by_element(page)), repeat)
+            snapshot_ms = time_call(lambda: acgme_scraper.snapshot_page(page), repeat)
+            print(
+                f"page {n}: {len(snapshot['rows'])} rows, {len(snapshot['links'])} history links")
+            print(f"  element-by-element {element_ms:9.2f} ms")
+            print(f"  page.evaluate      {snapshot_ms:9.2f} ms  {element_ms / snapshot_ms:6.1f}x")
+        browser.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        loaded = []
+        for path in sys.argv[1:]:
+            with open(path, "r", encoding="utf-8") as file_obj:
+                loaded.append(file_obj.read())
+    else:
+        loaded = [build_synthetic_page()]
+    run_benchmark(loaded)
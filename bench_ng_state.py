@@ -0,0 +1,82 @@
+"""
+bench_ng_state.py
+
+Micro-benchmark of the ng_state backends against the original
+BeautifulSoup/html.parser path.
+
+Usage:
+    python bench_ng_state.py                 # synthetic FREIDA-sized page
+    python bench_ng_state.py page1.html ...  # saved pages (e.g. page.content() dumps)
+"""
+
+import json
+import sys
+import timeit
+
+import ng_state
+
+
+def build_synthetic_page(survey_nodes=300, dom_cards=400):
+    """
+    Builds a page shaped like a rendered FREIDA program page: a large Angular
+    DOM with inline scripts and styles, and the ng-state JSON at the end of body.
+    """
+    included = [{
+        'type': 'node--survey',
+        'id': f'survey-{n}',
+        'attributes': {
+            'field_first_year_positions': n,
+            'field_special_features': {'value': '<p>Special feature text</p>' * 5},
+            'field_program_start_dates': ['2025-07-01'],
+        },
+    } for n in range(survey_nodes)]
+    state = {
+        'program-key': {'b': {
+            'data': [{'type': 'node--program', 'id': 'p1', 'attributes': {'title': 'X'}}],
+            'included': included}},
+        'other-key': {'b': {'data': [{'type': 'taxonomy_term', 'id': 't'}] * 50}},
+    }
+    cards = ''.join(
+        f'<div class="card" data-n="{n}"><span class="label">Field {n}</span>'
+        f'<a href="/program/{n}">Program {n}</a><ul><li>a</li><li>b</li></ul></div>'
+        for n in range(dom_cards))
+    return (
+        '<!DOCTYPE html><html><head><style>.card{margin:0}</style>'
+        '<script src="/main.js"></script>'
+        '<script type="application/ld+json">{"@type": "Organization"}</script>'
+        f'</head><body><app-root>{cards}<div class="survey-info"></div></app-root>'
+        '<script id="ng-state" type="application/json">'
+        f'{json.dumps(state)}</script></body></html>')
+
+
+def run_benchmark(pages, number=20):
+    """
+    Times each available backend over the pages and prints ms per page and the
+    speed-up relative to html.parser.
+    """
+    expected = [ng_state.find_with_html_parser(page) for page in pages]
+    results = {}
+    for name in ng_state.available_backends():
+        finder = ng_state.get_backend(name)
+        if [finder(page) for page in pages] != expected:
+            print(f"{name:12s} MISMATCH against html.parser output, skipped")
+            continue
+        seconds = min(timeit.repeat(
+            lambda f=finder: [f(page) for page in pages], number=number, repeat=3))
+        results[name] = seconds / number / len(pages) * 1000
+    baseline = results['html.parser']
+    total_kb = sum(len(page) for page in pages) / len(pages) / 1024
+    print(f"Average page size: {total_kb:.0f} KiB over {len(pages)} page(s)")
+    for name, ms in sorted(results.items(), key=lambda item: item[1]):
+        print(f"{name:12s} {ms:9.3f} ms/page  {baseline / ms:7.1f}x")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        loaded = []
+        for path in sys.argv[1:]:
+            with open(path, "r", encoding="utf-8") as file_obj:
+                loaded.append(file_obj.read())
+    else:
+        loaded = [build_synthetic_page()]
+    run_benchmark(loaded)
@@ -2,25 +2,134 @@
 extract.py
 
 Extracts all FREIDA program IDs by scraping paginated search results.
+
+The command-line run reads the total result count from the first page of each
+specialty, fetches the remaining pages concurrently on a pool of async pages,
+and merges the IDs of every requested specialty into one deduplicated file.
 """
 
+import argparse
+import asyncio
 import logging
+import math
+import re
 import time
 
 import pandas as pd
+from playwright.async_api import async_playwright
 from playwright.sync_api import sync_playwright
 
+from page_cache import DEFAULT_TTL, PageCache
+from rate_limiter import site_controller
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s')
 
-START_URL_TEMPLATE = "https://freida.ama-assn.org/search/list?spec=42771&page={page}"
+SEARCH_URL_TEMPLATE = "https://freida.ama-assn.org/search/list?spec={spec}&page={page}"
+DEFAULT_SPECIALTIES = ("42771",)
+START_URL_TEMPLATE = SEARCH_URL_TEMPLATE.replace("{spec}", DEFAULT_SPECIALTIES[0])
+OUTPUT_CSV = "freida_program_ids.csv"
+# Results per page requested from the search; the page count is derived from
+# the number of cards actually returned, so a smaller server cap is harmless
+PAGE_SIZE_PARAM = "size"
+MAX_PAGE_SIZE = 100
+# Search XHRs issued by the Angular app; their JSON carries the result IDs
+SEARCH_API_URL_PATTERN = re.compile(r"/(?:api|jsonapi)/[^?]*search", re.IGNORECASE)
+SEARCH_API_TIMEOUT_MS = 10000
+# Attempts per search page before its IDs are given up on
+PAGE_ATTEMPTS = 3
+ID_KEYS = ('field_program_id', 'program_id', 'programId')
+TOTAL_KEYS = ('total', 'count', 'totalCount', 'total_count')
+RESULT_KEYS = ('data', 'results', 'items')
+
+# Collects every card's program ID in one round trip
+CARD_IDS_JS = """cards => cards.map(card => {
+    const span = card.querySelector('footer span:nth-of-type(2)');
+    return span ? span.innerText.replace('ID:', '').trim() : null;
+})"""
+
+# Reads the "<n> programs" / "<n> results" count shown above the result list
+RESULT_COUNT_JS = r"""() => {
+    const text = document.body ? document.body.innerText : '';
+    const match = text.match(/([\d,]+)\s+(?:programs?|results?)\b/i);
+    return match ? parseInt(match[1].replace(/,/g, ''), 10) : null;
+}"""
+
+
+def search_url(spec, page_num, page_size=None):
+    """
+    Returns the search result URL for a specialty page, asking for page_size
+    results per page when given.
+    """
+    url = SEARCH_URL_TEMPLATE.format(spec=spec, page=page_num)
+    return f"{url}&{PAGE_SIZE_PARAM}={page_size}" if page_size else url
+
+
+def _card_ids_to_data(ids):
+    data = []
+    for idx, program_id in enumerate(ids):
+        if not program_id:
+            logging.warning("Card %d: Missing ID span element.", idx)
+            continue
+        data.append({"program_id": program_id})
+    logging.info("Found %d program cards on page.", len(ids))
+    return data
+
+
+def _result_id(item):
+    if not isinstance(item, dict):
+        return None
+    for source in (item, item.get('attributes')):
+        if isinstance(source, dict):
+            for key in ID_KEYS:
+                value = source.get(key)
+                if isinstance(value, (str, int)) and str(value).strip():
+                    return str(value).strip()
+    return None
+
+
+def parse_search_payload(payload):
+    """
+    Returns (program data, total or None) from a search API JSON payload.
+    IDs are read only from the top-level result array (one of RESULT_KEYS),
+    from each result or its attributes, and the total only from the top
+    level or its meta object, so facet counts and nested related programs
+    are ignored.
+    """
+    if not isinstance(payload, dict):
+        return [], None
+    results = next((payload[key] for key in RESULT_KEYS
+                    if isinstance(payload.get(key), list)), [])
+    ids = [pid for pid in (_result_id(item) for item in results) if pid]
+    total = None
+    for source in (payload, payload.get('meta')):
+        if isinstance(source, dict) and total is None:
+            total = next((source[key] for key in TOTAL_KEYS
+                          if isinstance(source.get(key), int)), None)
+    return [{"program_id": pid} for pid in dict.fromkeys(ids)], total
+
+
+def is_search_api_response(response):
+    """
+    Returns True for the search XHRs whose JSON lists the result page.
+    """
+    return (response.request.resource_type in ('xhr', 'fetch')
+            and SEARCH_API_URL_PATTERN.search(response.url) is not None)
 
 
 def extract_program_data(page):
     """
-    Extracts program IDs from all cards on the current page.
+    Extracts program IDs from all cards on the current page, in one
+    page round trip when possible.
     """
+    try:
+        ids = page.eval_on_selector_all(".search-result-card", CARD_IDS_JS)
+    except Exception as e:
+        logging.debug("Single-call card extraction failed: %s", e)
+        ids = None
+    if isinstance(ids, list):
+        return _card_ids_to_data(ids)
     data = []
     cards = page.query_selector_all(".search-result-card")
     logging.info("Found %d program cards on page.", len(cards))
@@ -38,44 +147,287 @@ def extract_program_data(page):
     return data
 
 
-def scrape_all_pages():
+async def extract_program_data_async(page):
+    """
+    Async counterpart of extract_program_data.
+    """
+    try:
+        ids = await page.eval_on_selector_all(".search-result-card", CARD_IDS_JS)
+    except Exception as e:
+        logging.debug("Single-call card extraction failed: %s", e)
+        ids = None
+    if isinstance(ids, list):
+        return _card_ids_to_data(ids)
+    data = []
+    cards = await page.query_selector_all(".search-result-card")
+    logging.info("Found %d program cards on page.", len(cards))
+    for idx, card in enumerate(cards):
+        try:
+            id_span = await card.query_selector("footer span:nth-of-type(2)")
+            if not id_span:
+                logging.warning("Card %d: Missing ID span element.", idx)
+                continue
+            program_id = (await id_span.inner_text()).replace("ID:", "").strip()
+            data.append({"program_id": program_id})
+        except Exception as e:
+            logging.warning("Card %d: Error parsing ID: %s", idx, e)
+    return data
+
+
+async def read_total_results(page):
+    """
+    Returns the total result count shown on a search page, or None.
+    """
+    try:
+        total = await page.evaluate(RESULT_COUNT_JS)
+    except Exception as e:
+        logging.debug("Could not read result count: %s", e)
+        return None
+    return total if isinstance(total, int) and total > 0 else None
+
+
+async def read_search_api(page, url):
+    """
+    Navigates to url and returns (program data, total or None) from the search
+    XHR it triggers, without waiting for the cards to render. Returns ([], None)
+    if no matching response arrives.
+    """
+    try:
+        async with page.expect_response(
+                is_search_api_response, timeout=SEARCH_API_TIMEOUT_MS) as response_info:
+            await page.goto(url, wait_until="commit")
+        response = await response_info.value
+        return parse_search_payload(await response.json())
+    except Exception as e:
+        logging.debug("No usable search API response for %s: %s", url, e)
+        return [], None
+
+
+async def fetch_search_page(page, spec, page_num, controller, page_size=None):
+    """
+    Loads one search result page and returns (program data, total result
+    count or None). IDs come from the intercepted search XHR when possible,
+    otherwise from the rendered cards (the count is then only read from first
+    pages). Returns (None, None) if the page could not be loaded, as opposed
+    to ([], None) for a page without results.
+    """
+    url = search_url(spec, page_num, page_size)
+    logging.info("Navigating to %s", url)
+    await controller.acquire()
+    started = time.monotonic()
+    data, total = await read_search_api(page, url)
+    if data:
+        controller.record(time.monotonic() - started)
+        logging.info("Read %d program IDs from the search API.", len(data))
+        return data, total
+    try:
+        if page.url != url:
+            await page.goto(url, wait_until="domcontentloaded")
+        await page.wait_for_selector(".search-result-card", timeout=10000)
+    except Exception as e:
+        controller.record(time.monotonic() - started, str(e))
+        logging.error(
+            "Failed to load or wait for content on spec %s page %d: %s", spec, page_num, e)
+        return None, None
+    controller.record(time.monotonic() - started)
+    data = await extract_program_data_async(page)
+    total = await read_total_results(page) if page_num == 1 else None
+    return data, total
+
+
+def merge_program_ids(results, specs):
+    """
+    Merges {(spec, page_num): data} into one list of {"program_id": ...} dicts,
+    ordered by specialty then page, keeping the first occurrence of each ID.
+    """
+    order = {spec: n for n, spec in enumerate(specs)}
+    seen = set()
+    merged = []
+    for key in sorted(results, key=lambda item: (order[item[0]], item[1])):
+        for row in results[key]:
+            if row["program_id"] not in seen:
+                seen.add(row["program_id"])
+                merged.append(row)
+    return merged
+
+
+async def scrape_specialties(
+        specs=DEFAULT_SPECIALTIES, workers=4, cache=None, page_size=MAX_PAGE_SIZE):
+    """
+    Scrapes the search results of every specialty in specs on `workers`
+    concurrent pages and returns the merged, deduplicated program IDs.
+    Once a specialty's first page gives the total count, all its remaining
+    pages are queued at once, plus one page past the count in case the count
+    was wrong (walking on while such pages have results); without a count,
+    pages are walked one after another until an empty page. Pages that fail to
+    load are retried up to PAGE_ATTEMPTS times and reported if still lost.
+    """
+    specs = list(dict.fromkeys(str(spec) for spec in specs))
+    controller = site_controller('freida')
+    queue = asyncio.Queue()
+    for spec in specs:
+        queue.put_nowait((spec, 1))
+    results = {}
+    walking = set()
+    last_pages = {}
+    attempts = {}
+    lost = []
+
+    async def worker(context):
+        page = await context.new_page()
+        while True:
+            spec, page_num = await queue.get()
+            try:
+                try:
+                    data, total = await fetch_search_page(
+                        page, spec, page_num, controller, page_size=page_size)
+                except Exception as e:
+                    logging.error("Error scraping spec %s page %d: %s", spec, page_num, e)
+                    data, total = None, None
+                if data is None:
+                    attempts[(spec, page_num)] = attempts.get((spec, page_num), 0) + 1
+                    if attempts[(spec, page_num)] < PAGE_ATTEMPTS:
+                        logging.warning(
+                            "Retrying spec %s page %d (attempt %d of %d)", spec, page_num,
+                            attempts[(spec, page_num)] + 1, PAGE_ATTEMPTS)
+                        queue.put_nowait((spec, page_num))
+                        continue
+                    logging.error(
+                        "Giving up on spec %s page %d after %d attempts; its program IDs"
+                        " are missing", spec, page_num, PAGE_ATTEMPTS)
+                    lost.append((spec, page_num))
+                    data = []
+                    if spec not in last_pages:
+                        # Without a count there is no way to know what follows
+                        continue
+                results[(spec, page_num)] = data
+                if not data:
+                    if (spec, page_num) not in lost:
+                        logging.info("No more data found for spec %s.", spec)
+                elif page_num == 1 and total:
+                    last_page = math.ceil(total / len(data))
+                    last_pages[spec] = last_page
+                    logging.info(
+                        "Spec %s: %d results over %d pages", spec, total, last_page)
+                    for next_page in range(2, last_page + 2):
+                        queue.put_nowait((spec, next_page))
+                elif spec in last_pages and page_num > last_pages[spec]:
+                    logging.warning(
+                        "Spec %s page %d has results past the reported count; walking on",
+                        spec, page_num)
+                    queue.put_nowait((spec, page_num + 1))
+                elif page_num == 1 or spec in walking:
+                    walking.add(spec)
+                    queue.put_nowait((spec, page_num + 1))
+            finally:
+                queue.task_done()
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        context = await browser.new_context()
+        if cache:
+            await cache.install_async(context)
+        tasks = [asyncio.create_task(worker(context)) for _ in range(max(1, workers))]
+        try:
+            await queue.join()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await browser.close()
+    controller.log_summary()
+    if cache:
+        cache.log_summary()
+    merged = merge_program_ids(results, specs)
+    logging.info(
+        "Collected %d unique program IDs from %d specialties (%d pages)",
+        len(merged), len(specs), len(results))
+    if lost:
+        logging.error(
+            "%d search pages could not be loaded: %s", len(lost),
+            ', '.join(f"spec {spec} page {page_num}" for spec, page_num in sorted(lost)))
+    return merged
+
+
+def scrape_all_pages(cache=None):
     """
     Scrapes all paginated FREIDA program search result pages and returns a list of program data dicts.
+    With a PageCache, pages and their XHRs are served from and stored in it.
     """
     all_data = []
+    controller = site_controller('freida')
     with sync_playwright() as p:
         browser = p.chromium.launch(headless=True)
         context = browser.new_context()
+        if cache:
+            cache.install(context)
         page = context.new_page()
         page_num = 1
         while True:
             url = START_URL_TEMPLATE.format(page=page_num)
             logging.info("Navigating to %s", url)
+            controller.wait()
+            started = time.monotonic()
             try:
-                page.goto(url, wait_until="networkidle")
+                page.goto(url, wait_until="domcontentloaded")
                 page.wait_for_selector(".search-result-card", timeout=10000)
             except Exception as e:
+                controller.record(time.monotonic() - started, str(e))
                 logging.error(
                     "Failed to load or wait for content on page %d: %s", page_num, e)
                 break
+            controller.record(time.monotonic() - started)
             page_data = extract_program_data(page)
             if not page_data:
                 logging.info("No more data found.")
                 break
             all_data.extend(page_data)
             page_num += 1
-            time.sleep(1.0)
         browser.close()
+    controller.log_summary()
+    if cache:
+        cache.log_summary()
     return all_data
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Extract all FREIDA program IDs into freida_program_ids.csv.')
+    parser.add_argument(
+        '--spec',
+        action='append',
+        help='Specialty ID to collect (repeatable or comma-separated, default: 42771).')
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=4,
+        help='Number of search pages fetched concurrently.')
+    parser.add_argument(
+        '--page-size',
+        type=int,
+        default=MAX_PAGE_SIZE,
+        help='Results requested per search page (0 uses the site default).')
+    parser.add_argument(
+        '--cache-dir',
+        help='Serve and store search pages in this on-disk cache (see page_cache.py).')
+    parser.add_argument(
+        '--cache-ttl',
+        type=float,
+        default=DEFAULT_TTL,
+        help='Seconds a cached page is used without revalidation (default: one day).')
+    args = parser.parse_args()
+    specialties = [
+        spec.strip() for value in (args.spec or DEFAULT_SPECIALTIES)
+        for spec in value.split(',') if spec.strip()]
     try:
-        data = scrape_all_pages()
+        data = asyncio.run(scrape_specialties(
+            specialties, args.workers,
+            PageCache(args.cache_dir, args.cache_ttl) if args.cache_dir else None,
+            args.page_size))
         if data:
             df = pd.DataFrame(data)[["program_id"]]
-            df.to_csv("freida_program_ids.csv", index=False)
-            logging.info("✅ Scrape complete. Saved to freida_program_ids.csv")
+            df.to_csv(OUTPUT_CSV, index=False)
+            logging.info("✅ Scrape complete. Saved to %s", OUTPUT_CSV)
         else:
             logging.warning("⚠️ No data scraped.")
     except Exception as e:
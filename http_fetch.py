@@ -0,0 +1,91 @@
+"""
+http_fetch.py
+
+Browser-free fetching of FREIDA pages over a pooled, keep-alive HTTP session.
+Cookies are shared from the Playwright storage state saved by login_and_save.py.
+"""
+
+import json
+import logging
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+
+STORAGE_STATE = os.getenv("STORAGE_STATE") or "cookies/frieda_state.json"
+
+DEFAULT_HEADERS = {
+    'User-Agent': (
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+        '(KHTML, like Gecko) Chrome/124.0 Safari/537.36'),
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+}
+
+
+def load_storage_state_cookies(session, storage_state):
+    """
+    Copies cookies from a Playwright storage state file into a requests session.
+    Returns the number of cookies loaded.
+    """
+    with open(storage_state, "r", encoding="utf-8") as file_obj:
+        state = json.load(file_obj)
+    cookies = state.get('cookies', [])
+    for cookie in cookies:
+        session.cookies.set(
+            cookie['name'],
+            cookie['value'],
+            domain=cookie.get('domain'),
+            path=cookie.get('path', '/'))
+    return len(cookies)
+
+
+def create_session(storage_state=STORAGE_STATE, pool_size=10):
+    """
+    Builds a requests session with a keep-alive connection pool, browser-like
+    headers and, if the file exists, the cookies from the saved storage state.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    if storage_state and os.path.exists(storage_state):
+        count = load_storage_state_cookies(session, storage_state)
+        logging.debug("Loaded %d cookies from %s", count, storage_state)
+    else:
+        logging.debug("No storage state at %s; fetching anonymously", storage_state)
+    return session
+
+
+def _decode(body, headers):
+    charset = 'utf-8'
+    for part in headers.get('content-type', '').split(';'):
+        name, _, value = part.strip().partition('=')
+        if name.lower() == 'charset' and value:
+            charset = value.strip('"\'')
+    return body.decode(charset, errors='replace')
+
+
+def fetch_html(session, url, timeout=15, cache=None):
+    """
+    Fetches a page and returns its body as text. Raises requests.RequestException
+    on connection errors and non-2xx responses.
+    With a PageCache, fresh entries are returned without a request and stale
+    ones are revalidated with a conditional GET.
+    """
+    if cache is None:
+        response = session.get(url, timeout=timeout)
+        response.raise_for_status()
+        return response.text
+    entry, fresh = cache.lookup(url)
+    if fresh:
+        return _decode(entry['body'], entry['headers'])
+    response = session.get(url, timeout=timeout, headers=cache.validators(entry))
+    if response.status_code == 304 and entry is not None:
+        cache.touch(url)
+        return _decode(entry['body'], entry['headers'])
+    response.raise_for_status()
+    if response.status_code == 200:
+        cache.put(url, response.status_code, response.headers, response.content)
+    return response.text
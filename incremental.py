@@ -0,0 +1,96 @@
+"""
+incremental.py
+
+Incremental FREIDA refresh. Instead of re-scraping every program page, the
+JSON:API program listing is probed in batches for each program's `changed`
+timestamp (a few KB per batch), and only programs that are new, changed, or
+could not be probed are scraped in full.
+"""
+
+import logging
+
+import requests
+
+from state_store import normalize_program_id
+
+# JSON:API collection the FREIDA Angular app reads program nodes from
+PROGRAM_LIST_API_URL = "https://freida.ama-assn.org/jsonapi/node/program"
+PROBE_BATCH_SIZE = 50
+JSONAPI_HEADERS = {'Accept': 'application/vnd.api+json'}
+
+
+def build_probe_params(program_ids):
+    """
+    Returns JSON:API query parameters selecting only the program ID and
+    `changed` attributes of the given programs.
+    """
+    params = [
+        ('filter[pid][condition][path]', 'field_program_id'),
+        ('filter[pid][condition][operator]', 'IN'),
+        ('fields[node--program]', 'field_program_id,changed'),
+        ('page[limit]', str(len(program_ids))),
+    ]
+    params.extend(
+        ('filter[pid][condition][value][]', str(pid)) for pid in program_ids)
+    return params
+
+
+def probe_changed(session, program_ids, batch_size=PROBE_BATCH_SIZE, timeout=15):
+    """
+    Returns {program_id: changed} from the program listing. Programs in a
+    batch that fails, or that the listing does not return, are left out so
+    the caller treats them as changed.
+    """
+    program_ids = [normalize_program_id(pid) for pid in program_ids]
+    remote = {}
+    for start in range(0, len(program_ids), batch_size):
+        batch = program_ids[start:start + batch_size]
+        try:
+            response = session.get(
+                PROGRAM_LIST_API_URL, params=build_probe_params(batch),
+                headers=JSONAPI_HEADERS, timeout=timeout)
+            response.raise_for_status()
+            nodes = response.json().get('data') or []
+        except (requests.RequestException, ValueError) as err:
+            logging.warning(
+                "Probe failed for %d programs starting at %s: %s", len(batch), batch[0], err)
+            continue
+        for node in nodes:
+            attrs = node.get('attributes') or {}
+            program_id = attrs.get('field_program_id')
+            if program_id:
+                remote[normalize_program_id(program_id)] = attrs.get('changed')
+        logging.debug("Probed %d/%d programs", min(start + batch_size, len(program_ids)),
+                      len(program_ids))
+    return remote
+
+
+def select_changed_ids(program_ids, stored_changed, remote_changed):
+    """
+    Splits program_ids into (to_scrape, unchanged). A program is unchanged only
+    if it is stored and its stored `changed` equals the probed one.
+    """
+    to_scrape, unchanged = [], []
+    for program_id in program_ids:
+        key = normalize_program_id(program_id)
+        remote = remote_changed.get(key)
+        stored = stored_changed.get(key)
+        if remote and stored and str(remote).strip() == str(stored).strip():
+            unchanged.append(program_id)
+        else:
+            to_scrape.append(program_id)
+    return to_scrape, unchanged
+
+
+def plan_refresh(session, store, program_ids):
+    """
+    Probes program_ids and returns those needing a full scrape; the rest are
+    marked as checked in the store.
+    """
+    remote = probe_changed(session, program_ids)
+    to_scrape, unchanged = select_changed_ids(program_ids, store.changed_values(), remote)
+    store.mark_checked(unchanged)
+    logging.info(
+        "Incremental refresh: probed %d programs (%d answered), %d unchanged, %d to scrape",
+        len(program_ids), len(remote), len(unchanged), len(to_scrape))
+    return to_scrape
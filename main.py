@@ -1,17 +1,39 @@
 """
 main.py
 
-Orchestrates scraping of all FREIDA program details using Playwright and outputs to CSV.
+Orchestrates scraping of all FREIDA program details using Playwright and streams them to CSV or JSONL.
 """
 
+import argparse
+import asyncio
+import functools
 import logging
 import sys
 import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-import pandas as pd
+from playwright.async_api import async_playwright
 from playwright.sync_api import sync_playwright
 
-from scraper import extract_program_detail
+import requests
+
+from http_fetch import STORAGE_STATE, create_session, fetch_html
+from incremental import plan_refresh
+from page_cache import DEFAULT_TTL, PageCache
+from rate_limiter import site_controller
+from resume import compact_output, load_completed_ids, read_program_ids
+from routing import freida_blocker
+from scraper import (PROGRAM_DETAIL_URL_TEMPLATE,
+                     MissingStateError,
+                     async_extract_program_detail,
+                     extract_program_detail,
+                     extract_program_detail_from_response,
+                     extract_program_detail_no_js,
+                     fetch_program_detail,
+                     parse_program_html)
+from sinks import TeeSink, open_sink
+from state_store import StateStore
 
 DEBUG_MODE = '--debug' in sys.argv
 EXIT_ON_ERRORS = '--exit-on-errors' in sys.argv
@@ -21,161 +43,443 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+INPUT_CSV = "freida_program_ids.csv"
+OUTPUT_FILES = {
+    'csv': "freida_programs_output.csv",
+    'jsonl': "freida_programs_output.jsonl",
+    'parquet': "freida_programs_output.parquet",
+}
+# With --incremental the output file only holds re-scraped programs; the full
+# OUTPUT_FILES table (CSV, or Parquet with --format parquet) is re-exported
+# from the state store afterwards
+CHANGED_OUTPUT_FILES = {
+    'csv': "freida_programs_changed.csv",
+    'jsonl': "freida_programs_changed.jsonl",
+    'parquet': "freida_programs_changed.parquet",
+}
 
-def main():
+
+def install_routes(context, blocker=None, cache=None):
     """
-    Main entry point: loads program IDs, scrapes details for each, and writes results to CSV.
+    Installs the page cache and resource blocker on a sync browser context.
+    The cache goes first so the blocker, which Playwright runs first, can
+    abort requests before they reach it.
     """
-    input_csv = "freida_program_ids.csv"
-    output_csv = "freida_programs_output.csv"
-    partial_csv = "freida_partial_row2.csv"
-    checkpoint_interval = 25
+    if cache:
+        cache.install(context)
+    if blocker:
+        blocker.install(context)
 
-    all_results = []
-    ids_df = pd.read_csv(input_csv)
 
+async def install_routes_async(context, blocker=None, cache=None):
+    """
+    Async counterpart of install_routes.
+    """
+    if cache:
+        await cache.install_async(context)
+    if blocker:
+        await blocker.install_async(context)
+
+
+def scrape_programs(
+        program_ids, sink, extract=extract_program_detail, blocker=None, controller=None,
+        cache=None, javascript=True):
+    """
+    Scrapes program details one at a time on a single page, paced by the
+    FREIDA rate controller (or `controller`).
+    `extract` is called as extract(page, program_id) for each program, and each
+    result is written to `sink` as soon as it is extracted.
+    With javascript=False the page's context has JavaScript disabled and
+    programs are read with extract_program_detail_no_js; a JavaScript-enabled
+    page is opened only if some program needs a full render.
+    """
+    controller = controller or site_controller('freida')
     with sync_playwright() as p:
         browser = p.chromium.launch(headless=True)
-        context = browser.new_context()
+        context = browser.new_context(java_script_enabled=javascript)
+        install_routes(context, blocker, cache)
         page = context.new_page()
+        if not javascript:
+            render_pages = []
 
-        for idx, row in ids_df.iterrows():
-            program_id = str(row['program_id'])
+            def render_page():
+                if not render_pages:
+                    logging.info("Opening JavaScript-enabled page for full renders")
+                    render_context = browser.new_context()
+                    install_routes(render_context, blocker, cache)
+                    render_pages.append(render_context.new_page())
+                return render_pages[0]
+            extract = functools.partial(extract_program_detail_no_js, fallback_page=render_page)
+
+        for idx, program_id in enumerate(program_ids):
             logging.debug(
                 "Processing row %d/%d: Program ID %s",
-                idx + 1, len(ids_df), program_id)
-            result = extract_program_detail(page, program_id)
-            all_results.append(result)
-
-            if (idx + 1) % checkpoint_interval == 0 or idx == 1:
-                partial_df = pd.DataFrame(all_results)
-                # Ensure columns are always in the same order as
-                # EXPECTED_FIELDS
-                EXPECTED_FIELDS = [
-                    'program_id',
-                    'source_url',
-                    'program_name_suffix',
-                    'city',
-                    'state',
-                    'data_last_updated',
-                    'accredited_training_length',
-                    'required_training_length',
-                    'affiliated_us_government',
-                    'raw_ng_state_json',
-                    'specialty_title',
-                    'first_year_positions',
-                    'interviews_conducted_last_year',
-                    'avg_hours_on_duty_y1',
-                    'pct_do',
-                    'pct_img',
-                    'pct_usmd',
-                    'program_best_described_as',
-                    'website',
-                    'special_features_text',
-                    'accepting_applications_2025_2026',
-                    'accepting_applications_2026_2027',
-                    'program_start_dates',
-                    'participates_in_eras',
-                    'visa_statuses_accepted',
-                    'program_director_first_name',
-                    'program_director_middle_name',
-                    'program_director_last_name',
-                    'program_director_suffix',
-                    'program_director_degrees',
-                    'program_director_organization',
-                    'program_director_address_line1',
-                    'program_director_address_line2',
-                    'program_director_locality',
-                    'program_director_administrative_area',
-                    'program_director_postal_code',
-                    'program_director_email',
-                    'program_director_phone',
-                    'contact_first_name',
-                    'contact_middle_name',
-                    'contact_last_name',
-                    'contact_suffix',
-                    'contact_degrees',
-                    'contact_organization',
-                    'contact_address_line1',
-                    'contact_address_line2',
-                    'contact_locality',
-                    'contact_administrative_area',
-                    'contact_postal_code',
-                    'contact_email',
-                    'contact_phone']
-                for field in EXPECTED_FIELDS:
-                    if field not in partial_df.columns:
-                        partial_df[field] = None
-                partial_df = partial_df[EXPECTED_FIELDS]
-                filename = f"freida_partial_{idx + 1}.csv" if (
-                    (idx + 1) % checkpoint_interval == 0) else partial_csv
-                partial_df.to_csv(filename, index=False)
-                logging.info("Saved checkpoint to %s", filename)
-
-            time.sleep(2.0)
+                idx + 1, len(program_ids), program_id)
+            controller.wait()
+            started = time.monotonic()
+            result = extract(page, program_id)
+            controller.record(time.monotonic() - started, result.get('error'))
+            sink.write(result)
 
         context.close()
         browser.close()
 
-    df = pd.DataFrame(all_results)
-    EXPECTED_FIELDS = [
-        'program_id',
-        'source_url',
-        'program_name_suffix',
-        'city',
-        'state',
-        'data_last_updated',
-        'accredited_training_length',
-        'required_training_length',
-        'affiliated_us_government',
-        'raw_ng_state_json',
-        'specialty_title',
-        'first_year_positions',
-        'interviews_conducted_last_year',
-        'avg_hours_on_duty_y1',
-        'pct_do',
-        'pct_img',
-        'pct_usmd',
-        'program_best_described_as',
-        'website',
-        'special_features_text',
-        'accepting_applications_2025_2026',
-        'accepting_applications_2026_2027',
-        'program_start_dates',
-        'participates_in_eras',
-        'visa_statuses_accepted',
-        'program_director_first_name',
-        'program_director_middle_name',
-        'program_director_last_name',
-        'program_director_suffix',
-        'program_director_degrees',
-        'program_director_organization',
-        'program_director_address_line1',
-        'program_director_address_line2',
-        'program_director_locality',
-        'program_director_administrative_area',
-        'program_director_postal_code',
-        'program_director_email',
-        'program_director_phone',
-        'contact_first_name',
-        'contact_middle_name',
-        'contact_last_name',
-        'contact_suffix',
-        'contact_degrees',
-        'contact_organization',
-        'contact_address_line1',
-        'contact_address_line2',
-        'contact_locality',
-        'contact_administrative_area',
-        'contact_postal_code',
-        'contact_email',
-        'contact_phone']
-    for field in EXPECTED_FIELDS:
-        if field not in df.columns:
-            df[field] = None
-    df = df[EXPECTED_FIELDS]
-    df.to_csv(output_csv, index=False)
-    logging.info("✅ Completed scrape. Data saved to %s", output_csv)
+
+class LazyBrowserPage:
+    """
+    Callable that launches Chromium on first use and returns its page, so runs
+    that never need the browser fallback never start a browser.
+    """
+
+    def __init__(self, blocker=None, cache=None):
+        self.blocker = blocker
+        self.cache = cache
+        self._playwright = None
+        self._browser = None
+        self._page = None
+
+    def __call__(self):
+        if self._page is None:
+            logging.info("Launching browser for fallback rendering")
+            self._playwright = sync_playwright().start()
+            self._browser = self._playwright.chromium.launch(headless=True)
+            context = self._browser.new_context()
+            install_routes(context, self.blocker, self.cache)
+            self._page = context.new_page()
+        return self._page
+
+    def close(self):
+        """
+        Closes the browser if it was ever launched.
+        """
+        if self._browser is not None:
+            self._browser.close()
+            self._playwright.stop()
+        self._playwright = self._browser = self._page = None
+
+
+def scrape_programs_http(
+        program_ids, sink, max_rate, storage_state=STORAGE_STATE, blocker=None, cache=None):
+    """
+    Scrapes program details over a keep-alive HTTP session, rendering a page in
+    Chromium only for programs whose response carries no ng-state payload.
+    Requests are paced by the FREIDA rate controller, capped at `max_rate` per second.
+    """
+    session = create_session(storage_state)
+    controller = site_controller('freida', max_rate)
+    fallback_page = LazyBrowserPage(blocker, cache)
+    try:
+        for idx, program_id in enumerate(program_ids):
+            logging.debug(
+                "Processing row %d/%d: Program ID %s",
+                idx + 1, len(program_ids), program_id)
+            controller.wait()
+            started = time.monotonic()
+            result = fetch_program_detail(session, program_id, fallback_page, cache)
+            controller.record(time.monotonic() - started, result.get('error'))
+            sink.write(result)
+    finally:
+        fallback_page.close()
+        session.close()
+
+
+def scrape_programs_parallel_parse(
+        program_ids, sink, parse_workers, max_rate, storage_state=STORAGE_STATE,
+        blocker=None, cache=None, executor=None):
+    """
+    Fetches raw detail page HTML over a keep-alive HTTP session and parses it
+    with parse_program_html in a pool of `parse_workers` processes, so fetching
+    never waits on parsing. Results are written to `sink` in input order; at
+    most a few pages per worker are parsed ahead of the writer. Pages without an
+    ng-state payload are rendered in Chromium as in scrape_programs_http.
+    """
+    session = create_session(storage_state)
+    controller = site_controller('freida', max_rate)
+    fallback_page = LazyBrowserPage(blocker, cache)
+    executor = executor or ProcessPoolExecutor(max_workers=parse_workers)
+    in_flight = deque()
+    max_in_flight = max(1, parse_workers) * 4
+
+    def write_next():
+        program_id, url, job = in_flight.popleft()
+        if isinstance(job, dict):
+            sink.write(job)
+            return
+        try:
+            result = job.result()
+        except MissingStateError as e:
+            logging.info(
+                "HTTP fetch unusable for %s (%s); falling back to browser", program_id, e)
+            controller.wait()
+            started = time.monotonic()
+            result = extract_program_detail(fallback_page(), program_id)
+            controller.record(time.monotonic() - started, result.get('error'))
+        except Exception as e:
+            logging.warning("Error parsing program ID %s: %s", program_id, e)
+            if EXIT_ON_ERRORS:
+                raise
+            result = {"program_id": program_id, "source_url": url, "error": str(e)}
+        sink.write(result)
+
+    try:
+        for idx, program_id in enumerate(program_ids):
+            logging.debug(
+                "Fetching row %d/%d: Program ID %s", idx + 1, len(program_ids), program_id)
+            url = PROGRAM_DETAIL_URL_TEMPLATE.format(program_id)
+            controller.wait()
+            started = time.monotonic()
+            try:
+                html_content = fetch_html(session, url, cache=cache)
+                controller.record(time.monotonic() - started)
+                job = executor.submit(parse_program_html, html_content, url)
+            except requests.RequestException as e:
+                controller.record(time.monotonic() - started, str(e))
+                logging.warning("Error fetching program ID %s: %s", program_id, e)
+                if EXIT_ON_ERRORS:
+                    raise
+                job = {"program_id": program_id, "source_url": url, "error": str(e)}
+            in_flight.append((program_id, url, job))
+            while in_flight and (len(in_flight) > max_in_flight or
+                                 isinstance(in_flight[0][2], dict) or
+                                 in_flight[0][2].done()):
+                write_next()
+        while in_flight:
+            write_next()
+    finally:
+        executor.shutdown(wait=True)
+        fallback_page.close()
+        session.close()
+
+
+async def scrape_programs_async(
+        program_ids, sink, workers, max_rate, blocker=None, cache=None):
+    """
+    Scrapes program details concurrently on a pool of `workers` browser contexts.
+    Requests across all workers share the FREIDA rate controller, capped at
+    `max_rate` per second. Results are
+    written to `sink` in the same order as program_ids; only rows that finished
+    ahead of a slower predecessor are held in memory.
+    """
+    queue = asyncio.Queue()
+    for idx, program_id in enumerate(program_ids):
+        queue.put_nowait((idx, program_id))
+    controller = site_controller('freida', max_rate)
+    pending = {}
+    next_index = [0]
+
+    def emit(idx, result):
+        pending[idx] = result
+        while next_index[0] in pending:
+            sink.write(pending.pop(next_index[0]))
+            next_index[0] += 1
+
+    async def worker(browser, worker_id):
+        context = await browser.new_context()
+        await install_routes_async(context, blocker, cache)
+        page = await context.new_page()
+        try:
+            while True:
+                try:
+                    idx, program_id = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                await controller.acquire()
+                logging.debug(
+                    "Worker %d processing row %d/%d: Program ID %s",
+                    worker_id, idx + 1, len(program_ids), program_id)
+                started = time.monotonic()
+                result = await async_extract_program_detail(page, program_id)
+                controller.record(time.monotonic() - started, result.get('error'))
+                emit(idx, result)
+        finally:
+            await context.close()
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        try:
+            await asyncio.gather(
+                *(worker(browser, n) for n in range(min(workers, len(program_ids)))))
+        finally:
+            await browser.close()
+
+
+def parse_args(argv=None):
+    """
+    Parses command-line options for main.py.
+    """
+    parser = argparse.ArgumentParser(
+        description='Scrape FREIDA program details for every ID in freida_program_ids.csv.')
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Number of concurrent browser pages. Values above 1 use the asyncio scraper.')
+    parser.add_argument(
+        '--max-rate',
+        type=float,
+        default=4.0,
+        help='Ceiling for the adaptive FREIDA request rate, in requests per second (0 disables pacing).')
+    # Scraping modes are exclusive; --workers above 1 (the asyncio scraper) is checked below
+    modes = parser.add_mutually_exclusive_group()
+    modes.add_argument(
+        '--http',
+        action='store_true',
+        help='Fetch pages over HTTP and parse ng-state directly, using the browser only as a fallback.')
+    modes.add_argument(
+        '--parse-workers',
+        type=int,
+        default=0,
+        help='Fetch raw pages over HTTP and parse them in this many processes (0 parses inline).')
+    modes.add_argument(
+        '--capture-response',
+        action='store_true',
+        help='Read the program JSON from network responses instead of serialising the rendered DOM.')
+    modes.add_argument(
+        '--no-js',
+        action='store_true',
+        help='Disable JavaScript and parse ng-state from the raw document, rendering in full only when it is missing.')
+    parser.add_argument(
+        '--format',
+        choices=sorted(OUTPUT_FILES),
+        default='csv',
+        help='Output format for the streaming result file.')
+    parser.add_argument(
+        '--output',
+        help='Output file path (default: freida_programs_output.<format>).')
+    parser.add_argument(
+        '--fsync-every',
+        type=int,
+        default=25,
+        help='Flush and fsync the output file after this many records.')
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Skip program IDs already present in the output file or legacy checkpoints, and append to the output.')
+    parser.add_argument(
+        '--state-db',
+        help='Also upsert every record into this SQLite pipeline state store.')
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Probe each program\'s "changed" timestamp and only scrape new or changed programs (requires --state-db).')
+    parser.add_argument(
+        '--no-block-resources',
+        action='store_true',
+        help='Let the browser load images, fonts, stylesheets and third-party requests.')
+    parser.add_argument(
+        '--storage-state',
+        default=STORAGE_STATE,
+        help='Playwright storage state file whose cookies are sent in HTTP mode.')
+    parser.add_argument(
+        '--cache-dir',
+        help='Serve and store FREIDA pages in this on-disk cache (see page_cache.py).')
+    parser.add_argument(
+        '--cache-ttl',
+        type=float,
+        default=DEFAULT_TTL,
+        help='Seconds a cached page is used without revalidation (default: one day).')
+    parser.add_argument('--debug', action='store_true',
+                        help='Enable debug logging, screenshots and raw JSON.')
+    parser.add_argument('--exit-on-errors', action='store_true',
+                        help='Stop on the first extraction error.')
+    args, _ = parser.parse_known_args(argv)
+    if args.workers > 1:
+        conflicting = [flag for flag, enabled in (
+            ('--http', args.http), ('--parse-workers', args.parse_workers > 0),
+            ('--capture-response', args.capture_response), ('--no-js', args.no_js))
+            if enabled]
+        if conflicting:
+            parser.error(
+                f"--workers {args.workers} cannot be combined with {', '.join(conflicting)}")
+    return args
+
+
+def main():
+    """
+    Main entry point: loads program IDs, scrapes details for each, and writes results to CSV.
+    """
+    args = parse_args()
+    if args.incremental and not args.state_db:
+        logging.error("--incremental requires --state-db")
+        sys.exit(2)
+    blocker = None if args.no_block_resources else freida_blocker()
+    controller = site_controller('freida', args.max_rate)
+    cache = PageCache(args.cache_dir, args.cache_ttl) if args.cache_dir else None
+    output_path = args.output or (
+        CHANGED_OUTPUT_FILES if args.incremental else OUTPUT_FILES)[args.format]
+    program_ids = list(read_program_ids(INPUT_CSV))
+    if args.incremental:
+        session = create_session(args.storage_state)
+        try:
+            with StateStore(args.state_db) as store:
+                program_ids = plan_refresh(session, store, program_ids)
+        finally:
+            session.close()
+    if args.resume:
+        completed = load_completed_ids([output_path])
+        total = len(program_ids)
+        program_ids = [pid for pid in program_ids if pid not in completed]
+        logging.info(
+            "Resuming: %d of %d programs already scraped, %d remaining",
+            total - len(program_ids), total, len(program_ids))
+
+    sink = open_sink(output_path, args.format, fsync_every=args.fsync_every,
+                     append=args.resume)
+    store = None
+    if args.state_db:
+        store = StateStore(args.state_db)
+        sink = TeeSink(sink, store)
+
+    with sink:
+        if args.parse_workers > 0:
+            logging.info(
+                "Scraping %d programs over HTTP with %d parse processes (max %.2f req/s)",
+                len(program_ids), args.parse_workers, args.max_rate)
+            scrape_programs_parallel_parse(
+                program_ids, sink, args.parse_workers, args.max_rate, args.storage_state,
+                blocker, cache)
+        elif args.http:
+            logging.info(
+                "Scraping %d programs over HTTP (max %.2f req/s)",
+                len(program_ids), args.max_rate)
+            scrape_programs_http(
+                program_ids, sink, args.max_rate, args.storage_state, blocker, cache)
+        elif args.workers > 1:
+            logging.info(
+                "Scraping %d programs with %d async workers (max %.2f req/s)",
+                len(program_ids), args.workers, args.max_rate)
+            asyncio.run(
+                scrape_programs_async(
+                    program_ids, sink, args.workers, args.max_rate, blocker, cache))
+        elif args.no_js:
+            scrape_programs(
+                program_ids, sink, blocker=blocker, cache=cache, javascript=False)
+        elif args.capture_response:
+            scrape_programs(
+                program_ids, sink, extract_program_detail_from_response, blocker,
+                cache=cache)
+        else:
+            scrape_programs(program_ids, sink, blocker=blocker, cache=cache)
+    if args.resume:
+        # Retried programs were appended after their failed rows
+        compact_output(output_path)
+    if blocker:
+        blocker.log_summary()
+    if cache:
+        cache.log_summary()
+    if args.incremental:
+        logging.info(
+            "Incremental refresh: %d programs re-scraped, %d with changed content",
+            store.count, store.content_changes)
+        with StateStore(args.state_db) as full_store:
+            full_store.export(
+                output_csv=OUTPUT_FILES['parquet' if args.format == 'parquet' else 'csv'],
+                with_year_csv=None,
+                success_csv=None, failed_csv=None)
+    controller.log_summary()
+
+    logging.info(
+        "✅ Completed scrape. %d records saved to %s", sink.count, output_path)
 
 
 if __name__ == "__main__":
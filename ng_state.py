@@ -0,0 +1,141 @@
+"""
+ng_state.py
+
+Locates the Angular transfer state (<script id="ng-state" type="application/json">)
+in a FREIDA page with the fastest available HTML backend.
+
+Decoding uses orjson when it is installed and the stdlib json module otherwise.
+
+Backends, all returning the raw script text or None:
+  scan        - streaming tag scanner that stops at the first matching script (stdlib)
+  selectolax  - lexbor-based parser (optional dependency)
+  lxml        - libxml2-based parser (optional dependency)
+  html.parser - BeautifulSoup with the stdlib parser (the original implementation)
+"""
+
+import json
+import re
+
+from bs4 import BeautifulSoup
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # pragma: no cover - optional dependency
+    LexborHTMLParser = None
+
+try:
+    import lxml.html as lxml_html
+except ImportError:  # pragma: no cover - optional dependency
+    lxml_html = None
+
+SCRIPT_ID = 'ng-state'
+SCRIPT_TYPE = 'application/json'
+
+_SCRIPT_OPEN_RE = re.compile(r'<script\b([^>]*)>', re.IGNORECASE)
+_SCRIPT_CLOSE_RE = re.compile(r'</script\s*>', re.IGNORECASE)
+_ATTR_RE = re.compile(
+    r'([^\s=/>]+)(?:\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+)))?')
+
+
+def _attributes(attr_text):
+    attrs = {}
+    for match in _ATTR_RE.finditer(attr_text):
+        value = next((v for v in match.groups()[1:] if v is not None), '')
+        attrs[match.group(1).lower()] = value
+    return attrs
+
+
+def find_with_scan(html_content):
+    """
+    Scans script tags in document order and returns the text of the first
+    ng-state script without building a tree.
+    """
+    for match in _SCRIPT_OPEN_RE.finditer(html_content):
+        attr_text = match.group(1)
+        if SCRIPT_ID not in attr_text:
+            continue
+        attrs = _attributes(attr_text)
+        if attrs.get('id') != SCRIPT_ID or attrs.get('type') != SCRIPT_TYPE:
+            continue
+        close = _SCRIPT_CLOSE_RE.search(html_content, match.end())
+        end = close.start() if close else len(html_content)
+        return html_content[match.end():end] or None
+    return None
+
+
+def find_with_selectolax(html_content):
+    """
+    Finds the ng-state script with selectolax's lexbor parser.
+    """
+    node = LexborHTMLParser(html_content).css_first(
+        f'script#{SCRIPT_ID}[type="{SCRIPT_TYPE}"]')
+    return (node.text() or None) if node is not None else None
+
+
+def find_with_lxml(html_content):
+    """
+    Finds the ng-state script with lxml.
+    """
+    nodes = lxml_html.fromstring(html_content).xpath(
+        f'//script[@id="{SCRIPT_ID}"][@type="{SCRIPT_TYPE}"]')
+    return (nodes[0].text or None) if nodes else None
+
+
+def find_with_html_parser(html_content):
+    """
+    Finds the ng-state script with BeautifulSoup and html.parser.
+    """
+    script_tag = BeautifulSoup(html_content, 'html.parser').find(
+        'script', {'id': SCRIPT_ID, 'type': SCRIPT_TYPE})
+    return (script_tag.string or None) if script_tag else None
+
+
+# Fastest first, as measured by bench_ng_state.py on real-size pages
+BACKENDS = {
+    'scan': (find_with_scan, True),
+    'selectolax': (find_with_selectolax, LexborHTMLParser is not None),
+    'lxml': (find_with_lxml, lxml_html is not None),
+    'html.parser': (find_with_html_parser, True),
+}
+
+
+def available_backends():
+    """
+    Returns the names of usable backends, fastest first.
+    """
+    return [name for name, (_, available) in BACKENDS.items() if available]
+
+
+def get_backend(name=None):
+    """
+    Returns the finder function for the named backend, or the fastest
+    available one when name is None.
+    """
+    if name is None:
+        name = available_backends()[0]
+    finder, available = BACKENDS[name]
+    if not available:
+        raise ValueError(f"ng-state backend '{name}' is not installed")
+    return finder
+
+
+def find_ng_state_text(html_content, backend=None):
+    """
+    Returns the raw text of the ng-state script in html_content, or None.
+    """
+    return get_backend(backend)(html_content)
+
+
+def loads_state(state_text):
+    """
+    Decodes ng-state JSON text with the fastest available JSON backend.
+    Both backends raise json.JSONDecodeError (or a subclass) on bad input.
+    """
+    if orjson is not None:
+        return orjson.loads(state_text)
+    return json.loads(state_text)
@@ -0,0 +1,208 @@
+"""
+ocr_service.py
+
+In-memory OCR for ACGME screenshots. Images are preprocessed (grayscale,
+upscale, threshold) before tesseract sees them, OCR text is cached by the
+SHA-256 of the image bytes, and a process pool lets the scraper submit
+screenshots and move on to the next program while tesseract runs on other
+cores; the results are collected later and reconciled into the output.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import re
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+import pytesseract
+from PIL import Image
+
+ACADEMIC_YEAR_RE = re.compile(r'\b(20\d{2} - 20\d{2})\b')
+# Element screenshots are taken at screen resolution; tesseract reads small
+# table text much better at 2x with a hard black/white threshold
+OCR_SCALE = 2
+OCR_THRESHOLD = 160
+OCR_CACHE_SIZE = 256
+
+
+def find_academic_year(text: str) -> Optional[str]:
+    """
+    Returns the first "YYYY - YYYY" academic year in OCR text, or None.
+    """
+    for match in ACADEMIC_YEAR_RE.findall(text or ''):
+        if match and match != '-':
+            return match
+    return None
+
+
+def image_digest(image_bytes: bytes) -> str:
+    """
+    Returns the cache key (SHA-256 hex digest) of an encoded image.
+    """
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def preprocess_image(image):
+    """
+    Converts a screenshot to an upscaled black-and-white image for OCR.
+    """
+    gray = image.convert('L')
+    if OCR_SCALE != 1:
+        gray = gray.resize((gray.width * OCR_SCALE, gray.height * OCR_SCALE))
+    return gray.point(lambda value: 255 if value > OCR_THRESHOLD else 0)
+
+
+def ocr_text_from_bytes(image_bytes: bytes, preprocess: bool = True) -> str:
+    """
+    OCRs an in-memory screenshot and returns the text ('' on failure).
+    """
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        if preprocess:
+            image = preprocess_image(image)
+        return pytesseract.image_to_string(image)
+    except (OSError, ValueError) as err:
+        logging.error("OCR failed: %s", err)
+        return ''
+
+
+def ocr_year_from_bytes(image_bytes: bytes) -> Optional[str]:
+    """
+    OCRs an in-memory screenshot and returns the academic year found, or None.
+    Runs in the worker processes.
+    """
+    return find_academic_year(ocr_text_from_bytes(image_bytes))
+
+
+class OcrTextCache:
+    """
+    Bounded LRU cache of OCR text keyed by image digest, so identical
+    screenshots (e.g. across retries) are only OCR'd once.
+    """
+
+    def __init__(self, maxsize: int = OCR_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._texts = OrderedDict()
+
+    def text(self, image_bytes: bytes) -> str:
+        """
+        Returns the OCR text of image_bytes, running tesseract only on a miss.
+        """
+        digest = image_digest(image_bytes)
+        if digest in self._texts:
+            self.hits += 1
+            self._texts.move_to_end(digest)
+            return self._texts[digest]
+        self.misses += 1
+        text = ocr_text_from_bytes(image_bytes)
+        self._texts[digest] = text
+        if len(self._texts) > self.maxsize:
+            self._texts.popitem(last=False)
+        return text
+
+    def year(self, image_bytes: bytes) -> Optional[str]:
+        """
+        Returns the academic year in image_bytes, or None.
+        """
+        return find_academic_year(self.text(image_bytes))
+
+    def __len__(self):
+        return len(self._texts)
+
+
+TEXT_CACHE = OcrTextCache()
+
+
+class OcrService:
+    """
+    Runs OCR jobs in a process pool. Jobs are tracked per program_id; a
+    program's result is the first year found by any of its screenshots.
+    Identical images share one job (keyed by digest, last OCR_CACHE_SIZE kept).
+    """
+
+    def __init__(self, workers: Optional[int] = None, executor=None):
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = executor or ProcessPoolExecutor(max_workers=self.workers)
+        self._pending = {}
+        self._jobs = OrderedDict()
+        self.submitted = 0
+
+    def submit(self, program_id, image_bytes: bytes) -> None:
+        """
+        Queues OCR of one screenshot of program_id.
+        """
+        digest = image_digest(image_bytes)
+        future = self._jobs.get(digest)
+        if future is None:
+            future = self._executor.submit(ocr_year_from_bytes, image_bytes)
+            self._jobs[digest] = future
+            if len(self._jobs) > OCR_CACHE_SIZE:
+                self._jobs.popitem(last=False)
+            self.submitted += 1
+        else:
+            self._jobs.move_to_end(digest)
+        self._pending.setdefault(str(program_id), []).append(future)
+        logging.debug("Queued OCR for %s (%d jobs pending)", program_id, self.pending_count())
+
+    def pending_count(self) -> int:
+        """
+        Number of OCR jobs not yet collected.
+        """
+        return sum(len(futures) for futures in self._pending.values())
+
+    def has_pending(self, program_id) -> bool:
+        """
+        Returns True if program_id has OCR jobs whose results are not yet collected.
+        """
+        return str(program_id) in self._pending
+
+    def _collect(self, program_id, futures) -> Optional[str]:
+        year = None
+        for future in futures:
+            try:
+                result = future.result()
+            except Exception as err:
+                logging.error("OCR job for %s failed: %s", program_id, err)
+                continue
+            if result and year is None:
+                year = result
+        return year
+
+    def completed(self) -> Dict[str, Optional[str]]:
+        """
+        Returns {program_id: year or None} for programs whose OCR jobs have
+        all finished, without waiting for the others.
+        """
+        results = {}
+        for program_id, futures in list(self._pending.items()):
+            if all(future.done() for future in futures):
+                del self._pending[program_id]
+                results[program_id] = self._collect(program_id, futures)
+        return results
+
+    def drain(self) -> Dict[str, Optional[str]]:
+        """
+        Waits for every outstanding OCR job and returns {program_id: year or None}.
+        """
+        results = {}
+        for program_id, futures in list(self._pending.items()):
+            results[program_id] = self._collect(program_id, futures)
+        self._pending.clear()
+        return results
+
+    def close(self) -> None:
+        """
+        Shuts down the worker pool.
+        """
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
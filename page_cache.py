@@ -0,0 +1,286 @@
+"""
+page_cache.py
+
+Persistent on-disk response cache for FREIDA and ACGME pages, keyed by URL.
+Each entry is a body file plus a small JSON metadata file named after the
+SHA-256 of the URL. Entries younger than the TTL are served directly; older
+ones are revalidated with If-None-Match / If-Modified-Since. When the cache
+grows past its size limit the least recently used entries are evicted.
+
+The cache plugs into Playwright contexts as a route handler (install it before
+the resource blocker so blocked requests never reach it) and into the HTTP
+path through http_fetch.fetch_html(..., cache=...).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import Counter
+
+CACHE_DIR = os.getenv("PAGE_CACHE_DIR") or ".page_cache"
+DEFAULT_TTL = 24 * 3600
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+CACHEABLE_TYPES = frozenset(('document', 'xhr', 'fetch'))
+# Bodies are stored decoded, so these must not be replayed with them
+DROPPED_HEADERS = frozenset((
+    'content-encoding', 'content-length', 'transfer-encoding', 'connection',
+    'keep-alive', 'set-cookie'))
+
+
+def cache_key(url):
+    """
+    Returns the cache key (SHA-256 hex digest) for a URL.
+    """
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+
+def _storable_headers(headers):
+    return {name.lower(): value for name, value in dict(headers).items()
+            if name.lower() not in DROPPED_HEADERS}
+
+
+class PageCache:
+    """
+    URL-keyed response cache in `directory` with a freshness `ttl` in seconds
+    and a `max_bytes` limit on stored bodies. Counts hits, misses,
+    revalidations, stores and evictions in `stats`.
+    """
+
+    def __init__(self, directory=CACHE_DIR, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = Counter()
+        os.makedirs(directory, exist_ok=True)
+        # key -> [body size, last access time]
+        self._index = {}
+        for entry in os.scandir(directory):
+            if entry.name.endswith('.json'):
+                key = entry.name[:-5]
+                body_path = self._body_path(key)
+                if os.path.exists(body_path):
+                    self._index[key] = [
+                        os.path.getsize(body_path), entry.stat().st_mtime]
+        self.total_bytes = sum(size for size, _ in self._index.values())
+
+    def _body_path(self, key):
+        return os.path.join(self.directory, key + '.body')
+
+    def _meta_path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, url):
+        """
+        Returns the cached entry for url as a dict (url, status, headers,
+        stored_at, body) regardless of freshness, or None.
+        """
+        key = cache_key(url)
+        if key not in self._index:
+            return None
+        try:
+            with open(self._meta_path(key), "r", encoding="utf-8") as file_obj:
+                entry = json.load(file_obj)
+            with open(self._body_path(key), "rb") as file_obj:
+                entry['body'] = file_obj.read()
+        except (OSError, ValueError) as err:
+            logging.debug("Dropping unreadable cache entry for %s: %s", url, err)
+            self._remove(key)
+            return None
+        now = time.time()
+        self._index[key][1] = now
+        os.utime(self._meta_path(key), (now, now))
+        return entry
+
+    def is_fresh(self, entry):
+        """
+        Returns True if the entry is younger than the TTL.
+        """
+        return time.time() - entry['stored_at'] < self.ttl
+
+    @staticmethod
+    def validators(entry):
+        """
+        Returns conditional request headers for revalidating an entry.
+        """
+        headers = {}
+        if entry is None:
+            return headers
+        if entry['headers'].get('etag'):
+            headers['If-None-Match'] = entry['headers']['etag']
+        if entry['headers'].get('last-modified'):
+            headers['If-Modified-Since'] = entry['headers']['last-modified']
+        return headers
+
+    def put(self, url, status, headers, body):
+        """
+        Stores a response. Responses marked no-store are skipped. Returns True
+        if the response was stored.
+        """
+        headers = _storable_headers(headers)
+        if 'no-store' in headers.get('cache-control', ''):
+            return False
+        key = cache_key(url)
+        meta = {'url': url, 'status': status, 'headers': headers, 'stored_at': time.time()}
+        for path, data, mode in ((self._body_path(key), body, "wb"),
+                                 (self._meta_path(key), json.dumps(meta), "w")):
+            tmp_path = path + ".tmp"
+            with open(tmp_path, mode) as file_obj:
+                file_obj.write(data)
+            os.replace(tmp_path, path)
+        old_size = self._index.get(key, [0])[0]
+        self._index[key] = [len(body), time.time()]
+        self.total_bytes += len(body) - old_size
+        self.stats['stores'] += 1
+        self.evict()
+        return True
+
+    def touch(self, url):
+        """
+        Marks an entry as revalidated (fresh again) after a 304 response.
+        """
+        key = cache_key(url)
+        meta_path = self._meta_path(key)
+        with open(meta_path, "r", encoding="utf-8") as file_obj:
+            meta = json.load(file_obj)
+        meta['stored_at'] = time.time()
+        with open(meta_path, "w", encoding="utf-8") as file_obj:
+            json.dump(meta, file_obj)
+        self.stats['revalidated'] += 1
+
+    def _remove(self, key):
+        size, _ = self._index.pop(key, (0, 0))
+        self.total_bytes -= size
+        for path in (self._body_path(key), self._meta_path(key)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def evict(self):
+        """
+        Removes least recently used entries until the cache fits in max_bytes.
+        """
+        if self.total_bytes <= self.max_bytes:
+            return
+        for key, _ in sorted(self._index.items(), key=lambda item: item[1][1]):
+            if self.total_bytes <= self.max_bytes:
+                break
+            self._remove(key)
+            self.stats['evictions'] += 1
+
+    def lookup(self, url):
+        """
+        Returns (entry, fresh): the cached entry for url (or None) and whether
+        it can be served without revalidation. Updates hit/miss counts.
+        """
+        entry = self.get(url)
+        fresh = entry is not None and self.is_fresh(entry)
+        self.stats['hits' if fresh else 'misses'] += 1
+        return entry, fresh
+
+    def _cacheable(self, request):
+        return request.method == 'GET' and request.resource_type in CACHEABLE_TYPES
+
+    def _fetch_failed(self, url, entry, err):
+        """
+        Records a failed fetch. Returns True if a stale entry can be served
+        instead; otherwise the request should fall through to the network.
+        """
+        self.stats['fetch_errors'] += 1
+        if entry is None:
+            logging.debug("Cache fetch failed for %s: %s", url, err)
+            return False
+        logging.debug("Cache fetch failed for %s, serving stale entry: %s", url, err)
+        self.stats['stale_served'] += 1
+        return True
+
+    def handle(self, route):
+        """
+        Route handler for playwright.sync_api contexts: serves fresh entries,
+        revalidates stale ones and stores new 200 responses. If the fetch
+        fails, a stale entry is served, or the request falls through.
+        """
+        request = route.request
+        if not self._cacheable(request):
+            route.fallback()
+            return
+        entry, fresh = self.lookup(request.url)
+        if not fresh:
+            headers = {**request.headers, **self.validators(entry)}
+            try:
+                response = route.fetch(headers=headers)
+                revalidated = response.status == 304 and entry is not None
+                body = None if revalidated else response.body()
+            except Exception as err:
+                if not self._fetch_failed(request.url, entry, err):
+                    route.fallback()
+                    return
+            else:
+                if revalidated:
+                    self.touch(request.url)
+                else:
+                    if response.status == 200:
+                        self.put(request.url, response.status, response.headers, body)
+                    route.fulfill(response=response, body=body)
+                    return
+        route.fulfill(status=entry['status'], headers=entry['headers'], body=entry['body'])
+
+    async def handle_async(self, route):
+        """
+        Route handler for playwright.async_api contexts.
+        """
+        request = route.request
+        if not self._cacheable(request):
+            await route.fallback()
+            return
+        entry, fresh = self.lookup(request.url)
+        if not fresh:
+            headers = {**request.headers, **self.validators(entry)}
+            try:
+                response = await route.fetch(headers=headers)
+                revalidated = response.status == 304 and entry is not None
+                body = None if revalidated else await response.body()
+            except Exception as err:
+                if not self._fetch_failed(request.url, entry, err):
+                    await route.fallback()
+                    return
+            else:
+                if revalidated:
+                    self.touch(request.url)
+                else:
+                    if response.status == 200:
+                        self.put(request.url, response.status, response.headers, body)
+                    await route.fulfill(response=response, body=body)
+                    return
+        await route.fulfill(status=entry['status'], headers=entry['headers'], body=entry['body'])
+
+    def install(self, context):
+        """
+        Installs the cache on a sync browser context. Install it before any
+        ResourceBlocker: Playwright runs the last registered handler first,
+        so blocked requests are aborted before they reach the cache.
+        """
+        context.route("**/*", self.handle)
+
+    async def install_async(self, context):
+        """
+        Installs the cache on an async browser context (see install).
+        """
+        await context.route("**/*", self.handle_async)
+
+    def summary(self):
+        """
+        Returns a one-line description of cache activity.
+        """
+        return (
+            f"{self.stats['hits']} hits, {self.stats['misses']} misses,"
+            f" {self.stats['revalidated']} revalidated, {self.stats['stores']} stored,"
+            f" {self.stats['evictions']} evicted, {self.stats['fetch_errors']} fetch errors;"
+            f" {len(self._index)} entries,"
+            f" {self.total_bytes / 1e6:.1f} MB in {self.directory}")
+
+    def log_summary(self):
+        """
+        Logs the cache summary at INFO level.
+        """
+        logging.info("Page cache: %s", self.summary())
@@ -1,7 +1,7 @@
 """
 program_extract.py
 
-Legacy script for extracting detailed FREIDA program information, including director and contact info, using Playwright and BeautifulSoup.
+Legacy script for extracting detailed FREIDA program information, including director and contact info, using Playwright and the ng-state transfer state.
 """
 
 import json
@@ -12,9 +12,12 @@ import sys
 import time
 
 import pandas as pd
-from bs4 import BeautifulSoup
 from playwright.sync_api import sync_playwright
 
+from ng_state import find_ng_state_text, loads_state
+from rate_limiter import site_controller
+from utils import IncludedIndex, find_included_node
+
 # Set flags from CLI
 DEBUG_MODE = '--debug' in sys.argv
 EXIT_ON_ERRORS = '--exit-on-errors' in sys.argv
@@ -27,19 +30,6 @@ logging.basicConfig(
 PROGRAM_DETAIL_URL_TEMPLATE = "https://freida.ama-assn.org/program/{}"
 
 
-def find_included_node(type_name, node_id, included_list):
-    """
-    Finds and returns a node from included_list matching the given type and id.
-    """
-    if not type_name or not node_id:
-        return None
-    for node in included_list:
-        if isinstance(node, dict) and node.get(
-                'type') == type_name and node.get('id') == node_id:
-            return node
-    return None
-
-
 def extract_program_detail(page, program_id):
     """
     Extracts all available details for a given program_id from the FREIDA program detail page.
@@ -51,17 +41,14 @@ def extract_program_detail(page, program_id):
         page.goto(url, wait_until="domcontentloaded")
         page.wait_for_selector("div.survey-info", timeout=15000)
         html_content = page.content()
-        soup = BeautifulSoup(html_content, 'html.parser')
 
         if DEBUG_MODE:
             screenshot_file = f"debug_snapshot_{program_id}.png"
             page.screenshot(path=screenshot_file, full_page=True)
             logging.debug(f"📸 Saved screenshot to {screenshot_file}")
 
-        script_tag = soup.find(
-            'script', {
-                'id': 'ng-state', 'type': 'application/json'})
-        if not script_tag or not script_tag.string:
+        state_text = find_ng_state_text(html_content)
+        if not state_text:
             error = "Missing ng-state JSON"
             logging.error(error)
             if EXIT_ON_ERRORS:
@@ -72,7 +59,7 @@ def extract_program_detail(page, program_id):
                 "error": error}
 
         try:
-            full_json_data = json.loads(script_tag.string)
+            full_json_data = loads_state(state_text)
         except json.JSONDecodeError as e:
             error = f"Malformed JSON: {e}"
             logging.error(error)
@@ -83,7 +70,7 @@ def extract_program_detail(page, program_id):
                 "source_url": url,
                 "error": error}
 
-        raw_json = json.dumps(full_json_data)
+        raw_json = state_text
         full_json_payload = None
 
         for key, value in full_json_data.items():
@@ -131,7 +118,7 @@ def extract_program_detail(page, program_id):
                 "source_url": url,
                 "error": error}
 
-        included_nodes = api_data.get('included', [])
+        included_nodes = IncludedIndex(api_data.get('included', []))
 
         prog_attrs = program_node.get('attributes', {})
         prog_rels = program_node.get('relationships', {})
@@ -236,6 +223,7 @@ def extract_program_detail(page, program_id):
 def visit_all_program_ids():
     ids_df = pd.read_csv("freida_program_ids.csv")
     all_programs = []
+    controller = site_controller('freida')
     with sync_playwright() as p:
         browser = p.chromium.launch(headless=True)
         context = browser.new_context()
@@ -244,7 +232,10 @@ def visit_all_program_ids():
         for idx, row in ids_df.iterrows():
             logging.debug(
                 f"Processing row {idx + 1}/{len(ids_df)}: Program ID {row['program_id']}")
+            controller.wait()
+            started = time.monotonic()
             result = extract_program_detail(page, row["program_id"])
+            controller.record(time.monotonic() - started, result.get('error'))
             all_programs.append(result)
 
             if (idx + 1) % 25 == 0 or idx == 1:
@@ -254,9 +245,8 @@ def visit_all_program_ids():
                 df_partial.to_csv(partial_file, index=False)
                 logging.info(f"📄 Saved checkpoint to {partial_file}")
 
-            time.sleep(2.0)
-
         browser.close()
+    controller.log_summary()
 
     return all_programs
 
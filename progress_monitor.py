@@ -10,6 +10,8 @@ import signal
 import subprocess
 import random
 
+from state_store import STATE_DB, StateStore
+
 FAILED_CSV = "freida_programs_output_failed.csv"
 SUCCESS_CSV = "freida_programs_output_success.csv"
 TOTAL_CSV = "freida_programs_output_with_academic_year.csv"
@@ -55,15 +57,25 @@ def count_records(csv_path):
         return sum(1 for _ in f) - 1  # subtract header
 
 
+def count_progress():
+    """
+    Return (failed, success, total) record counts, from the SQLite state store
+    when one exists (a single indexed query) and from the CSVs otherwise.
+    """
+    if os.path.exists(STATE_DB):
+        with StateStore(STATE_DB) as store:
+            counts = store.counts()
+        return counts['failed'] + counts['pending'], counts['done'], counts['total']
+    return count_records(FAILED_CSV), count_records(SUCCESS_CSV), count_records(TOTAL_CSV)
+
+
 def main():
     """Monitor progress, detect stalls, and restart the scraper if needed."""
     log("Monitoring progress. Press Ctrl+C to stop.")
-    total = count_records(TOTAL_CSV)
     last_failed = last_success = None
     stall_count = 0
     while True:
-        failed = count_records(FAILED_CSV)
-        success = count_records(SUCCESS_CSV)
+        failed, success, total = count_progress()
         remaining = failed
         done = success
         if remaining < 0:
@@ -0,0 +1,160 @@
+"""
+rate_limiter.py
+
+Request pacing shared by the FREIDA and ACGME scrapers: a per-site adaptive
+(AIMD) rate controller.
+"""
+
+import asyncio
+import logging
+import re
+import time
+
+
+# Error text that means the site is pushing back rather than the page being odd
+BLOCK_MARKERS = ('too many requests', 'access denied', 'captcha', 'forbidden')
+# Status codes only as whole numbers, so program IDs like 1403521292 in URLs don't match
+BLOCK_STATUS_PATTERN = re.compile(r'\b(403|429)\b')
+TIMEOUT_MARKERS = ('timeout', 'timed out')
+
+SITE_LIMITS = {
+    # Start at the old fixed pauses (2 s per program page, 1.5 s per ACGME lookup)
+    'freida': {'initial_rate': 0.5, 'max_rate': 4.0, 'increase': 0.25, 'latency_target': 10.0},
+    'acgme': {'initial_rate': 0.67, 'max_rate': 2.0, 'increase': 0.1, 'latency_target': 20.0},
+}
+
+_site_controllers = {}
+
+
+def classify_error(error):
+    """
+    Returns 'blocked', 'timeout' or 'error' for an error message, or None for no error.
+    """
+    if not error:
+        return None
+    text = str(error).lower()
+    if BLOCK_STATUS_PATTERN.search(text) or any(marker in text for marker in BLOCK_MARKERS):
+        return 'blocked'
+    if any(marker in text for marker in TIMEOUT_MARKERS):
+        return 'timeout'
+    return 'error'
+
+
+class AIMDRateController:
+    """
+    Adaptive request pacing for one site. The rate grows by `increase` req/s
+    after each healthy response (no error, latency within `latency_target`)
+    and is multiplied by `decrease` on timeouts or block signals; other
+    errors and slow responses hold it. The rate stays within
+    [min_rate, max_rate]; a max_rate of None or 0 disables pacing.
+    Usable from blocking loops (wait) and asyncio workers (acquire).
+    """
+
+    def __init__(self, site, initial_rate=0.5, min_rate=0.1, max_rate=4.0,
+                 increase=0.1, decrease=0.5, latency_target=None):
+        self.site = site
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.rate = min(initial_rate, max_rate) if max_rate else initial_rate
+        self.decisions = {'increase': 0, 'hold': 0, 'decrease': 0}
+        self._next_slot = 0.0
+
+    def set_max_rate(self, max_rate):
+        """
+        Changes the rate ceiling (e.g. from --max-rate), clamping the current rate.
+        """
+        self.max_rate = max_rate
+        if max_rate:
+            self.rate = min(self.rate, max_rate)
+
+    def _reserve(self, now):
+        if not self.max_rate:
+            return now
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + 1.0 / self.rate
+        return slot
+
+    def wait(self):
+        """
+        Sleeps until the next request slot at the current rate.
+        """
+        now = time.monotonic()
+        slot = self._reserve(now)
+        if slot > now:
+            time.sleep(slot - now)
+
+    async def acquire(self):
+        """
+        Waits for the next request slot without blocking the event loop.
+        Slots are reserved before sleeping, so concurrent workers share the rate.
+        """
+        now = time.monotonic()
+        slot = self._reserve(now)
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def record(self, latency=None, error=None):
+        """
+        Adjusts the rate from one response: its latency in seconds and its
+        error message (None on success). Returns the decision taken.
+        """
+        kind = classify_error(error)
+        old_rate = self.rate
+        if kind in ('blocked', 'timeout'):
+            decision = 'decrease'
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            # Back off immediately rather than after the already-reserved slot
+            self._next_slot = max(self._next_slot, time.monotonic() + 1.0 / self.rate)
+            logging.info(
+                "Rate control [%s]: %.2f -> %.2f req/s (%s: %s)",
+                self.site, old_rate, self.rate, kind, str(error)[:80])
+        elif kind is None and (self.latency_target is None or latency is None
+                               or latency <= self.latency_target):
+            decision = 'increase'
+            ceiling = self.max_rate or float('inf')
+            self.rate = min(ceiling, self.rate + self.increase)
+            logging.debug(
+                "Rate control [%s]: %.2f -> %.2f req/s (ok in %s s)",
+                self.site, old_rate, self.rate,
+                f"{latency:.2f}" if latency is not None else '?')
+        else:
+            decision = 'hold'
+            logging.debug(
+                "Rate control [%s]: holding %.2f req/s (%s)",
+                self.site, self.rate,
+                kind or f"slow response {latency:.2f} s")
+        self.decisions[decision] += 1
+        return decision
+
+    def summary(self):
+        """
+        Returns the current rate and decision counts.
+        """
+        return {'site': self.site, 'rate': round(self.rate, 3), **self.decisions}
+
+    def log_summary(self):
+        """
+        Logs the current rate and how often it was raised, held or cut.
+        """
+        logging.info(
+            "Rate control [%s]: ending at %.2f req/s after %d increases, %d holds, %d decreases",
+            self.site, self.rate, self.decisions['increase'], self.decisions['hold'],
+            self.decisions['decrease'])
+
+
+def site_controller(site, max_rate=None):
+    """
+    Returns the shared AIMDRateController for a site ('freida' or 'acgme'),
+    creating it from SITE_LIMITS on first use. max_rate, if given, replaces
+    the site's ceiling.
+    """
+    controller = _site_controllers.get(site)
+    if controller is None:
+        controller = AIMDRateController(site, **SITE_LIMITS.get(site, {}))
+        _site_controllers[site] = controller
+    if max_rate is not None:
+        controller.set_max_rate(max_rate)
+    return controller
@@ -0,0 +1,215 @@
+"""
+resume.py
+
+Helpers for resuming FREIDA runs: reading program IDs, loading the set of
+IDs already written to earlier output files or checkpoints, and compacting an
+output file once failed programs have been retried into it.
+"""
+
+import csv
+import glob
+import json
+import logging
+import os
+from array import array
+from bisect import bisect_left
+
+import pandas as pd
+
+from schema import is_parquet, parquet_part_files, read_table, write_table
+
+LEGACY_CHECKPOINT_GLOB = "freida_partial_*.csv"
+_INT64_MAX = 2 ** 63 - 1
+# Fields an error record has too; a row needs something else to count as scraped
+ID_ONLY_FIELDS = ('program_id', 'source_url', 'error')
+
+
+class CompactIdSet:
+    """
+    Membership set for program IDs. Numeric IDs are kept in a sorted
+    array('q') at 8 bytes each; anything non-numeric falls back to a set.
+    """
+
+    def __init__(self, ids=()):
+        self._numeric = array('q')
+        self._other = set()
+        self._sorted = True
+        for program_id in ids:
+            self.add(program_id)
+
+    @staticmethod
+    def _as_int(program_id):
+        text = str(program_id).strip()
+        if text.isdigit() and int(text) <= _INT64_MAX:
+            return int(text)
+        return None
+
+    def add(self, program_id):
+        """
+        Adds a program ID (int or str).
+        """
+        number = self._as_int(program_id)
+        if number is None:
+            self._other.add(str(program_id).strip())
+        else:
+            self._numeric.append(number)
+            self._sorted = False
+
+    def _ensure_sorted(self):
+        if not self._sorted:
+            self._numeric = array('q', sorted(set(self._numeric)))
+            self._sorted = True
+
+    def __contains__(self, program_id):
+        number = self._as_int(program_id)
+        if number is None:
+            return str(program_id).strip() in self._other
+        self._ensure_sorted()
+        pos = bisect_left(self._numeric, number)
+        return pos < len(self._numeric) and self._numeric[pos] == number
+
+    def __len__(self):
+        self._ensure_sorted()
+        return len(self._numeric) + len(self._other)
+
+
+def read_program_ids(path):
+    """
+    Streams the program_id column of an ID CSV as strings.
+    """
+    with open(path, "r", encoding="utf-8", newline="") as file_obj:
+        for row in csv.DictReader(file_obj):
+            program_id = (row.get('program_id') or '').strip()
+            if program_id:
+                yield program_id
+
+
+def _is_blank(value):
+    if value is None or value is pd.NA or (isinstance(value, float) and value != value):
+        return True
+    return isinstance(value, str) and value.strip() == ''
+
+
+def is_scraped(row):
+    """
+    Returns True if an output row holds scraped data. Error records carry only
+    program_id and source_url (sinks drop the error text), so rows without any
+    other populated field are failed scrapes that should be retried.
+    """
+    if row.get('error'):
+        return False
+    return any(
+        not _is_blank(value) for key, value in row.items() if key not in ID_ONLY_FIELDS)
+
+
+def _rows_from_file(path):
+    if path.endswith('.jsonl'):
+        with open(path, "r", encoding="utf-8") as file_obj:
+            for line in file_obj:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # A crash can leave a truncated last line behind
+                    continue
+    elif is_parquet(path):
+        # Part files are the records flushed by a run that has not closed yet
+        sources = ([path] if os.path.exists(path) else []) + parquet_part_files(path)
+        for source in sources:
+            yield from read_table(source).to_dict('records')
+    else:
+        with open(path, "r", encoding="utf-8", newline="") as file_obj:
+            yield from csv.DictReader(file_obj)
+
+
+def _ids_from_file(path):
+    for row in _rows_from_file(path):
+        program_id = row.get('program_id')
+        if not _is_blank(program_id) and is_scraped(row):
+            yield str(program_id).strip()
+
+
+def load_completed_ids(paths, include_legacy_checkpoints=True):
+    """
+    Returns a CompactIdSet of program IDs found in the given output files
+    (CSV, JSONL or Parquet) and, optionally, in legacy freida_partial_*.csv checkpoints.
+    Rows from failed scrapes (see is_scraped) are left out so they are retried.
+    Missing files are skipped.
+    """
+    paths = list(paths)
+    if include_legacy_checkpoints:
+        paths.extend(sorted(glob.glob(LEGACY_CHECKPOINT_GLOB)))
+    completed = CompactIdSet()
+    for path in paths:
+        if not os.path.exists(path) and not parquet_part_files(path):
+            continue
+        before = len(completed)
+        for program_id in _ids_from_file(path):
+            completed.add(program_id)
+        logging.info(
+            "Loaded %d completed program IDs from %s", len(completed) - before, path)
+    return completed
+
+
+def _last_row_positions(rows):
+    """
+    Returns the positions of the last row for each program_id, plus every
+    row without one.
+    """
+    last = {}
+    keep = set()
+    for position, row in enumerate(rows):
+        program_id = row.get('program_id')
+        if _is_blank(program_id):
+            keep.add(position)
+        else:
+            last[str(program_id).strip()] = position
+    return keep | set(last.values())
+
+
+def compact_output(path):
+    """
+    Rewrites an output file (CSV, JSONL or Parquet) keeping only the last row
+    per program_id. A resumed run appends retried programs after their failed
+    rows, so this leaves one row per program for the later stages. The file is
+    replaced atomically. Returns the number of rows dropped.
+    """
+    if not os.path.exists(path):
+        return 0
+    if is_parquet(path):
+        df = read_table(path)
+        keep = _last_row_positions(df.to_dict('records'))
+        dropped = len(df) - len(keep)
+        if dropped:
+            write_table(df.iloc[sorted(keep)], path)
+    else:
+        keep = _last_row_positions(_rows_from_file(path))
+        tmp_path = path + ".tmp"
+        total = 0
+        with open(tmp_path, "w", encoding="utf-8", newline="") as out:
+            if path.endswith('.jsonl'):
+                for position, row in enumerate(_rows_from_file(path)):
+                    total += 1
+                    if position in keep:
+                        out.write(json.dumps(row, ensure_ascii=False) + "\n")
+            else:
+                with open(path, "r", encoding="utf-8", newline="") as file_obj:
+                    reader = csv.DictReader(file_obj)
+                    writer = csv.DictWriter(out, fieldnames=reader.fieldnames or [])
+                    writer.writeheader()
+                    for position, row in enumerate(reader):
+                        total += 1
+                        if position in keep:
+                            writer.writerow(row)
+            out.flush()
+            os.fsync(out.fileno())
+        dropped = total - len(keep)
+        if dropped:
+            os.replace(tmp_path, path)
+        else:
+            os.remove(tmp_path)
+    if dropped:
+        logging.info("Compacted %s: dropped %d superseded rows", path, dropped)
+    return dropped
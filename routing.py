@@ -0,0 +1,150 @@
+"""
+routing.py
+
+Playwright routing policies that abort non-essential requests (images, fonts,
+analytics, ads, ...) for the FREIDA and ACGME browser contexts.
+"""
+
+import logging
+from collections import Counter
+from urllib.parse import urlparse
+
+# Aborted responses are never downloaded, so their size is unknown. These
+# typical transfer sizes are used to estimate the bandwidth saved.
+TYPICAL_RESOURCE_BYTES = {
+    'image': 40000,
+    'media': 250000,
+    'font': 30000,
+    'stylesheet': 25000,
+    'script': 60000,
+    'document': 30000,
+    'xhr': 5000,
+    'fetch': 5000,
+}
+DEFAULT_RESOURCE_BYTES = 5000
+
+FREIDA_DOMAINS = ("ama-assn.org",)
+ACGME_DOMAINS = ("acgme.org",)
+
+
+class ResourceBlocker:
+    """
+    Routing policy for one site. Aborts requests whose resource type is in
+    blocked_types, and requests to hosts outside first_party_domains when
+    block_third_party is set. Keeps counts of what it blocked.
+    """
+
+    def __init__(
+            self,
+            name,
+            first_party_domains,
+            blocked_types,
+            block_third_party=True,
+            allowed_hosts=()):
+        self.name = name
+        self.first_party_domains = tuple(first_party_domains)
+        self.blocked_types = frozenset(blocked_types)
+        self.block_third_party = block_third_party
+        self.allowed_hosts = tuple(allowed_hosts)
+        self.allowed_requests = 0
+        self.blocked_requests = Counter()
+        self.estimated_bytes_saved = 0
+
+    def is_first_party(self, url):
+        """
+        Returns True if the URL's host belongs to one of the site's domains or
+        to an explicitly allowed host.
+        """
+        host = urlparse(url).hostname or ''
+        for domain in self.first_party_domains + self.allowed_hosts:
+            if host == domain or host.endswith('.' + domain):
+                return True
+        return False
+
+    def block_reason(self, request):
+        """
+        Returns why the request should be aborted, or None to let it through.
+        """
+        resource_type = request.resource_type
+        if resource_type == 'document' and request.frame.parent_frame is None:
+            # Never block top-level navigations
+            return None
+        if resource_type in self.blocked_types:
+            return resource_type
+        if self.block_third_party and not self.is_first_party(request.url):
+            return 'third-party'
+        return None
+
+    def _decide(self, request):
+        reason = self.block_reason(request)
+        if reason is None:
+            self.allowed_requests += 1
+            return False
+        self.blocked_requests[reason] += 1
+        self.estimated_bytes_saved += TYPICAL_RESOURCE_BYTES.get(
+            request.resource_type, DEFAULT_RESOURCE_BYTES)
+        return True
+
+    def handle(self, route):
+        """
+        Route handler for playwright.sync_api contexts.
+        """
+        if self._decide(route.request):
+            route.abort()
+        else:
+            route.fallback()
+
+    async def handle_async(self, route):
+        """
+        Route handler for playwright.async_api contexts.
+        """
+        if self._decide(route.request):
+            await route.abort()
+        else:
+            await route.fallback()
+
+    def install(self, context):
+        """
+        Installs the policy on a sync browser context.
+        """
+        context.route("**/*", self.handle)
+
+    async def install_async(self, context):
+        """
+        Installs the policy on an async browser context.
+        """
+        await context.route("**/*", self.handle_async)
+
+    def summary(self):
+        """
+        Returns a one-line description of what the policy saved so far.
+        """
+        blocked = sum(self.blocked_requests.values())
+        by_reason = ", ".join(
+            f"{reason}: {count}" for reason, count in self.blocked_requests.most_common())
+        return (
+            f"{self.name}: blocked {blocked} of {blocked + self.allowed_requests} requests"
+            f" ({by_reason or 'none'}), ~{self.estimated_bytes_saved / 1e6:.1f} MB saved (estimated)")
+
+    def log_summary(self):
+        """
+        Logs the savings summary at INFO level.
+        """
+        logging.info("Resource blocking %s", self.summary())
+
+
+def freida_blocker():
+    """
+    Policy for FREIDA detail and search pages: data comes from the ng-state
+    script and Angular XHRs, so no images, media, fonts or styles are needed.
+    """
+    return ResourceBlocker(
+        'freida', FREIDA_DOMAINS, ('image', 'media', 'font', 'stylesheet'))
+
+
+def acgme_blocker():
+    """
+    Policy for ACGME pages. Stylesheets are kept because the accreditation
+    table is clicked by position and screenshotted for OCR.
+    """
+    return ResourceBlocker('acgme', ACGME_DOMAINS, ('image', 'media', 'font'))
@@ -1,30 +1,41 @@
 #!/bin/bash
 
-# Get the total number of records (excluding header) from the input CSV
-TOTAL_RECORDS=$(awk 'END{print NR-1}' freida_programs_output.csv)
+# Progress is tracked per program in the SQLite state store; the CSVs are
+# exported from it once processing is finished.
+STATE_DB="${STATE_DB:-pipeline_state.db}"
+export STATE_DB
 
 LOGFILE="run_all.log"
 
-# Batch process in groups of 5, skipping already completed records
-echo "[INFO] Starting batch processing in groups of 5..." | tee -a "$LOGFILE"
+counts() {
+  read -r TOTAL_RECORDS success_count failed_count pending_count < <(python3 state_store.py --db "$STATE_DB" counts)
+}
+
+# One long-running worker keeps a single browser open and pulls programs from
+# the store until each has succeeded or used up its attempts; it paces itself
+# with the adaptive ACGME rate controller. It is only relaunched if it exits
+# while work is still pending (e.g. a browser crash): immediately if it made
+# progress, otherwise after a backoff that doubles up to MAX_BACKOFF seconds.
+MAX_BACKOFF=60
+backoff=2
+echo "[INFO] Starting ACGME worker..." | tee -a "$LOGFILE"
+counts
 while true; do
-  python3 acgme_scraper.py >> "$LOGFILE" 2>&1
-  failed_count=$(awk 'END{print NR-1}' freida_programs_output_failed.csv)
-  success_count=$(awk 'END{print NR-1}' freida_programs_output_success.csv)
-  echo "[INFO] Remaining failed records: $failed_count | Success count: $success_count / $TOTAL_RECORDS" | tee -a "$LOGFILE"
-  if [ "$failed_count" -eq 0 ] && [ "$success_count" -ge "$TOTAL_RECORDS" ]; then
+  previous_pending=$pending_count
+  python3 acgme_scraper.py --daemon --state-db "$STATE_DB" >> "$LOGFILE" 2>&1
+  counts
+  echo "[INFO] Pending: $pending_count | Failed: $failed_count | Success count: $success_count / $TOTAL_RECORDS" | tee -a "$LOGFILE"
+  if [ "$pending_count" -eq 0 ]; then
     break
   fi
-  sleep $(( ( RANDOM % 59 )  + 2 ))
-done
-
-echo "[INFO] Batch processing complete. Handling remaining failures one at a time..." | tee -a "$LOGFILE"
-awk -F, 'NR>1{print $2}' freida_programs_output_failed.csv > failed_ids.txt
-while read id; do
-  if [ -n "$id" ]; then
-    python3 acgme_scraper.py --failed-record $id >> "$LOGFILE" 2>&1
-    sleep $(( ( RANDOM % 59 )  + 2 ))
+  if [ "$pending_count" -lt "$previous_pending" ]; then
+    backoff=2
+  else
+    echo "[INFO] No progress; relaunching in ${backoff}s" | tee -a "$LOGFILE"
+    sleep "$backoff"
+    backoff=$(( backoff * 2 > MAX_BACKOFF ? MAX_BACKOFF : backoff * 2 ))
   fi
-done < failed_ids.txt
+done
 
-echo "[INFO] All records processed!" | tee -a "$LOGFILE" 
\ No newline at end of file
+python3 state_store.py --db "$STATE_DB" export >> "$LOGFILE" 2>&1
+echo "[INFO] All records processed!" | tee -a "$LOGFILE"
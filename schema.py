@@ -0,0 +1,212 @@
+"""
+schema.py
+
+Typed schema for program records, derived from EXPECTED_FIELDS, and table
+readers/writers for the pipeline files. CSV stays the default; a path ending
+in .parquet is written as Parquet (needs pyarrow) with numeric survey fields
+as float64 and low-cardinality fields such as state and specialty_title
+dictionary-encoded, so downstream loads and filters skip string parsing.
+"""
+
+import json
+import os
+
+import pandas as pd
+
+from scraper import EXPECTED_FIELDS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+    pq = None
+
+YEAR_FIELD = 'acgme_first_academic_year'
+TABLE_FORMATS = ('csv', 'parquet')
+NUMERIC_FIELDS = frozenset((
+    'first_year_positions',
+    'interviews_conducted_last_year',
+    'avg_hours_on_duty_y1',
+    'pct_do',
+    'pct_img',
+    'pct_usmd',
+))
+# Fields with a few hundred distinct values at most across all programs
+CATEGORICAL_FIELDS = frozenset((
+    'state',
+    'specialty_title',
+    'accredited_training_length',
+    'required_training_length',
+    'affiliated_us_government',
+    'program_best_described_as',
+    'accepting_applications_2025_2026',
+    'accepting_applications_2026_2027',
+    'participates_in_eras',
+    'program_director_administrative_area',
+    'contact_administrative_area',
+    YEAR_FIELD,
+))
+# Every column a pipeline table can have, in output order
+TABLE_FIELDS = [YEAR_FIELD] + EXPECTED_FIELDS
+
+
+def column_dtype(field):
+    """
+    Returns the pandas dtype of a record field: 'Float64', 'category' or 'string'.
+    """
+    if field in NUMERIC_FIELDS:
+        return 'Float64'
+    if field in CATEGORICAL_FIELDS:
+        return 'category'
+    return 'string'
+
+
+def _scalar_text(value):
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def apply_schema(df):
+    """
+    Returns a copy of df with every known column cast to its schema dtype.
+    Numbers that do not parse become missing; lists and dicts become JSON text.
+    Unknown columns are left as they are.
+    """
+    df = df.copy()
+    for field in df.columns:
+        if field not in TABLE_FIELDS:
+            continue
+        dtype = column_dtype(field)
+        if dtype == 'Float64':
+            df[field] = pd.to_numeric(df[field], errors='coerce').astype('Float64')
+        else:
+            df[field] = df[field].map(_scalar_text, na_action='ignore').astype(dtype)
+    return df
+
+
+def arrow_schema(fields):
+    """
+    Returns the pyarrow schema for the given record fields.
+    """
+    require_pyarrow()
+    types = {
+        'Float64': pa.float64(),
+        'category': pa.dictionary(pa.int32(), pa.string()),
+        'string': pa.string(),
+    }
+    return pa.schema([(field, types[column_dtype(field)]) for field in fields])
+
+
+def arrow_row(fields, record):
+    """
+    Returns record's values for fields converted to their schema types.
+    """
+    row = {}
+    for field in fields:
+        value = record.get(field)
+        if field in NUMERIC_FIELDS:
+            number = pd.to_numeric(_scalar_text(value), errors='coerce')
+            row[field] = None if pd.isna(number) else float(number)
+        else:
+            row[field] = _scalar_text(value)
+    return row
+
+
+def require_pyarrow():
+    """
+    Raises RuntimeError if pyarrow, needed for Parquet files, is not installed.
+    """
+    if pa is None:
+        raise RuntimeError("Parquet output needs pyarrow: pip install pyarrow")
+
+
+def is_parquet(path):
+    """
+    Returns True if path names a Parquet file.
+    """
+    return str(path).endswith('.parquet')
+
+
+def table_path(path, fmt):
+    """
+    Returns path with its extension replaced for fmt ('csv' or 'parquet').
+    """
+    return os.path.splitext(path)[0] + '.' + fmt
+
+
+def parquet_parts_dir(path):
+    """
+    Returns the directory holding the part files of a Parquet file being written.
+    """
+    return path + '.parts'
+
+
+def parquet_part_files(path):
+    """
+    Returns the part files of a Parquet file still being written (or left
+    behind by an interrupted run), in write order.
+    """
+    parts_dir = parquet_parts_dir(path)
+    if not os.path.isdir(parts_dir):
+        return []
+    return [os.path.join(parts_dir, name) for name in sorted(os.listdir(parts_dir))
+            if name.endswith('.parquet')]
+
+
+def existing_table(path):
+    """
+    Returns path if it exists, otherwise the same table in the other format
+    if that exists (e.g. a CSV written by an earlier stage), otherwise path.
+    """
+    if os.path.exists(path):
+        return path
+    for fmt in TABLE_FORMATS:
+        candidate = table_path(path, fmt)
+        if os.path.exists(candidate):
+            return candidate
+    return path
+
+
+def read_table(path, columns=None):
+    """
+    Reads a pipeline table (CSV or Parquet) into a DataFrame.
+    """
+    if is_parquet(path):
+        require_pyarrow()
+        return pd.read_parquet(path, columns=columns)
+    return pd.read_csv(path, usecols=columns)
+
+
+def write_table(df, path):
+    """
+    Writes a DataFrame as CSV, or as typed Parquet if path ends in .parquet,
+    replacing the file atomically.
+    """
+    tmp_path = path + ".tmp"
+    if is_parquet(path):
+        require_pyarrow()
+        apply_schema(df).to_parquet(tmp_path, index=False, engine='pyarrow')
+    else:
+        df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def iter_table_records(path):
+    """
+    Yields the rows of a pipeline table as dicts of strings, with missing
+    values as None.
+    """
+    if is_parquet(path):
+        df = read_table(path)
+        for record in df.astype(object).where(df.notna(), None).to_dict('records'):
+            yield {key: _scalar_text(value) for key, value in record.items()}
+        return
+    for chunk in pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=1000):
+        for record in chunk.to_dict('records'):
+            yield {key: (None if value == '' else value) for key, value in record.items()}
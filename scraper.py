@@ -1,19 +1,269 @@
 """
 scraper.py
 
-Extracts detailed program information from FREIDA program detail pages using Playwright and BeautifulSoup.
+Extracts detailed program information from FREIDA program detail pages using Playwright and the ng-state transfer state.
 """
 
-import json
 import logging
+import re
+import time
 
-from bs4 import BeautifulSoup
-from utils import find_included_node, extract_contact_details
+import requests
+from http_fetch import fetch_html
+from ng_state import find_ng_state_text, loads_state
+from utils import IncludedIndex, find_included_node, extract_contact_details
 
 DEBUG_MODE = '--debug' in __import__('sys').argv
 EXIT_ON_ERRORS = '--exit-on-errors' in __import__('sys').argv
 
 PROGRAM_DETAIL_URL_TEMPLATE = "https://freida.ama-assn.org/program/{}"
+# JSON:API requests the Angular app issues for a program node
+PROGRAM_API_URL_PATTERN = re.compile(r"/jsonapi/node/program\b")
+
+
+class MissingStateError(ValueError):
+    """
+    Raised when a page has no ng-state transfer state with a program payload,
+    e.g. because it was not server-rendered and needs a full browser render.
+    """
+
+
+# Output columns, in CSV order, for every program record.
+EXPECTED_FIELDS = [
+    'program_id',
+    'source_url',
+    'program_name_suffix',
+    'city',
+    'state',
+    'data_last_updated',
+    'accredited_training_length',
+    'required_training_length',
+    'affiliated_us_government',
+    'raw_ng_state_json',
+    'specialty_title',
+    'first_year_positions',
+    'interviews_conducted_last_year',
+    'avg_hours_on_duty_y1',
+    'pct_do',
+    'pct_img',
+    'pct_usmd',
+    'program_best_described_as',
+    'website',
+    'special_features_text',
+    'accepting_applications_2025_2026',
+    'accepting_applications_2026_2027',
+    'program_start_dates',
+    'participates_in_eras',
+    'visa_statuses_accepted',
+    'program_director_first_name',
+    'program_director_middle_name',
+    'program_director_last_name',
+    'program_director_suffix',
+    'program_director_degrees',
+    'program_director_organization',
+    'program_director_address_line1',
+    'program_director_address_line2',
+    'program_director_locality',
+    'program_director_administrative_area',
+    'program_director_postal_code',
+    'program_director_email',
+    'program_director_phone',
+    'contact_first_name',
+    'contact_middle_name',
+    'contact_last_name',
+    'contact_suffix',
+    'contact_degrees',
+    'contact_organization',
+    'contact_address_line1',
+    'contact_address_line2',
+    'contact_locality',
+    'contact_administrative_area',
+    'contact_postal_code',
+    'contact_email',
+    'contact_phone']
+
+
+def parse_program_html(html_content, url):
+    """
+    Parses the ng-state JSON embedded in a FREIDA program detail page into a record dict.
+    Raises ValueError if the page does not contain a usable program payload.
+    """
+    state_text = find_ng_state_text(html_content)
+    if not state_text:
+        raise MissingStateError("Missing ng-state JSON")
+    api_data, program_node = find_program_payload(loads_state(state_text))
+    if api_data is None:
+        raise MissingStateError("Missing or invalid program payload structure")
+    # The script text is already the raw JSON; no need to re-serialise it
+    return map_program_payload(
+        api_data, url, state_text if DEBUG_MODE else None, program_node)
+
+
+def find_program_payload(full_json_data):
+    """
+    Returns (api_data, program_node) for the first ng-state entry whose
+    JSON:API data holds a node--program, or (None, None). Stops at the first hit.
+    """
+    for value in full_json_data.values():
+        api_data = value.get('b') if isinstance(value, dict) else None
+        if not isinstance(api_data, dict):
+            continue
+        program_nodes = api_data.get('data')
+        if not isinstance(program_nodes, list):
+            continue
+        for node in program_nodes:
+            if isinstance(node, dict) and node.get("type") == "node--program":
+                return api_data, node
+    return None, None
+
+
+def map_program_payload(api_data, url, raw_json=None, program_node=None):
+    """
+    Maps a JSON:API program document ({'data': [...], 'included': [...]}) to a
+    record dict with every EXPECTED_FIELDS key present. program_node may be
+    passed when the caller has already located it in api_data.
+    """
+    if program_node is None:
+        program_nodes = api_data.get('data', [])
+        if isinstance(program_nodes, dict):
+            # Single-resource endpoints return the node itself rather than a list
+            program_nodes = [program_nodes]
+        if not program_nodes or not isinstance(program_nodes, list):
+            raise ValueError("Missing program data")
+        program_node = next(
+            (node for node in program_nodes if node.get("type") == "node--program"), None)
+        if not program_node:
+            raise ValueError("No node--program found in JSON")
+    included_nodes = IncludedIndex(api_data.get('included', []))
+    prog_attrs = program_node.get('attributes', {})
+    prog_rels = program_node.get('relationships', {})
+    extracted_data = {
+        'program_id': prog_attrs.get('field_program_id'),
+        'source_url': url,
+        'program_name_suffix': prog_attrs.get('title'),
+        'city': prog_attrs.get('field_address', {}).get('locality'),
+        'state': prog_attrs.get('field_address', {}).get('administrative_area'),
+        'data_last_updated': prog_attrs.get('changed'),
+        'accredited_training_length': prog_attrs.get('field_accredited_length'),
+        'required_training_length': prog_attrs.get('field_required_length'),
+        'affiliated_us_government': prog_attrs.get('field_affiliated_us_gov'),
+        'raw_ng_state_json': raw_json}
+    # Find survey node via field_survey relationship
+    survey_ref_data_list = prog_rels.get(
+        'field_survey', {}).get('data', [])
+    survey_node = None
+    if survey_ref_data_list and isinstance(survey_ref_data_list, list):
+        survey_ref_data = survey_ref_data_list[0]
+        if survey_ref_data and isinstance(survey_ref_data, dict):
+            survey_node = find_included_node(survey_ref_data.get(
+                'type'), survey_ref_data.get('id'), included_nodes)
+    if survey_node:
+        survey_attrs = survey_node.get('attributes', {})
+        survey_rels = survey_node.get('relationships', {})
+        extracted_data.update(
+            {
+                'first_year_positions': survey_attrs.get('field_first_year_positions'),
+                'interviews_conducted_last_year': survey_attrs.get('field_interviews_conducted'),
+                'avg_hours_on_duty_y1': survey_attrs.get('field_avg_hours_on_duty_y1'),
+                'pct_do': survey_attrs.get('field_pct_do'),
+                'pct_img': survey_attrs.get('field_pct_img'),
+                'pct_usmd': survey_attrs.get('field_pct_usmd'),
+                'program_best_described_as': survey_attrs.get('field_program_best_described_as'),
+                'website': survey_attrs.get('field_website'),
+                'special_features_text': survey_attrs.get(
+                    'field_special_features',
+                    {}).get('value') if isinstance(
+                    survey_attrs.get('field_special_features'),
+                    dict) else None,
+                'accepting_applications_2025_2026': survey_attrs.get('field_accepting_current_year'),
+                'accepting_applications_2026_2027': survey_attrs.get('field_accepting_next_year'),
+                'program_start_dates': survey_attrs.get('field_program_start_dates'),
+                'participates_in_eras': survey_attrs.get('field_participates_in_eras'),
+                'visa_statuses_accepted': survey_attrs.get('field_visa_status')})
+        # Extract all director info
+        director_ref = survey_rels.get(
+            'field_program_director', {}).get(
+            'data', {})
+        if isinstance(director_ref, dict):
+            director_node = find_included_node(
+                director_ref.get('type'), director_ref.get('id'), included_nodes)
+            if director_node:
+                dir_attrs = director_node.get('attributes', {})
+                dir_addr = dir_attrs.get('field_address', {}) or {}
+                extracted_data['program_director_first_name'] = dir_attrs.get(
+                    'field_first_name')
+                extracted_data['program_director_middle_name'] = dir_attrs.get(
+                    'field_middle_name')
+                extracted_data['program_director_last_name'] = dir_attrs.get(
+                    'field_last_name')
+                extracted_data['program_director_suffix'] = dir_attrs.get(
+                    'field_suffix')
+                extracted_data['program_director_degrees'] = dir_attrs.get(
+                    'field_degrees')
+                extracted_data['program_director_organization'] = dir_addr.get(
+                    'organization')
+                extracted_data['program_director_address_line1'] = dir_addr.get(
+                    'address_line1')
+                extracted_data['program_director_address_line2'] = dir_addr.get(
+                    'address_line2')
+                extracted_data['program_director_locality'] = dir_addr.get(
+                    'locality')
+                extracted_data['program_director_administrative_area'] = dir_addr.get(
+                    'administrative_area')
+                extracted_data['program_director_postal_code'] = dir_addr.get(
+                    'postal_code')
+                extracted_data['program_director_email'] = dir_attrs.get(
+                    'field_email')
+                extracted_data['program_director_phone'] = dir_attrs.get(
+                    'field_phone')
+        # Extract all contact info
+        contact_ref = survey_rels.get(
+            'field_program_contact', {}).get(
+            'data', {})
+        if isinstance(contact_ref, dict):
+            contact_node = find_included_node(
+                contact_ref.get('type'), contact_ref.get('id'), included_nodes)
+            if contact_node:
+                contact_attrs = contact_node.get('attributes', {})
+                contact_addr = contact_attrs.get('field_address', {}) or {}
+                extracted_data['contact_first_name'] = contact_attrs.get(
+                    'field_first_name')
+                extracted_data['contact_middle_name'] = contact_attrs.get(
+                    'field_middle_name')
+                extracted_data['contact_last_name'] = contact_attrs.get(
+                    'field_last_name')
+                extracted_data['contact_suffix'] = contact_attrs.get(
+                    'field_suffix')
+                extracted_data['contact_degrees'] = contact_attrs.get(
+                    'field_degrees')
+                extracted_data['contact_organization'] = contact_addr.get(
+                    'organization')
+                extracted_data['contact_address_line1'] = contact_addr.get(
+                    'address_line1')
+                extracted_data['contact_address_line2'] = contact_addr.get(
+                    'address_line2')
+                extracted_data['contact_locality'] = contact_addr.get(
+                    'locality')
+                extracted_data['contact_administrative_area'] = contact_addr.get(
+                    'administrative_area')
+                extracted_data['contact_postal_code'] = contact_addr.get(
+                    'postal_code')
+                extracted_data['contact_email'] = contact_attrs.get(
+                    'field_email')
+                extracted_data['contact_phone'] = contact_attrs.get(
+                    'field_phone')
+    specialty_ref = prog_rels.get('field_specialty', {}).get('data', {})
+    specialty_node = find_included_node(
+        specialty_ref.get('type'),
+        specialty_ref.get('id'),
+        included_nodes) if isinstance(specialty_ref, dict) else None
+    extracted_data['specialty_title'] = specialty_node.get(
+        'attributes', {}).get('title') if specialty_node else None
+    # Fill all expected fields
+    for field in EXPECTED_FIELDS:
+        if field not in extracted_data:
+            extracted_data[field] = None
+    return extracted_data
 
 
 def extract_program_detail(page, program_id):
@@ -27,220 +277,180 @@ def extract_program_detail(page, program_id):
         page.goto(url, wait_until="domcontentloaded")
         page.wait_for_selector("div.survey-info", timeout=15000)
         html_content = page.content()
-        soup = BeautifulSoup(html_content, 'html.parser')
         if DEBUG_MODE:
             screenshot_file = f"debug_snapshot_{program_id}.png"
             page.screenshot(path=screenshot_file, full_page=True)
             logging.debug("📸 Saved screenshot to %s", screenshot_file)
-        script_tag = soup.find(
-            'script', {'id': 'ng-state', 'type': 'application/json'})
-        if not script_tag or not script_tag.string:
-            raise ValueError("Missing ng-state JSON")
-        full_json_data = json.loads(script_tag.string)
-        raw_json = json.dumps(full_json_data)
-        full_json_payload = None
-        for key, value in full_json_data.items():
-            if (
-                isinstance(value, dict) and 'b' in value and
-                isinstance(value['b'], dict) and 'data' in value['b'] and
-                isinstance(value['b']['data'], list) and any(
-                    n.get("type") == "node--program" for n in value['b']['data'] if isinstance(n, dict)
-                )
-            ):
-                full_json_payload = value
-                break
-        if not full_json_payload:
-            raise ValueError("Missing or invalid program payload structure")
-        api_data = full_json_payload.get('b', {})
-        program_nodes = api_data.get('data', [])
-        if not program_nodes or not isinstance(program_nodes, list):
-            raise ValueError("Missing program data")
-        program_node = next(
-            (node for node in program_nodes if node.get("type") == "node--program"), None)
-        if not program_node:
-            raise ValueError("No node--program found in JSON")
-        included_nodes = api_data.get('included', [])
-        prog_attrs = program_node.get('attributes', {})
-        prog_rels = program_node.get('relationships', {})
-        extracted_data = {
-            'program_id': prog_attrs.get('field_program_id'),
-            'source_url': url,
-            'program_name_suffix': prog_attrs.get('title'),
-            'city': prog_attrs.get('field_address', {}).get('locality'),
-            'state': prog_attrs.get('field_address', {}).get('administrative_area'),
-            'data_last_updated': prog_attrs.get('changed'),
-            'accredited_training_length': prog_attrs.get('field_accredited_length'),
-            'required_training_length': prog_attrs.get('field_required_length'),
-            'affiliated_us_government': prog_attrs.get('field_affiliated_us_gov'),
-            'raw_ng_state_json': raw_json if DEBUG_MODE else None}
-        # Find survey node via field_survey relationship
-        survey_ref_data_list = prog_rels.get(
-            'field_survey', {}).get('data', [])
-        survey_node = None
-        if survey_ref_data_list and isinstance(survey_ref_data_list, list):
-            survey_ref_data = survey_ref_data_list[0]
-            if survey_ref_data and isinstance(survey_ref_data, dict):
-                survey_node = find_included_node(survey_ref_data.get(
-                    'type'), survey_ref_data.get('id'), included_nodes)
-        if survey_node:
-            survey_attrs = survey_node.get('attributes', {})
-            survey_rels = survey_node.get('relationships', {})
-            extracted_data.update(
-                {
-                    'first_year_positions': survey_attrs.get('field_first_year_positions'),
-                    'interviews_conducted_last_year': survey_attrs.get('field_interviews_conducted'),
-                    'avg_hours_on_duty_y1': survey_attrs.get('field_avg_hours_on_duty_y1'),
-                    'pct_do': survey_attrs.get('field_pct_do'),
-                    'pct_img': survey_attrs.get('field_pct_img'),
-                    'pct_usmd': survey_attrs.get('field_pct_usmd'),
-                    'program_best_described_as': survey_attrs.get('field_program_best_described_as'),
-                    'website': survey_attrs.get('field_website'),
-                    'special_features_text': survey_attrs.get(
-                        'field_special_features',
-                        {}).get('value') if isinstance(
-                        survey_attrs.get('field_special_features'),
-                        dict) else None,
-                    'accepting_applications_2025_2026': survey_attrs.get('field_accepting_current_year'),
-                    'accepting_applications_2026_2027': survey_attrs.get('field_accepting_next_year'),
-                    'program_start_dates': survey_attrs.get('field_program_start_dates'),
-                    'participates_in_eras': survey_attrs.get('field_participates_in_eras'),
-                    'visa_statuses_accepted': survey_attrs.get('field_visa_status')})
-            # Extract all director info
-            director_ref = survey_rels.get(
-                'field_program_director', {}).get(
-                'data', {})
-            if isinstance(director_ref, dict):
-                director_node = find_included_node(
-                    director_ref.get('type'), director_ref.get('id'), included_nodes)
-                if director_node:
-                    dir_attrs = director_node.get('attributes', {})
-                    dir_addr = dir_attrs.get('field_address', {}) or {}
-                    extracted_data['program_director_first_name'] = dir_attrs.get(
-                        'field_first_name')
-                    extracted_data['program_director_middle_name'] = dir_attrs.get(
-                        'field_middle_name')
-                    extracted_data['program_director_last_name'] = dir_attrs.get(
-                        'field_last_name')
-                    extracted_data['program_director_suffix'] = dir_attrs.get(
-                        'field_suffix')
-                    extracted_data['program_director_degrees'] = dir_attrs.get(
-                        'field_degrees')
-                    extracted_data['program_director_organization'] = dir_addr.get(
-                        'organization')
-                    extracted_data['program_director_address_line1'] = dir_addr.get(
-                        'address_line1')
-                    extracted_data['program_director_address_line2'] = dir_addr.get(
-                        'address_line2')
-                    extracted_data['program_director_locality'] = dir_addr.get(
-                        'locality')
-                    extracted_data['program_director_administrative_area'] = dir_addr.get(
-                        'administrative_area')
-                    extracted_data['program_director_postal_code'] = dir_addr.get(
-                        'postal_code')
-                    extracted_data['program_director_email'] = dir_attrs.get(
-                        'field_email')
-                    extracted_data['program_director_phone'] = dir_attrs.get(
-                        'field_phone')
-            # Extract all contact info
-            contact_ref = survey_rels.get(
-                'field_program_contact', {}).get(
-                'data', {})
-            if isinstance(contact_ref, dict):
-                contact_node = find_included_node(
-                    contact_ref.get('type'), contact_ref.get('id'), included_nodes)
-                if contact_node:
-                    contact_attrs = contact_node.get('attributes', {})
-                    contact_addr = contact_attrs.get('field_address', {}) or {}
-                    extracted_data['contact_first_name'] = contact_attrs.get(
-                        'field_first_name')
-                    extracted_data['contact_middle_name'] = contact_attrs.get(
-                        'field_middle_name')
-                    extracted_data['contact_last_name'] = contact_attrs.get(
-                        'field_last_name')
-                    extracted_data['contact_suffix'] = contact_attrs.get(
-                        'field_suffix')
-                    extracted_data['contact_degrees'] = contact_attrs.get(
-                        'field_degrees')
-                    extracted_data['contact_organization'] = contact_addr.get(
-                        'organization')
-                    extracted_data['contact_address_line1'] = contact_addr.get(
-                        'address_line1')
-                    extracted_data['contact_address_line2'] = contact_addr.get(
-                        'address_line2')
-                    extracted_data['contact_locality'] = contact_addr.get(
-                        'locality')
-                    extracted_data['contact_administrative_area'] = contact_addr.get(
-                        'administrative_area')
-                    extracted_data['contact_postal_code'] = contact_addr.get(
-                        'postal_code')
-                    extracted_data['contact_email'] = contact_attrs.get(
-                        'field_email')
-                    extracted_data['contact_phone'] = contact_attrs.get(
-                        'field_phone')
-        specialty_ref = prog_rels.get('field_specialty', {}).get('data', {})
-        specialty_node = find_included_node(
-            specialty_ref.get('type'),
-            specialty_ref.get('id'),
-            included_nodes) if isinstance(specialty_ref, dict) else None
-        extracted_data['specialty_title'] = specialty_node.get(
-            'attributes', {}).get('title') if specialty_node else None
-        # Fill all expected fields
-        EXPECTED_FIELDS = [
-            'program_id',
-            'source_url',
-            'program_name_suffix',
-            'city',
-            'state',
-            'data_last_updated',
-            'accredited_training_length',
-            'required_training_length',
-            'affiliated_us_government',
-            'raw_ng_state_json',
-            'specialty_title',
-            'first_year_positions',
-            'interviews_conducted_last_year',
-            'avg_hours_on_duty_y1',
-            'pct_do',
-            'pct_img',
-            'pct_usmd',
-            'program_best_described_as',
-            'website',
-            'special_features_text',
-            'accepting_applications_2025_2026',
-            'accepting_applications_2026_2027',
-            'program_start_dates',
-            'participates_in_eras',
-            'visa_statuses_accepted',
-            'program_director_first_name',
-            'program_director_middle_name',
-            'program_director_last_name',
-            'program_director_suffix',
-            'program_director_degrees',
-            'program_director_organization',
-            'program_director_address_line1',
-            'program_director_address_line2',
-            'program_director_locality',
-            'program_director_administrative_area',
-            'program_director_postal_code',
-            'program_director_email',
-            'program_director_phone',
-            'contact_first_name',
-            'contact_middle_name',
-            'contact_last_name',
-            'contact_suffix',
-            'contact_degrees',
-            'contact_organization',
-            'contact_address_line1',
-            'contact_address_line2',
-            'contact_locality',
-            'contact_administrative_area',
-            'contact_postal_code',
-            'contact_email',
-            'contact_phone']
-        for field in EXPECTED_FIELDS:
-            if field not in extracted_data:
-                extracted_data[field] = None
-        return extracted_data
+        return parse_program_html(html_content, url)
+    except Exception as e:
+        logging.warning("Error loading program ID %s: %s", program_id, e)
+        if EXIT_ON_ERRORS:
+            raise
+        return {"program_id": program_id, "source_url": url, "error": str(e)}
+
+
+def is_program_api_response(response):
+    """
+    Returns True for successful JSON:API responses that carry a program node.
+    """
+    return (
+        response.ok and
+        response.request.resource_type in ("xhr", "fetch") and
+        PROGRAM_API_URL_PATTERN.search(response.url) is not None)
+
+
+def payload_program_id(payload):
+    """
+    Returns the field_program_id of the node--program in a JSON:API payload,
+    or None.
+    """
+    nodes = payload.get('data') if isinstance(payload, dict) else None
+    if isinstance(nodes, dict):
+        nodes = [nodes]
+    for node in nodes or []:
+        if isinstance(node, dict) and node.get('type') == 'node--program':
+            program_id = (node.get('attributes') or {}).get('field_program_id')
+            return None if program_id is None else str(program_id).strip()
+    return None
+
+
+def _matching_payload(responses, program_id):
+    for response in responses:
+        try:
+            payload = response.json()
+        except Exception as e:
+            logging.debug("Unreadable program API response %s: %s", response.url, e)
+            continue
+        if payload_program_id(payload) == str(program_id).strip():
+            return payload
+    return None
+
+
+def extract_program_detail_from_response(page, program_id, timeout=15000):
+    """
+    Extracts program details from network traffic instead of the rendered DOM.
+    Uses the program JSON:API response when the app requests it, otherwise the
+    ng-state in the raw document response, and only then waits for the API call.
+    API responses for other programs (e.g. listings or related programs) are
+    ignored.
+    """
+    url = PROGRAM_DETAIL_URL_TEMPLATE.format(program_id)
+    logging.info("Visiting detail page: %s", url)
+    captured = []
+
+    def on_response(response):
+        if is_program_api_response(response):
+            captured.append(response)
+
+    page.on("response", on_response)
+    try:
+        document = page.goto(url, wait_until="domcontentloaded")
+        checked = len(captured)
+        payload = _matching_payload(captured[:checked], program_id)
+        if payload is None and document is not None:
+            try:
+                return parse_program_html(document.text(), url)
+            except MissingStateError:
+                logging.debug(
+                    "No ng-state in document for %s; waiting for program API response",
+                    program_id)
+        deadline = time.monotonic() + timeout / 1000
+        while payload is None:
+            # Responses can arrive while the document is parsed, not just while waiting
+            if checked < len(captured):
+                new_responses = captured[checked:]
+                checked += len(new_responses)
+                payload = _matching_payload(new_responses, program_id)
+                continue
+            remaining_ms = (deadline - time.monotonic()) * 1000
+            if remaining_ms <= 0:
+                raise TimeoutError(f"No program API response for {program_id}")
+            response = page.wait_for_event(
+                "response", predicate=is_program_api_response, timeout=remaining_ms)
+            if response not in captured:
+                captured.append(response)
+        return map_program_payload(payload, url)
+    except Exception as e:
+        logging.warning("Error loading program ID %s: %s", program_id, e)
+        if EXIT_ON_ERRORS:
+            raise
+        return {"program_id": program_id, "source_url": url, "error": str(e)}
+    finally:
+        page.remove_listener("response", on_response)
+
+
+def extract_program_detail_no_js(page, program_id, fallback_page=None):
+    """
+    Extracts program details from a page in a context created with
+    java_script_enabled=False: waits only for domcontentloaded and parses the
+    ng-state in the raw document. Pages without a program payload are rendered
+    in full with extract_program_detail on the page returned by fallback_page(),
+    when given.
+    """
+    url = PROGRAM_DETAIL_URL_TEMPLATE.format(program_id)
+    logging.info("Visiting detail page without JavaScript: %s", url)
+    try:
+        document = page.goto(url, wait_until="domcontentloaded")
+        html_content = document.text() if document is not None else page.content()
+        return parse_program_html(html_content, url)
+    except MissingStateError as e:
+        if fallback_page is None:
+            logging.warning("Error loading program ID %s: %s", program_id, e)
+            if EXIT_ON_ERRORS:
+                raise
+            return {"program_id": program_id, "source_url": url, "error": str(e)}
+        logging.info("No ng-state for %s without JavaScript; rendering in full", program_id)
+    except Exception as e:
+        logging.warning("Error loading program ID %s: %s", program_id, e)
+        if EXIT_ON_ERRORS:
+            raise
+        return {"program_id": program_id, "source_url": url, "error": str(e)}
+    return extract_program_detail(fallback_page(), program_id)
+
+
+def fetch_program_detail(session, program_id, fallback_page=None, cache=None):
+    """
+    Fetches a program detail page over HTTP (through `cache`, a PageCache, when
+    given) and parses its ng-state directly.
+    If the response has no program payload or the request fails, falls back to
+    extract_program_detail on the page returned by fallback_page(), when given.
+    """
+    url = PROGRAM_DETAIL_URL_TEMPLATE.format(program_id)
+    logging.info("Fetching detail page: %s", url)
+    try:
+        return parse_program_html(fetch_html(session, url, cache=cache), url)
+    except (MissingStateError, requests.RequestException) as e:
+        if fallback_page is None:
+            logging.warning("Error fetching program ID %s: %s", program_id, e)
+            if EXIT_ON_ERRORS:
+                raise
+            return {"program_id": program_id, "source_url": url, "error": str(e)}
+        logging.info(
+            "HTTP fetch unusable for %s (%s); falling back to browser", program_id, e)
+    except Exception as e:
+        logging.warning("Error parsing program ID %s: %s", program_id, e)
+        if EXIT_ON_ERRORS:
+            raise
+        return {"program_id": program_id, "source_url": url, "error": str(e)}
+    return extract_program_detail(fallback_page(), program_id)
+
+
+async def async_extract_program_detail(page, program_id):
+    """
+    Async counterpart of extract_program_detail for pages from playwright.async_api.
+    Returns the same dictionary of extracted fields.
+    """
+    url = PROGRAM_DETAIL_URL_TEMPLATE.format(program_id)
+    logging.info("Visiting detail page: %s", url)
+    try:
+        await page.goto(url, wait_until="domcontentloaded")
+        await page.wait_for_selector("div.survey-info", timeout=15000)
+        html_content = await page.content()
+        if DEBUG_MODE:
+            screenshot_file = f"debug_snapshot_{program_id}.png"
+            await page.screenshot(path=screenshot_file, full_page=True)
+            logging.debug("📸 Saved screenshot to %s", screenshot_file)
+        return parse_program_html(html_content, url)
     except Exception as e:
         logging.warning("Error loading program ID %s: %s", program_id, e)
         if EXIT_ON_ERRORS:
@@ -0,0 +1,226 @@
+"""
+sinks.py
+
+Append-only record sinks that write each scraped program once, as soon as it
+is extracted, instead of periodically rewriting every result so far.
+"""
+
+import csv
+import json
+import logging
+import os
+from collections import deque
+
+from schema import (arrow_row, arrow_schema, pa, parquet_part_files, parquet_parts_dir, pq,
+                    require_pyarrow)
+from scraper import EXPECTED_FIELDS
+
+# Rows per row group in merged Parquet files
+PARQUET_ROW_GROUP_SIZE = 1000
+
+
+class RecordSink:
+    """
+    Base class for streaming sinks. Rows are written immediately, flushed and
+    fsynced every `fsync_every` rows, and only the last `window` rows are kept
+    in memory (in `recent`).
+    """
+
+    def __init__(self, path, fields=None, fsync_every=25, window=100, append=False):
+        self.path = path
+        self.fields = list(fields or EXPECTED_FIELDS)
+        self.fsync_every = max(1, fsync_every)
+        self.recent = deque(maxlen=window)
+        self.count = 0
+        self._unsynced = 0
+        existing = append and os.path.exists(path) and os.path.getsize(path) > 0
+        self._file = self._open(append)
+        self._start(existing)
+
+    def _open(self, append):
+        """
+        Opens the output file for writing or appending.
+        """
+        return open(self.path, "a" if append else "w", encoding="utf-8", newline="")
+
+    def _start(self, existing):
+        """
+        Hook for writing a header; `existing` is True when appending to data.
+        """
+
+    def _write_row(self, row):
+        raise NotImplementedError
+
+    def write(self, record):
+        """
+        Writes one record, keeping only the EXPECTED_FIELDS columns in order.
+        """
+        row = {field: record.get(field) for field in self.fields}
+        self._write_row(row)
+        self.recent.append(row)
+        self.count += 1
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every:
+            self.flush()
+
+    def flush(self):
+        """
+        Flushes buffered rows and fsyncs them to disk.
+        """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        logging.debug("Synced %d records to %s", self.count, self.path)
+
+    def close(self):
+        """
+        Flushes outstanding rows and closes the file.
+        """
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class CsvSink(RecordSink):
+    """
+    Appends records as CSV rows with a single header line.
+    """
+
+    def _start(self, existing):
+        self._writer = csv.DictWriter(self._file, fieldnames=self.fields)
+        if not existing:
+            self._writer.writeheader()
+
+    def _write_row(self, row):
+        self._writer.writerow(row)
+
+
+class JsonlSink(RecordSink):
+    """
+    Appends records as one JSON object per line.
+    """
+
+    def _write_row(self, row):
+        self._file.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+class ParquetSink(RecordSink):
+    """
+    Writes records to a typed Parquet file (see schema.py). Parquet files
+    cannot be appended to, so every flush writes its rows as a complete,
+    fsynced part file in `path`.parts/; close merges the parts (and, with
+    append=True, the existing file) into `path` in row groups of
+    PARQUET_ROW_GROUP_SIZE. Parts left by an interrupted run stay readable and
+    are picked up by resume and by the next append.
+    """
+
+    def _open(self, append):
+        require_pyarrow()
+        self._schema = arrow_schema(self.fields)
+        self._parts_dir = parquet_parts_dir(self.path)
+        self._buffer = []
+        if not append:
+            for stale in parquet_part_files(self.path) + [self.path]:
+                if os.path.exists(stale):
+                    os.remove(stale)
+        os.makedirs(self._parts_dir, exist_ok=True)
+        self._next_part = len(parquet_part_files(self.path))
+        return None
+
+    def _write_row(self, row):
+        self._buffer.append(arrow_row(self.fields, row))
+
+    def flush(self):
+        """
+        Writes buffered rows to a new part file and fsyncs it.
+        """
+        self._unsynced = 0
+        if not self._buffer:
+            return
+        part_path = os.path.join(self._parts_dir, f"part-{self._next_part:06d}.parquet")
+        tmp_path = part_path + ".tmp"
+        pq.write_table(pa.Table.from_pylist(self._buffer, schema=self._schema), tmp_path)
+        with open(tmp_path, "rb") as file_obj:
+            os.fsync(file_obj.fileno())
+        os.replace(tmp_path, part_path)
+        self._next_part += 1
+        self._buffer = []
+        logging.debug("Synced %d records to %s", self.count, part_path)
+
+    def close(self):
+        """
+        Flushes outstanding rows and merges the part files into `path`.
+        """
+        if self._parts_dir is None:
+            return
+        self.flush()
+        parts = parquet_part_files(self.path)
+        sources = ([self.path] if os.path.exists(self.path) else []) + parts
+        tables = [pq.read_table(source, columns=self.fields).cast(self._schema)
+                  for source in sources]
+        table = pa.concat_tables(tables) if tables else self._schema.empty_table()
+        tmp_path = self.path + ".tmp"
+        pq.write_table(table, tmp_path, row_group_size=PARQUET_ROW_GROUP_SIZE)
+        with open(tmp_path, "rb") as file_obj:
+            os.fsync(file_obj.fileno())
+        os.replace(tmp_path, self.path)
+        for part in parts:
+            os.remove(part)
+        os.rmdir(self._parts_dir)
+        self._parts_dir = None
+
+
+SINK_TYPES = {
+    'csv': CsvSink,
+    'jsonl': JsonlSink,
+    'parquet': ParquetSink,
+}
+
+
+def open_sink(path, fmt='csv', **kwargs):
+    """
+    Opens a sink of the given format ('csv', 'jsonl' or 'parquet') at path.
+    """
+    return SINK_TYPES[fmt](path, **kwargs)
+
+
+class TeeSink:
+    """
+    Forwards every record to several sinks (e.g. a CSV file and the state store).
+    """
+
+    def __init__(self, *sinks):
+        self.sinks = sinks
+
+    @property
+    def count(self):
+        """
+        Number of records written to the first sink.
+        """
+        return self.sinks[0].count
+
+    def write(self, record):
+        """
+        Writes the record to every sink.
+        """
+        for sink in self.sinks:
+            sink.write(record)
+
+    def close(self):
+        """
+        Closes every sink.
+        """
+        for sink in self.sinks:
+            sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,354 @@
+"""
+state_store.py
+
+Embedded SQLite (WAL mode) store for pipeline state: one row per program with
+its FREIDA record and the status of each stage. Updates are single-row upserts;
+the CSVs the rest of the pipeline reads are produced on demand by `export`.
+
+Usage:
+    python state_store.py import freida_programs_output_with_academic_year.csv
+    python state_store.py counts
+    python state_store.py ids --status failed
+    python state_store.py export
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+from schema import TABLE_FORMATS, is_parquet, iter_table_records, table_path, write_table
+from scraper import EXPECTED_FIELDS
+
+STATE_DB = os.getenv("STATE_DB") or "pipeline_state.db"
+
+OUTPUT_CSV = "freida_programs_output.csv"
+WITH_YEAR_CSV = "freida_programs_output_with_academic_year.csv"
+SUCCESS_CSV = "freida_programs_output_success.csv"
+FAILED_CSV = "freida_programs_output_failed.csv"
+YEAR_FIELD = 'acgme_first_academic_year'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS programs (
+    program_id TEXT PRIMARY KEY,
+    record TEXT NOT NULL,
+    freida_status TEXT NOT NULL DEFAULT 'done',
+    freida_error TEXT,
+    acgme_status TEXT NOT NULL DEFAULT 'pending',
+    acgme_first_academic_year TEXT,
+    acgme_attempts INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    changed TEXT,
+    fingerprint TEXT,
+    checked_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_programs_acgme_status ON programs (acgme_status);
+"""
+# Columns added after the first release, created on open for older databases
+ADDED_COLUMNS = (
+    ('changed', 'TEXT'),
+    ('fingerprint', 'TEXT'),
+    ('checked_at', 'REAL'),
+)
+# Fields that vary between scrapes without the program changing
+UNFINGERPRINTED_FIELDS = ('raw_ng_state_json',)
+
+
+def normalize_program_id(program_id):
+    """
+    Returns the canonical text key for a program ID, so that 1405621446,
+    '1405621446' and 1405621446.0 (pandas float columns) all match.
+    """
+    text = str(program_id).strip()
+    if text.endswith('.0') and text[:-2].isdigit():
+        text = text[:-2]
+    return text
+
+
+def record_fingerprint(fields):
+    """
+    Returns a SHA-256 digest of a record's content, ignoring debug-only fields.
+    """
+    content = {key: value for key, value in fields.items()
+               if key not in UNFINGERPRINTED_FIELDS}
+    return hashlib.sha256(
+        json.dumps(content, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def _is_blank(value):
+    return value is None or (isinstance(value, float) and value != value) or \
+        str(value).strip() == ''
+
+
+class StateStore:
+    """
+    Program state keyed by program_id. Also usable as a main.py result sink
+    through write()/close().
+    """
+
+    def __init__(self, path=STATE_DB):
+        self.path = path
+        self.count = 0
+        self.content_changes = 0
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(programs)")}
+        for name, declaration in ADDED_COLUMNS:
+            if name not in columns:
+                self._conn.execute(f"ALTER TABLE programs ADD COLUMN {name} {declaration}")
+        self._conn.commit()
+
+    def upsert_program(self, record, commit=True):
+        """
+        Inserts or updates the FREIDA record for a program, keeping its ACGME state.
+        Also stores the program's `changed` timestamp (data_last_updated) and a
+        content fingerprint. Returns True if the content differs from the
+        stored record (or the program is new).
+        An error record for a stored program only updates its FREIDA status and
+        error, keeping the last good record, `changed` and fingerprint.
+        """
+        program_id = normalize_program_id(record.get('program_id'))
+        error = record.get('error')
+        fields = {field: record.get(field) for field in EXPECTED_FIELDS}
+        fingerprint = None if error else record_fingerprint(fields)
+        row = self._conn.execute(
+            "SELECT fingerprint FROM programs WHERE program_id = ?", (program_id,)).fetchone()
+        now = time.time()
+        if error and row is not None:
+            self._conn.execute(
+                "UPDATE programs SET freida_status = 'error', freida_error = ?, updated_at = ?"
+                " WHERE program_id = ?",
+                (error, now, program_id))
+            if commit:
+                self._conn.commit()
+            return False
+        self._conn.execute(
+            """
+            INSERT INTO programs (program_id, record, freida_status, freida_error, updated_at,
+                                  changed, fingerprint, checked_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (program_id) DO UPDATE SET
+                record = excluded.record,
+                freida_status = excluded.freida_status,
+                freida_error = excluded.freida_error,
+                updated_at = excluded.updated_at,
+                changed = excluded.changed,
+                fingerprint = excluded.fingerprint,
+                checked_at = excluded.checked_at
+            """,
+            (program_id, json.dumps(fields), 'error' if error else 'done', error, now,
+             None if error else fields.get('data_last_updated'), fingerprint, now))
+        if commit:
+            self._conn.commit()
+        return row is None or row[0] != fingerprint
+
+    def changed_values(self):
+        """
+        Returns {program_id: changed} for programs stored without an error.
+        """
+        return dict(self._conn.execute(
+            "SELECT program_id, changed FROM programs WHERE freida_status = 'done'"))
+
+    def mark_checked(self, program_ids):
+        """
+        Records that programs were found unchanged by an incremental probe.
+        """
+        now = time.time()
+        self._conn.executemany(
+            "UPDATE programs SET checked_at = ? WHERE program_id = ?",
+            [(now, normalize_program_id(pid)) for pid in program_ids])
+        self._conn.commit()
+
+    def set_acgme_result(self, program_id, year, count_attempt=True):
+        """
+        Records the outcome of one ACGME lookup. A blank year marks the program
+        failed unless an earlier run already found its year. Results arriving
+        after the lookup (deferred OCR) pass count_attempt=False.
+        """
+        done = not _is_blank(year)
+        self._conn.execute(
+            """
+            UPDATE programs SET
+                acgme_status = CASE WHEN ?1 IS NOT NULL OR acgme_first_academic_year IS NOT NULL
+                                    THEN 'done' ELSE 'failed' END,
+                acgme_first_academic_year = COALESCE(?1, acgme_first_academic_year),
+                acgme_attempts = acgme_attempts + ?4,
+                updated_at = ?2
+            WHERE program_id = ?3
+            """,
+            (str(year).strip() if done else None, time.time(),
+             normalize_program_id(program_id), 1 if count_attempt else 0))
+        self._conn.commit()
+
+    def acgme_ids(self, statuses=('pending', 'failed'), program_ids=None):
+        """
+        Returns program IDs whose ACGME status is in statuses, optionally
+        restricted to the given program_ids.
+        """
+        placeholders = ','.join('?' * len(statuses))
+        rows = self._conn.execute(
+            f"SELECT program_id FROM programs WHERE acgme_status IN ({placeholders})"
+            " ORDER BY rowid",
+            tuple(statuses)).fetchall()
+        ids = [row[0] for row in rows]
+        if program_ids is not None:
+            wanted = {normalize_program_id(pid) for pid in program_ids}
+            ids = [pid for pid in ids if pid in wanted]
+        return ids
+
+    def next_acgme_id(self, max_attempts=3):
+        """
+        Returns the next program still needing an ACGME year, preferring the
+        fewest attempts so far, or None when no work is left.
+        """
+        row = self._conn.execute(
+            "SELECT program_id FROM programs"
+            " WHERE acgme_status IN ('pending', 'failed') AND acgme_attempts < ?"
+            " ORDER BY acgme_attempts, rowid LIMIT 1",
+            (max_attempts,)).fetchone()
+        return row[0] if row else None
+
+    def counts(self):
+        """
+        Returns the number of programs in total and per ACGME status.
+        """
+        result = {'total': 0, 'pending': 0, 'done': 0, 'failed': 0}
+        for status, count in self._conn.execute(
+                "SELECT acgme_status, COUNT(*) FROM programs GROUP BY acgme_status"):
+            result[status] = count
+            result['total'] += count
+        return result
+
+    def import_csv(self, path):
+        """
+        Loads a FREIDA output table (CSV or Parquet, with or without the ACGME
+        year column) into the store. Existing ACGME years in the table are
+        kept. Returns the row count.
+        """
+        count = 0
+        for record in iter_table_records(path):
+            self.upsert_program(record, commit=False)
+            year = record.get(YEAR_FIELD)
+            if not _is_blank(year):
+                self._conn.execute(
+                    "UPDATE programs SET acgme_status = 'done', acgme_first_academic_year = ?"
+                    " WHERE program_id = ?",
+                    (year, normalize_program_id(record.get('program_id'))))
+            count += 1
+        self._conn.commit()
+        logging.info("Imported %d programs from %s into %s", count, path, self.path)
+        return count
+
+    def _rows(self, where=""):
+        query = "SELECT record, acgme_first_academic_year FROM programs"
+        for record, year in self._conn.execute(f"{query} {where} ORDER BY rowid"):
+            row = json.loads(record)
+            row[YEAR_FIELD] = year
+            yield row
+
+    def export(self, output_csv=OUTPUT_CSV, with_year_csv=WITH_YEAR_CSV,
+               success_csv=SUCCESS_CSV, failed_csv=FAILED_CSV):
+        """
+        Writes the pipeline CSVs from the current state and returns the
+        number of rows written to each. Paths ending in .parquet are written
+        as typed Parquet (see schema.py).
+        """
+        year_fields = [YEAR_FIELD] + EXPECTED_FIELDS
+        exports = [
+            (output_csv, EXPECTED_FIELDS, ""),
+            (with_year_csv, year_fields, ""),
+            (success_csv, year_fields, "WHERE acgme_status = 'done'"),
+            (failed_csv, year_fields, "WHERE acgme_status != 'done'"),
+        ]
+        written = {}
+        for path, fields, where in exports:
+            if not path:
+                continue
+            if is_parquet(path):
+                rows = list(self._rows(where))
+                write_table(pd.DataFrame(rows, columns=fields), path)
+                written[path] = len(rows)
+                logging.info("Exported %d rows to %s", written[path], path)
+                continue
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8", newline="") as file_obj:
+                writer = csv.DictWriter(file_obj, fieldnames=fields, extrasaction='ignore')
+                writer.writeheader()
+                written[path] = 0
+                for row in self._rows(where):
+                    writer.writerow(row)
+                    written[path] += 1
+            os.replace(tmp_path, path)
+            logging.info("Exported %d rows to %s", written[path], path)
+        return written
+
+    def write(self, record):
+        """
+        Sink interface: upserts one scraped record. `content_changes` counts
+        records whose content differed from what was stored.
+        """
+        if self.upsert_program(record):
+            self.content_changes += 1
+        self.count += 1
+
+    def close(self):
+        """
+        Closes the database connection.
+        """
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main():
+    """
+    Command-line entry point: import, export or count pipeline state.
+    """
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Manage the SQLite pipeline state store.')
+    parser.add_argument('--db', default=STATE_DB, help='Path to the SQLite database.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    import_parser = subparsers.add_parser('import', help='Load a FREIDA output CSV.')
+    import_parser.add_argument('csv_path')
+    export_parser = subparsers.add_parser('export', help='Write the pipeline CSVs from the store.')
+    export_parser.add_argument(
+        '--format', choices=TABLE_FORMATS, default='csv',
+        help='Write CSV files or typed Parquet files.')
+    subparsers.add_parser(
+        'counts', help='Print "<total> <done> <failed> <pending>" ACGME counts.')
+    ids_parser = subparsers.add_parser('ids', help='Print program IDs by ACGME status.')
+    ids_parser.add_argument(
+        '--status', action='append', choices=['pending', 'done', 'failed'],
+        help='Status to list (repeatable, default: failed).')
+    args = parser.parse_args()
+
+    with StateStore(args.db) as store:
+        if args.command == 'import':
+            store.import_csv(args.csv_path)
+        elif args.command == 'export':
+            store.export(*(table_path(path, args.format) for path in (
+                OUTPUT_CSV, WITH_YEAR_CSV, SUCCESS_CSV, FAILED_CSV)))
+        elif args.command == 'ids':
+            for program_id in store.acgme_ids(tuple(args.status or ['failed'])):
+                print(program_id)
+        else:
+            counts = store.counts()
+            print(counts['total'], counts['done'], counts['failed'], counts['pending'])
+
+
+if __name__ == "__main__":
+    main()
@@ -394,3 +394,316 @@ def test_extract_academic_year_from_table_none():
 
 # More tests will be added for each function, with mocks for Playwright
 # and file I/O.
+
+
+def test_load_store_work_imports_csv_when_empty(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / acgme_scraper.CSV_FILE).write_text("program_id,city\n1,A\n2,B\n3,C\n")
+    store = acgme_scraper.StateStore(str(tmp_path / "state.db"))
+    store.set_acgme_result("1", None)
+    work = acgme_scraper.load_store_work(store)
+    assert list(work['program_id']) == ["1", "2", "3"]
+    store.set_acgme_result("1", None)
+    store.set_acgme_result("2", "2000 - 2001")
+    assert list(acgme_scraper.load_store_work(store, failed_only=True)['program_id']) == ["1"]
+    assert list(acgme_scraper.load_store_work(
+        store, failed_record="2,3")['program_id']) == ["3"]
+    store.close()
+
+
+def test_merge_academic_years_typed_keys():
+    import pandas as pd
+    target = pd.DataFrame({
+        "program_id": [111, 222, 333, 444],
+        "acgme_first_academic_year": [None, "1990 - 1991", None, None]})
+    results = pd.DataFrame({
+        "acgme_first_academic_year": ["2001 - 2002", None, " ", "2003 - 2004"],
+        "program_id": ["111", "222", "333", "444.0"]})
+    merged = acgme_scraper.merge_academic_years(target, results)
+    years = merged["acgme_first_academic_year"]
+    assert years[0] == "2001 - 2002"
+    assert years[1] == "1990 - 1991"
+    assert pd.isna(years[2])
+    assert years[3] == "2003 - 2004"
+
+
+def test_merge_academic_years_string_keys_and_missing_column():
+    import pandas as pd
+    target = pd.DataFrame({"program_id": ["A1", "B2"], "city": ["x", "y"]})
+    results = pd.DataFrame({
+        "acgme_first_academic_year": ["2005 - 2006"], "program_id": ["B2"]})
+    merged = acgme_scraper.merge_academic_years(target, results)
+    years = merged["acgme_first_academic_year"]
+    assert pd.isna(years[0])
+    assert years[1] == "2005 - 2006"
+
+
+def test_run_worker_drains_store_and_persists_each_result(tmp_path):
+    store = acgme_scraper.StateStore(str(tmp_path / "state.db"))
+    for program_id in ("1", "2"):
+        store.upsert_program({"program_id": program_id})
+    context = MagicMock()
+    context.new_page.return_value.is_closed.return_value = False
+    outcomes = {"1": ["2001 - 2002"], "2": [None, None, "2002 - 2003"]}
+
+    def fake_get(page, program_id, max_retries, url_cache=None, errors=None):
+        # The store must already reflect earlier results when the next ID is pulled
+        return outcomes[program_id].pop(0)
+    with patch("acgme_scraper.get_first_academic_year_with_retry", side_effect=fake_get), \
+            patch("acgme_scraper.time.sleep"):
+        processed = acgme_scraper.run_worker(context, store, max_attempts=2)
+    assert processed == 3
+    assert context.new_page.call_count == 1
+    assert store.acgme_ids(('done',)) == ["1"]
+    assert store.acgme_ids(('failed',)) == ["2"]
+    store.close()
+
+
+def test_run_worker_respects_max_records(tmp_path):
+    store = acgme_scraper.StateStore(str(tmp_path / "state.db"))
+    for program_id in ("1", "2", "3"):
+        store.upsert_program({"program_id": program_id})
+    context = MagicMock()
+    context.new_page.return_value.is_closed.return_value = False
+    with patch("acgme_scraper.get_first_academic_year_with_retry", return_value="2001 - 2002"), \
+            patch("acgme_scraper.time.sleep"):
+        processed = acgme_scraper.run_worker(context, store, max_records=2)
+    assert processed == 2
+    assert store.counts()['pending'] == 1
+    store.close()
+
+
+def test_report_url_cache_persists_and_discards(tmp_path):
+    path = str(tmp_path / "urls.json")
+    cache = acgme_scraper.ReportUrlCache(path)
+    cache.set("123", "https://apps.acgme.org/ads/Public/Reports/Report/1?x")
+    assert acgme_scraper.ReportUrlCache(path).get(123) == \
+        "https://apps.acgme.org/ads/Public/Reports/Report/1?x"
+    cache.discard("123")
+    assert len(acgme_scraper.ReportUrlCache(path)) == 0
+
+
+def test_get_first_academic_year_uses_cached_url(tmp_path):
+    cache = acgme_scraper.ReportUrlCache(str(tmp_path / "urls.json"))
+    report_url = "https://apps.acgme.org/ads/Public/Reports/AccreditationHistoryReport?programId=9"
+    cache.set("9", report_url)
+    page = MagicMock()
+    with patch("acgme_scraper.extract_academic_year_from_table", return_value="2001 - 2002"), \
+            patch("acgme_scraper.search_first_academic_year") as mock_search:
+        year = acgme_scraper.get_first_academic_year(page, "9", url_cache=cache)
+    assert year == "2001 - 2002"
+    page.goto.assert_called_once_with(report_url, timeout=30000)
+    mock_search.assert_not_called()
+
+
+def test_get_first_academic_year_caches_url_after_search(tmp_path):
+    cache = acgme_scraper.ReportUrlCache(str(tmp_path / "urls.json"))
+    cache.set("9", "https://stale.example/AccreditationHistoryReport?programId=9")
+    page = MagicMock()
+    page.url = "https://apps.acgme.org/ads/Public/Reports/AccreditationHistoryReport?programId=42"
+    with patch("acgme_scraper.extract_academic_year_from_table", return_value=None), \
+            patch("acgme_scraper.search_first_academic_year", return_value="1999 - 2000"):
+        year = acgme_scraper.get_first_academic_year(page, "9", url_cache=cache)
+    assert year == "1999 - 2000"
+    assert cache.get("9") == page.url
+
+
+def test_get_first_academic_year_keeps_cached_url_while_ocr_is_pending(tmp_path, monkeypatch):
+    cache = acgme_scraper.ReportUrlCache(str(tmp_path / "urls.json"))
+    report_url = "https://apps.acgme.org/ads/Public/Reports/AccreditationHistoryReport?programId=9"
+    cache.set("9", report_url)
+    service = MagicMock()
+    service.has_pending.return_value = True
+    monkeypatch.setattr(acgme_scraper, 'OCR_SERVICE', service)
+    page = MagicMock()
+    with patch("acgme_scraper.extract_academic_year_from_table", return_value=None), \
+            patch("acgme_scraper.search_first_academic_year") as mock_search:
+        assert acgme_scraper.get_first_academic_year(page, "9", url_cache=cache) is None
+    mock_search.assert_not_called()
+    assert cache.get("9") == report_url
+
+
+def test_get_first_academic_year_stops_on_no_results_message():
+    page = MagicMock()
+    page.evaluate.side_effect = [None, None, 'empty']
+    assert acgme_scraper.get_first_academic_year(page, 'pid') is None
+    assert page.wait_for_timeout.call_count == 2
+    page.inner_text.assert_not_called()
+    page.remove_listener.assert_called_once()
+
+
+def test_wait_for_search_outcome_gives_up_after_request_settles(monkeypatch):
+    page = MagicMock()
+    page.evaluate.return_value = None
+    listeners = {}
+    page.on.side_effect = lambda event, handler: listeners.setdefault(event, handler)
+    clock = iter(range(100))
+    monkeypatch.setattr(acgme_scraper.time, 'monotonic', lambda: next(clock))
+    page.wait_for_timeout.side_effect = lambda ms: listeners['requestfinished'](
+        MagicMock(resource_type='xhr', url=acgme_scraper.ACGME_URL, post_data=None))
+    assert acgme_scraper.wait_for_search_outcome(page, 'pid') is None
+    assert page.wait_for_timeout.call_count == 1
+
+
+def test_wait_for_search_outcome_ignores_unrelated_requests(monkeypatch):
+    page = MagicMock()
+    page.evaluate.return_value = None
+    listeners = {}
+    page.on.side_effect = lambda event, handler: listeners.setdefault(event, handler)
+    clock = iter(range(100))
+    monkeypatch.setattr(acgme_scraper.time, 'monotonic', lambda: next(clock))
+    page.wait_for_timeout.side_effect = lambda ms: listeners['requestfinished'](
+        MagicMock(resource_type='xhr', url='https://www.google-analytics.com/collect',
+                  post_data='v=1'))
+    submitted = []
+    assert acgme_scraper.wait_for_search_outcome(
+        page, 'pid', timeout_ms=500, submit=lambda: submitted.append(True)) is None
+    assert submitted == [True]
+    assert page.wait_for_timeout.call_count == 5
+
+
+def test_is_search_request_matches_program_id_in_post_data():
+    request = MagicMock(
+        resource_type='fetch', url='https://apps.acgme.org/ads/api/find', post_data='id=1405')
+    assert acgme_scraper.is_search_request(request, '1405')
+    assert not acgme_scraper.is_search_request(
+        MagicMock(resource_type='font', url=acgme_scraper.ACGME_URL), '1405')
+
+
+def test_retry_waits_for_network_idle_instead_of_sleeping():
+    page = MagicMock()
+    page.wait_for_load_state.side_effect = Exception("timeout")
+    with patch("acgme_scraper.get_first_academic_year", side_effect=[None, "2001 - 2002"]), \
+            patch("acgme_scraper.time.sleep") as mock_sleep:
+        result = acgme_scraper.get_first_academic_year_with_retry(page, "1", max_retries=2)
+    assert result == "2001 - 2002"
+    page.wait_for_load_state.assert_called_once_with(
+        "networkidle", timeout=acgme_scraper.RETRY_IDLE_TIMEOUT_MS)
+    mock_sleep.assert_not_called()
+
+
+def test_screenshot_ocr_is_deferred_to_ocr_service(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    page = MagicMock()
+
+    def fake_screenshot(path, full_page):
+        (tmp_path / path).write_bytes(b"png")
+        return b"png"
+    page.screenshot.side_effect = fake_screenshot
+    service = MagicMock()
+    monkeypatch.setattr(acgme_scraper, 'OCR_SERVICE', service)
+    with patch("acgme_scraper.extract_year_from_image") as mock_ocr:
+        assert acgme_scraper.screenshot_and_ocr(page, 1405621446) is None
+    mock_ocr.assert_not_called()
+    service.submit.assert_called_once_with("1405621446", b"png")
+
+
+def test_run_worker_records_deferred_ocr_years(tmp_path, monkeypatch):
+    store = acgme_scraper.StateStore(str(tmp_path / "state.db"))
+    store.upsert_program({"program_id": "1"})
+    service = MagicMock()
+    service.completed.return_value = {}
+    service.drain.return_value = {"1": "2001 - 2002"}
+    monkeypatch.setattr(acgme_scraper, 'OCR_SERVICE', service)
+    context = MagicMock()
+    context.new_page.return_value.is_closed.return_value = False
+    with patch("acgme_scraper.get_first_academic_year_with_retry", return_value=None), \
+            patch("acgme_scraper.time.sleep"):
+        acgme_scraper.run_worker(context, store, max_attempts=1)
+    assert store.acgme_ids(('done',)) == ["1"]
+    assert store._conn.execute("SELECT acgme_attempts FROM programs").fetchone()[0] == 1
+    store.close()
+
+
+def test_screenshot_and_ocr_prefers_cropped_table(monkeypatch):
+    page = MagicMock()
+    page.locator.return_value.count.return_value = 1
+    page.locator.return_value.first.screenshot.return_value = b"table-png"
+    cache = MagicMock()
+    cache.year.return_value = "2015 - 2016"
+    monkeypatch.setattr(acgme_scraper, 'TEXT_CACHE', cache)
+    assert acgme_scraper.screenshot_and_ocr(page, 'pid') == "2015 - 2016"
+    cache.year.assert_called_once_with(b"table-png")
+    page.screenshot.assert_not_called()
+
+
+def test_screenshot_and_ocr_falls_back_to_full_page_without_table(monkeypatch):
+    page = MagicMock()
+    page.locator.return_value.count.return_value = 0
+    with patch("acgme_scraper.extract_year_from_image", return_value="2016 - 2017"), \
+            patch("os.path.exists", return_value=True):
+        assert acgme_scraper.screenshot_and_ocr(page, 'pid') == "2016 - 2017"
+    page.screenshot.assert_called_once()
+
+
+def test_extract_academic_year_from_table_uses_single_snapshot():
+    page = MagicMock()
+    page.evaluate.return_value = {
+        'rows': [[], ['-', 'x'], ['2012 - 2013', 'Initial Accreditation']], 'links': []}
+    assert acgme_scraper.extract_academic_year_from_table(page, 'pid') == '2012 - 2013'
+    page.evaluate.assert_called_once_with(acgme_scraper.PAGE_SNAPSHOT_JS)
+    page.query_selector_all.assert_not_called()
+
+
+def test_snapshot_page_rejects_unexpected_results():
+    page = MagicMock()
+    assert acgme_scraper.snapshot_page(page) is None
+    page.evaluate.side_effect = Exception("Execution context was destroyed")
+    assert acgme_scraper.snapshot_page(page) is None
+
+
+def test_history_links_by_element_matches_snapshot_shape():
+    page = MagicMock()
+    anchors = []
+    for text, href in (("Home", "/"), ("View Accreditation History", None),
+                       ("Report", "/x/AccreditationHistoryReport?programId=1")):
+        anchor = MagicMock()
+        anchor.inner_text.return_value = text
+        anchor.get_attribute.return_value = href
+        anchors.append(anchor)
+    page.query_selector_all.return_value = anchors
+    assert acgme_scraper.history_links_by_element(page) == [
+        {'index': 1, 'text': 'View Accreditation History', 'href': ''},
+        {'index': 2, 'text': 'Report', 'href': '/x/AccreditationHistoryReport?programId=1'}]
+
+
+def test_retry_stops_while_ocr_is_pending(monkeypatch):
+    service = MagicMock()
+    service.has_pending.return_value = True
+    monkeypatch.setattr(acgme_scraper, 'OCR_SERVICE', service)
+    page = MagicMock()
+    with patch("acgme_scraper.get_first_academic_year", return_value=None) as mock_get:
+        assert acgme_scraper.get_first_academic_year_with_retry(page, 7, max_retries=3) is None
+    mock_get.assert_called_once()
+    service.has_pending.assert_called_with("7")
+
+
+def test_retry_reports_block_pages_and_exceptions():
+    page = MagicMock()
+    page.title.return_value = "429 Too Many Requests"
+    errors = []
+    with patch("acgme_scraper.get_first_academic_year",
+               side_effect=[None, Exception("Timeout 30000ms exceeded")]):
+        assert acgme_scraper.get_first_academic_year_with_retry(
+            page, "1", max_retries=2, errors=errors) is None
+    assert errors == ["blocked page: 429 Too Many Requests", "Timeout 30000ms exceeded"]
+    assert acgme_scraper.lookup_failure("1", None, errors) == "Timeout 30000ms exceeded"
+    assert acgme_scraper.lookup_failure("1", None, []) == "no academic year found"
+    assert acgme_scraper.lookup_failure("1", "2001 - 2002", errors) is None
+
+
+def test_run_worker_reports_failures_to_rate_controller(tmp_path, monkeypatch):
+    store = acgme_scraper.StateStore(str(tmp_path / "state.db"))
+    store.upsert_program({"program_id": "1"})
+    controller = MagicMock()
+    monkeypatch.setattr(acgme_scraper, 'site_controller', lambda site: controller)
+
+    def fake_get(page, program_id, max_retries, url_cache=None, errors=None):
+        errors.append("blocked page: Access Denied")
+        return None
+    context = MagicMock()
+    context.new_page.return_value.is_closed.return_value = False
+    with patch("acgme_scraper.get_first_academic_year_with_retry", side_effect=fake_get):
+        acgme_scraper.run_worker(context, store, max_attempts=1)
+    assert controller.record.call_args[0][1] == "blocked page: Access Denied"
+    store.close()
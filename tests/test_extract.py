@@ -52,3 +52,146 @@ def test_scrape_all_pages(monkeypatch):
 
     result = extract.scrape_all_pages()
     assert result == [{"program_id": "11111"}, {"program_id": "22222"}]
+
+
+def make_async_playwright():
+    from unittest.mock import AsyncMock
+    context = MagicMock()
+    context.new_page = AsyncMock(return_value=MagicMock())
+    context.route = AsyncMock()
+    browser = MagicMock()
+    browser.new_context = AsyncMock(return_value=context)
+    browser.close = AsyncMock()
+    playwright = MagicMock()
+    playwright.chromium.launch = AsyncMock(return_value=browser)
+    manager = MagicMock()
+    manager.__aenter__ = AsyncMock(return_value=playwright)
+    manager.__aexit__ = AsyncMock(return_value=False)
+    return manager
+
+
+def test_scrape_specialties_uses_totals_and_fans_out(monkeypatch):
+    import asyncio
+    pages = {
+        ("A", 1): (["1", "2"], 5), ("A", 2): (["3", "4"], None), ("A", 3): (["5"], None),
+        ("A", 4): ([], None),
+        ("B", 1): (["5", "6"], None), ("B", 2): (["7"], None), ("B", 3): ([], None),
+    }
+    fetched = []
+
+    async def fake_fetch(page, spec, page_num, controller, page_size=None):
+        fetched.append((spec, page_num))
+        await asyncio.sleep(0)
+        ids, total = pages[(spec, page_num)]
+        return [{"program_id": pid} for pid in ids], total
+    monkeypatch.setattr('extract.async_playwright', make_async_playwright)
+    monkeypatch.setattr('extract.fetch_search_page', fake_fetch)
+
+    result = asyncio.run(extract.scrape_specialties(["A", "B", "A"], workers=3))
+    assert [row["program_id"] for row in result] == ["1", "2", "3", "4", "5", "6", "7"]
+    assert sorted(fetched) == sorted(pages)
+
+
+def test_extract_program_data_single_call():
+    page = MagicMock()
+    page.eval_on_selector_all.return_value = ['111', None, '222']
+    assert extract.extract_program_data(page) == [
+        {'program_id': '111'}, {'program_id': '222'}]
+    page.query_selector_all.assert_not_called()
+
+
+def test_search_url_page_size():
+    assert extract.search_url('42771', 3).endswith('page=3')
+    assert extract.search_url('42771', 3, 100).endswith(f'&{extract.PAGE_SIZE_PARAM}=100')
+
+
+def test_parse_search_payload_nested():
+    payload = {
+        'meta': {'count': 412},
+        'data': [
+            {'attributes': {'field_program_id': '1405621446'}},
+            {'attributes': {'field_program_id': '1405621447'}},
+            {'attributes': {'field_program_id': '1405621446'}},
+        ],
+    }
+    data, total = extract.parse_search_payload(payload)
+    assert data == [{'program_id': '1405621446'}, {'program_id': '1405621447'}]
+    assert total == 412
+    assert extract.parse_search_payload({'results': []}) == ([], None)
+
+
+def test_fetch_search_page_prefers_search_api(monkeypatch):
+    import asyncio
+
+    async def fake_api(page, url):
+        return [{'program_id': '1'}], 7
+
+    async def fail_dom(page):
+        raise AssertionError('DOM extraction should not run')
+
+    monkeypatch.setattr(extract, 'read_search_api', fake_api)
+    monkeypatch.setattr(extract, 'extract_program_data_async', fail_dom)
+    controller = MagicMock()
+
+    async def acquire():
+        return None
+    controller.acquire = acquire
+    data, total = asyncio.run(extract.fetch_search_page(MagicMock(), '42771', 1, controller, 100))
+    assert data == [{'program_id': '1'}]
+    assert total == 7
+
+
+def test_scrape_specialties_retries_failed_pages_and_walks_past_count(monkeypatch):
+    import asyncio
+    pages = {
+        ("A", 1): (["1", "2"], 3), ("A", 2): (["3", "4"], None),
+        ("A", 3): (["5"], None), ("A", 4): ([], None),
+    }
+    failures = {("A", 2): 1}
+    fetched = []
+
+    async def fake_fetch(page, spec, page_num, controller, page_size=None):
+        fetched.append((spec, page_num))
+        await asyncio.sleep(0)
+        if failures.get((spec, page_num)):
+            failures[(spec, page_num)] -= 1
+            return None, None
+        ids, total = pages[(spec, page_num)]
+        return [{"program_id": pid} for pid in ids], total
+    monkeypatch.setattr('extract.async_playwright', make_async_playwright)
+    monkeypatch.setattr('extract.fetch_search_page', fake_fetch)
+
+    result = asyncio.run(extract.scrape_specialties(["A"], workers=2))
+    # The count claims 2 pages, but page 3 still has results
+    assert [row["program_id"] for row in result] == ["1", "2", "3", "4", "5"]
+    assert fetched.count(("A", 2)) == 2
+
+
+def test_scrape_specialties_reports_lost_pages(monkeypatch, caplog):
+    import asyncio
+    import logging
+
+    async def fake_fetch(page, spec, page_num, controller, page_size=None):
+        if page_num == 1:
+            return [{"program_id": "1"}], 2
+        return None, None
+    monkeypatch.setattr('extract.async_playwright', make_async_playwright)
+    monkeypatch.setattr('extract.fetch_search_page', fake_fetch)
+    with caplog.at_level(logging.ERROR):
+        result = asyncio.run(extract.scrape_specialties(["A"], workers=1))
+    assert [row["program_id"] for row in result] == ["1"]
+    assert "spec A page 2" in caplog.text
+
+
+def test_parse_search_payload_ignores_facets_and_nested_programs():
+    payload = {
+        'facets': {'state': [{'value': 'CA', 'count': 90}], 'total': 7},
+        'meta': {'count': 2},
+        'results': [
+            {'program_id': '111', 'related': [{'program_id': '999'}]},
+            {'attributes': {'field_program_id': '222'}, 'count': 5},
+        ],
+    }
+    data, total = extract.parse_search_payload(payload)
+    assert data == [{'program_id': '111'}, {'program_id': '222'}]
+    assert total == 2
@@ -0,0 +1,43 @@
+import json
+import http_fetch
+import pytest
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+
+def test_create_session_loads_storage_state_cookies(tmp_path):
+    state_file = tmp_path / "state.json"
+    state_file.write_text(json.dumps({"cookies": [
+        {"name": "SESS", "value": "abc", "domain": ".ama-assn.org", "path": "/"},
+        {"name": "pref", "value": "1", "domain": "freida.ama-assn.org"}]}))
+    session = http_fetch.create_session(str(state_file))
+    assert session.cookies.get("SESS", domain=".ama-assn.org") == "abc"
+    assert session.cookies.get("pref") == "1"
+    assert "Mozilla" in session.headers["User-Agent"]
+
+
+def test_create_session_without_storage_state(tmp_path):
+    session = http_fetch.create_session(str(tmp_path / "missing.json"))
+    assert len(session.cookies) == 0
+
+
+def test_fetch_html_uses_and_revalidates_cache(tmp_path):
+    from unittest.mock import MagicMock
+    from page_cache import PageCache
+    cache = PageCache(str(tmp_path), ttl=0)
+    session = MagicMock()
+    response = session.get.return_value
+    response.status_code = 200
+    response.headers = {'Content-Type': 'text/html; charset=utf-8', 'Last-Modified': 'Mon'}
+    response.content = "<html>é</html>".encode('utf-8')
+    response.text = "<html>é</html>"
+    url = "https://freida.ama-assn.org/program/1"
+    assert http_fetch.fetch_html(session, url, cache=cache) == "<html>é</html>"
+    response.status_code = 304
+    assert http_fetch.fetch_html(session, url, cache=cache) == "<html>é</html>"
+    assert session.get.call_args.kwargs['headers'] == {'If-Modified-Since': 'Mon'}
+    cache.ttl = 3600
+    session.get.reset_mock()
+    assert http_fetch.fetch_html(session, url, cache=cache) == "<html>é</html>"
+    session.get.assert_not_called()
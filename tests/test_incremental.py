@@ -0,0 +1,58 @@
+from unittest.mock import MagicMock
+import requests
+import incremental
+import state_store
+import pytest
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+
+def listing(*pairs):
+    response = MagicMock()
+    response.json.return_value = {'data': [
+        {'type': 'node--program',
+         'attributes': {'field_program_id': pid, 'changed': changed}}
+        for pid, changed in pairs]}
+    return response
+
+
+def test_build_probe_params_filters_ids_and_fields():
+    params = incremental.build_probe_params(["1", "2"])
+    assert ('fields[node--program]', 'field_program_id,changed') in params
+    assert [v for k, v in params if k == 'filter[pid][condition][value][]'] == ["1", "2"]
+    assert ('page[limit]', '2') in params
+
+
+def test_probe_changed_batches_and_skips_failed_batches():
+    session = MagicMock()
+    session.get.side_effect = [
+        listing(("1", "2024-01-01"), ("2", "2024-02-01")),
+        requests.ConnectionError("down"),
+        listing(("5", "2024-05-01")),
+    ]
+    remote = incremental.probe_changed(session, [1, 2, 3, 4, 5], batch_size=2)
+    assert remote == {"1": "2024-01-01", "2": "2024-02-01", "5": "2024-05-01"}
+    assert session.get.call_count == 3
+
+
+def test_select_changed_ids():
+    stored = {"1": "2024-01-01", "2": "2024-01-01", "3": None}
+    remote = {"1": "2024-01-01", "2": "2024-06-01", "3": "2024-01-01", "4": "2024-01-01"}
+    to_scrape, unchanged = incremental.select_changed_ids(
+        ["1", "2", "3", "4", "5"], stored, remote)
+    assert unchanged == ["1"]
+    assert to_scrape == ["2", "3", "4", "5"]
+
+
+def test_plan_refresh_marks_unchanged_programs_checked(tmp_path):
+    store = state_store.StateStore(str(tmp_path / "state.db"))
+    store.upsert_program({"program_id": "1", "data_last_updated": "2024-01-01"})
+    store.upsert_program({"program_id": "2", "data_last_updated": "2024-01-01"})
+    store._conn.execute("UPDATE programs SET checked_at = 0")
+    session = MagicMock()
+    session.get.return_value = listing(("1", "2024-01-01"), ("2", "2024-03-01"))
+    assert incremental.plan_refresh(session, store, ["1", "2", "3"]) == ["2", "3"]
+    checked = dict(store._conn.execute("SELECT program_id, checked_at FROM programs"))
+    assert checked["1"] > 0 and checked["2"] == 0
+    store.close()
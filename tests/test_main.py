@@ -0,0 +1,161 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+import main
+import pandas as pd
+import pytest
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+
+def make_async_playwright():
+    """Builds a fake async_playwright() context manager with a mock browser."""
+    page = MagicMock()
+    context = MagicMock()
+    context.new_page = AsyncMock(return_value=page)
+    context.close = AsyncMock()
+    browser = MagicMock()
+    browser.new_context = AsyncMock(return_value=context)
+    browser.close = AsyncMock()
+    playwright = MagicMock()
+    playwright.chromium.launch = AsyncMock(return_value=browser)
+    manager = MagicMock()
+    manager.__aenter__ = AsyncMock(return_value=playwright)
+    manager.__aexit__ = AsyncMock(return_value=False)
+    return manager, browser
+
+
+class ListSink:
+    """In-memory stand-in for a sinks.RecordSink."""
+
+    def __init__(self):
+        self.rows = []
+
+    def write(self, record):
+        self.rows.append(record)
+
+
+def test_scrape_programs_async_keeps_input_order(monkeypatch):
+    manager, browser = make_async_playwright()
+    monkeypatch.setattr('main.async_playwright', lambda: manager)
+
+    async def fake_extract(page, program_id):
+        # Later IDs finish first to exercise out-of-order completion
+        await asyncio.sleep(0.01 * (5 - int(program_id)))
+        return {"program_id": program_id}
+    monkeypatch.setattr('main.async_extract_program_detail', fake_extract)
+
+    ids = ["1", "2", "3", "4", "5"]
+    sink = ListSink()
+    asyncio.run(main.scrape_programs_async(ids, sink, workers=3, max_rate=0))
+    assert [r["program_id"] for r in sink.rows] == ids
+    assert browser.new_context.call_count == 3
+
+
+def test_scrape_programs_writes_each_record_to_sink(monkeypatch):
+    playwright = MagicMock()
+    manager = MagicMock()
+    manager.__enter__.return_value = playwright
+    monkeypatch.setattr('main.sync_playwright', lambda: manager)
+    monkeypatch.setattr('main.time.sleep', lambda seconds: None)
+    sink = ListSink()
+    main.scrape_programs(
+        ["1", "2"], sink, extract=lambda page, pid: {"program_id": pid})
+    assert sink.rows == [{"program_id": "1"}, {"program_id": "2"}]
+
+
+def test_parse_args_defaults():
+    args = main.parse_args([])
+    assert args.workers == 1
+    assert args.max_rate == pytest.approx(4.0)
+    assert args.format == 'csv'
+    assert args.fsync_every == 25
+
+
+def test_scrape_programs_without_javascript(monkeypatch):
+    playwright = MagicMock()
+    manager = MagicMock()
+    manager.__enter__.return_value = playwright
+    monkeypatch.setattr('main.sync_playwright', lambda: manager)
+    seen = []
+
+    def fake_no_js(page, pid, fallback_page=None):
+        seen.append(callable(fallback_page))
+        return {"program_id": pid}
+    monkeypatch.setattr('main.extract_program_detail_no_js', fake_no_js)
+    sink = ListSink()
+    main.scrape_programs(["1"], sink, javascript=False)
+    browser = playwright.chromium.launch.return_value
+    browser.new_context.assert_called_once_with(java_script_enabled=False)
+    assert sink.rows == [{"program_id": "1"}]
+    assert seen == [True]
+
+
+def test_scrape_programs_parallel_parse_keeps_order_and_falls_back(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    pages = {
+        "1": '<script id="ng-state" type="application/json">{}</script>',
+        "2": "<html></html>",
+        "3": "<html>ok</html>",
+    }
+    monkeypatch.setattr('main.create_session', lambda storage_state: MagicMock())
+    monkeypatch.setattr(
+        'main.fetch_html', lambda session, url, **kwargs: pages[url.rsplit('/', 1)[1]])
+
+    def fake_parse(html, url):
+        if html == "<html></html>":
+            raise main.MissingStateError("Missing ng-state JSON")
+        return {"program_id": url.rsplit('/', 1)[1], "source_url": url}
+    monkeypatch.setattr('main.parse_program_html', fake_parse)
+    monkeypatch.setattr(
+        'main.extract_program_detail', lambda page, pid: {"program_id": pid, "rendered": True})
+    monkeypatch.setattr('main.LazyBrowserPage', lambda blocker, cache: MagicMock())
+    controller = MagicMock()
+    monkeypatch.setattr('main.site_controller', lambda site, max_rate=None: controller)
+    sink = ListSink()
+    main.scrape_programs_parallel_parse(
+        ["1", "2", "3"], sink, parse_workers=2, max_rate=0,
+        executor=ThreadPoolExecutor(max_workers=2))
+    assert [r["program_id"] for r in sink.rows] == ["1", "2", "3"]
+    assert sink.rows[1]["rendered"] is True
+    # Three HTTP fetches plus the browser fallback are all paced
+    assert controller.wait.call_count == 4
+    assert controller.record.call_count == 4
+
+
+@pytest.mark.parametrize('argv', [
+    ['--http', '--no-js'],
+    ['--capture-response', '--parse-workers', '2'],
+    ['--workers', '4', '--no-js'],
+])
+def test_parse_args_rejects_combined_modes(argv, capsys):
+    with pytest.raises(SystemExit):
+        main.parse_args(argv)
+    err = capsys.readouterr().err
+    assert 'not allowed with' in err or 'cannot be combined' in err
+
+
+def test_resume_retries_failed_rows_and_keeps_one_row_per_id(tmp_path, monkeypatch):
+    ids_csv = tmp_path / "ids.csv"
+    ids_csv.write_text("program_id\n111\n222\n")
+    output = tmp_path / "out.csv"
+    with main.open_sink(str(output)) as sink:
+        sink.write({"program_id": "111", "city": "Austin"})
+        sink.write({"program_id": "222", "source_url": "https://freida.ama-assn.org/program/222",
+                    "error": "Timeout 30000ms exceeded"})
+    monkeypatch.setattr(main, 'INPUT_CSV', str(ids_csv))
+    scraped = []
+
+    def fake_scrape(program_ids, sink, **kwargs):
+        for program_id in program_ids:
+            scraped.append(program_id)
+            sink.write({"program_id": program_id, "city": "Boston"})
+    monkeypatch.setattr(main, 'scrape_programs', fake_scrape)
+    monkeypatch.setattr(sys, 'argv', [
+        'main.py', '--resume', '--output', str(output), '--no-block-resources'])
+    main.main()
+    assert scraped == ["222"]
+    rows = pd.read_csv(output, dtype=str)
+    assert rows['program_id'].tolist() == ["111", "222"]
+    assert rows['city'].tolist() == ["Austin", "Boston"]
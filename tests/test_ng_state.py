@@ -0,0 +1,55 @@
+import ng_state
+import bench_ng_state
+import pytest
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+PAGES = [
+    '<html><body><script id="ng-state" type="application/json">{"a": 1}</script></body></html>',
+    "<html><body><script type='application/json' id='ng-state'>{\"b\": 2}</script></body></html>",
+    '<html><head><script src="x.js"></script><script id="other" type="application/json">{}</script>'
+    '</head><body><SCRIPT id=ng-state type=application/json>{"c": "<b>"}</SCRIPT></body></html>',
+    '<html><body><script id="ng-state-extra" type="application/json">{}</script></body></html>',
+    '<html><body><script id="ng-state" type="text/javascript">var x;</script></body></html>',
+    '<html><body><div>No JSON here</div></body></html>',
+]
+
+
+@pytest.mark.parametrize("backend", ng_state.available_backends())
+def test_backends_match_html_parser(backend):
+    for page in PAGES:
+        assert ng_state.find_ng_state_text(page, backend) == \
+            ng_state.find_with_html_parser(page)
+
+
+def test_scan_stops_at_first_match():
+    page = ('<script id="ng-state" type="application/json">{"first": 1}</script>'
+            '<script id="ng-state" type="application/json">{"second": 2}</script>')
+    assert ng_state.find_with_scan(page) == '{"first": 1}'
+
+
+def test_default_backend_is_fastest_available():
+    assert ng_state.get_backend() is ng_state.find_with_scan
+
+
+def test_unavailable_backend_raises(monkeypatch):
+    monkeypatch.setitem(
+        ng_state.BACKENDS, 'lxml', (ng_state.find_with_lxml, False))
+    with pytest.raises(ValueError):
+        ng_state.get_backend('lxml')
+
+
+def test_synthetic_benchmark_page_has_state():
+    page = bench_ng_state.build_synthetic_page(survey_nodes=2, dom_cards=2)
+    assert '"node--program"' in ng_state.find_ng_state_text(page)
+
+
+def test_loads_state_with_and_without_orjson(monkeypatch):
+    text = '{"key": {"b": {"data": [1, 2]}}}'
+    expected = {"key": {"b": {"data": [1, 2]}}}
+    assert ng_state.loads_state(text) == expected
+    monkeypatch.setattr(ng_state, 'orjson', None)
+    assert ng_state.loads_state(text) == expected
+    with pytest.raises(ValueError):
+        ng_state.loads_state('{bad json')
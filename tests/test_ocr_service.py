@@ -0,0 +1,89 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+import ocr_service
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+
+def test_find_academic_year():
+    assert ocr_service.find_academic_year("Year\n2019 - 2020\n2020 - 2021") == "2019 - 2020"
+    assert ocr_service.find_academic_year("no year") is None
+    assert ocr_service.find_academic_year(None) is None
+
+
+def test_ocr_year_from_bytes_reads_in_memory_image():
+    with patch('ocr_service.Image.open', return_value=MagicMock()) as mock_open, \
+            patch('ocr_service.pytesseract.image_to_string', return_value="2011 - 2012"):
+        assert ocr_service.ocr_year_from_bytes(b"png") == "2011 - 2012"
+    assert mock_open.call_args[0][0].read() == b"png"
+
+
+def test_service_collects_first_year_per_program():
+    results = {b"a": None, b"b": "2001 - 2002", b"c": "2005 - 2006"}
+    with patch('ocr_service.ocr_year_from_bytes', side_effect=results.get), \
+            ocr_service.OcrService(executor=ThreadPoolExecutor(2)) as service:
+        service.submit("1", b"a")
+        service.submit("1", b"b")
+        service.submit("2", b"a")
+        service.submit("3", b"c")
+        assert service.pending_count() == 4
+        assert service.has_pending("1") and not service.has_pending("4")
+        drained = service.drain()
+    assert drained == {"1": "2001 - 2002", "2": None, "3": "2005 - 2006"}
+    assert service.pending_count() == 0
+    assert not service.has_pending("1")
+
+
+def test_completed_only_returns_finished_programs():
+    executor = MagicMock()
+    done, running = MagicMock(), MagicMock()
+    done.done.return_value = True
+    done.result.return_value = "2001 - 2002"
+    running.done.return_value = False
+    executor.submit.side_effect = [done, running]
+    service = ocr_service.OcrService(executor=executor)
+    service.submit("1", b"a")
+    service.submit("2", b"b")
+    assert service.completed() == {"1": "2001 - 2002"}
+    assert service.pending_count() == 1
+
+
+def make_png(color=200, size=(20, 10)):
+    import io
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (color, color, color)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def test_preprocess_image_upscales_and_thresholds():
+    from PIL import Image
+    image = Image.new('RGB', (4, 2), (200, 200, 200))
+    image.putpixel((0, 0), (10, 10, 10))
+    result = ocr_service.preprocess_image(image)
+    assert result.mode == 'L'
+    assert result.size == (4 * ocr_service.OCR_SCALE, 2 * ocr_service.OCR_SCALE)
+    assert {value for _, value in result.getcolors()} == {0, 255}
+
+
+def test_text_cache_runs_tesseract_once_per_image():
+    cache = ocr_service.OcrTextCache(maxsize=1)
+    with patch('ocr_service.pytesseract.image_to_string', return_value="2010 - 2011") as mock_ocr:
+        assert cache.year(make_png()) == "2010 - 2011"
+        assert cache.year(make_png()) == "2010 - 2011"
+        assert mock_ocr.call_count == 1
+        cache.year(make_png(color=100))
+        cache.year(make_png())
+    assert mock_ocr.call_count == 3
+    assert (cache.hits, cache.misses, len(cache)) == (1, 3, 1)
+
+
+def test_service_shares_job_for_identical_images():
+    executor = MagicMock()
+    service = ocr_service.OcrService(executor=executor)
+    service.submit("1", b"same")
+    service.submit("1", b"same")
+    service.submit("2", b"other")
+    assert executor.submit.call_count == 2
+    assert service.submitted == 2
@@ -0,0 +1,126 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+import page_cache
+import pytest
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+URL = "https://freida.ama-assn.org/program/1"
+
+
+def make_route(url=URL, resource_type='document', method='GET'):
+    route = MagicMock()
+    route.request.url = url
+    route.request.method = method
+    route.request.resource_type = resource_type
+    route.request.headers = {'accept': 'text/html'}
+    return route
+
+
+def test_put_and_get_round_trip(tmp_path):
+    cache = page_cache.PageCache(str(tmp_path))
+    assert cache.get(URL) is None
+    assert cache.put(URL, 200, {'Content-Type': 'text/html', 'ETag': '"v1"',
+                                'Content-Encoding': 'gzip'}, b"<html>1</html>")
+    entry = page_cache.PageCache(str(tmp_path)).get(URL)
+    assert entry['body'] == b"<html>1</html>"
+    assert entry['headers'] == {'content-type': 'text/html', 'etag': '"v1"'}
+    assert page_cache.PageCache.validators(entry) == {'If-None-Match': '"v1"'}
+
+
+def test_no_store_is_not_cached(tmp_path):
+    cache = page_cache.PageCache(str(tmp_path))
+    assert not cache.put(URL, 200, {'Cache-Control': 'private, no-store'}, b"x")
+    assert cache.get(URL) is None
+
+
+def test_lookup_respects_ttl(tmp_path, monkeypatch):
+    cache = page_cache.PageCache(str(tmp_path), ttl=60)
+    cache.put(URL, 200, {}, b"body")
+    assert cache.lookup(URL)[1] is True
+    now = page_cache.time.time()
+    monkeypatch.setattr(page_cache.time, 'time', lambda: now + 120)
+    entry, fresh = cache.lookup(URL)
+    assert entry['body'] == b"body" and fresh is False
+    assert cache.stats['hits'] == 1 and cache.stats['misses'] == 1
+
+
+def test_evicts_least_recently_used(tmp_path, monkeypatch):
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr(page_cache.time, 'time', lambda: next(clock))
+    cache = page_cache.PageCache(str(tmp_path), max_bytes=10)
+    cache.put(URL + "a", 200, {}, b"aaaa")
+    cache.put(URL + "b", 200, {}, b"bbbb")
+    cache.get(URL + "a")
+    cache.put(URL + "c", 200, {}, b"cccc")
+    assert cache.get(URL + "b") is None
+    assert cache.get(URL + "a") is not None
+    assert cache.total_bytes == 8
+    assert cache.stats['evictions'] == 1
+
+
+def test_route_handler_serves_fresh_entry(tmp_path):
+    cache = page_cache.PageCache(str(tmp_path))
+    cache.put(URL, 200, {'content-type': 'text/html'}, b"cached")
+    route = make_route()
+    cache.handle(route)
+    route.fetch.assert_not_called()
+    route.fulfill.assert_called_once_with(
+        status=200, headers={'content-type': 'text/html'}, body=b"cached")
+
+
+def test_route_handler_fetches_stores_and_revalidates(tmp_path):
+    cache = page_cache.PageCache(str(tmp_path), ttl=0)
+    route = make_route()
+    route.fetch.return_value.status = 200
+    route.fetch.return_value.headers = {'etag': '"v1"'}
+    route.fetch.return_value.body.return_value = b"fresh"
+    cache.handle(route)
+    assert cache.get(URL)['body'] == b"fresh"
+    route.fulfill.assert_called_once_with(response=route.fetch.return_value, body=b"fresh")
+
+    route = make_route()
+    route.fetch.return_value.status = 304
+    cache.handle(route)
+    assert route.fetch.call_args.kwargs['headers']['If-None-Match'] == '"v1"'
+    route.fulfill.assert_called_once_with(status=200, headers={'etag': '"v1"'}, body=b"fresh")
+    assert cache.stats['revalidated'] == 1
+
+
+def test_route_handler_ignores_uncacheable_requests(tmp_path):
+    cache = page_cache.PageCache(str(tmp_path))
+    for route in (make_route(method='POST'), make_route(resource_type='image')):
+        cache.handle(route)
+        route.fallback.assert_called_once()
+        route.fetch.assert_not_called()
+
+
+def test_route_handler_survives_fetch_errors(tmp_path):
+    cache = page_cache.PageCache(str(tmp_path), ttl=0)
+    route = make_route()
+    route.fetch.side_effect = Exception("net::ERR_CONNECTION_RESET")
+    cache.handle(route)
+    route.fallback.assert_called_once()
+    route.fulfill.assert_not_called()
+
+    cache.put(URL, 200, {'content-type': 'text/html'}, b"stale")
+    route = make_route()
+    route.fetch.side_effect = Exception("Timeout 30000ms exceeded")
+    cache.handle(route)
+    route.fallback.assert_not_called()
+    route.fulfill.assert_called_once_with(
+        status=200, headers={'content-type': 'text/html'}, body=b"stale")
+    assert cache.stats['fetch_errors'] == 2
+    assert cache.stats['stale_served'] == 1
+
+
+def test_async_route_handler_falls_back_on_fetch_error(tmp_path):
+    cache = page_cache.PageCache(str(tmp_path))
+    route = make_route()
+    route.fetch = AsyncMock(side_effect=Exception("net::ERR_CONNECTION_RESET"))
+    route.fallback = AsyncMock()
+    route.fulfill = AsyncMock()
+    asyncio.run(cache.handle_async(route))
+    route.fallback.assert_awaited_once()
+    route.fulfill.assert_not_called()
@@ -0,0 +1,78 @@
+import asyncio
+import rate_limiter
+import pytest
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+
+def test_classify_error():
+    assert rate_limiter.classify_error(None) is None
+    assert rate_limiter.classify_error("HTTP 429 Too Many Requests") == 'blocked'
+    assert rate_limiter.classify_error("Timeout 30000ms exceeded.") == 'timeout'
+    assert rate_limiter.classify_error("Missing program title") == 'error'
+
+
+def test_classify_error_ignores_status_digits_inside_ids():
+    assert rate_limiter.classify_error(
+        "404 Client Error: Not Found for url: https://freida.ama-assn.org/program/1403521292"
+    ) == 'error'
+    assert rate_limiter.classify_error(
+        "net::ERR_CONNECTION_RESET at https://freida.ama-assn.org/program/1200429117"
+    ) == 'error'
+    assert rate_limiter.classify_error(
+        "403 Client Error: Forbidden for url: https://freida.ama-assn.org/program/1200403117"
+    ) == 'blocked'
+    assert rate_limiter.classify_error("status=429 at /program/1404291234") == 'blocked'
+
+
+def test_aimd_controller_adjusts_rate():
+    controller = rate_limiter.AIMDRateController(
+        'test', initial_rate=1.0, min_rate=0.2, max_rate=1.5, increase=0.25,
+        decrease=0.5, latency_target=5.0)
+    assert controller.record(1.0) == 'increase'
+    assert controller.rate == pytest.approx(1.25)
+    controller.record(1.0)
+    controller.record(1.0)
+    assert controller.rate == pytest.approx(1.5)
+    assert controller.record(9.0) == 'hold'
+    assert controller.record(1.0, "Missing program title") == 'hold'
+    assert controller.record(1.0, "Timeout 15000ms exceeded") == 'decrease'
+    assert controller.rate == pytest.approx(0.75)
+    for _ in range(5):
+        controller.record(1.0, "403 Forbidden")
+    assert controller.rate == pytest.approx(0.2)
+    assert controller.summary() == {
+        'site': 'test', 'rate': 0.2, 'increase': 3, 'hold': 2, 'decrease': 6}
+
+
+def test_aimd_controller_paces_waits(monkeypatch):
+    now = [100.0]
+    sleeps = []
+    monkeypatch.setattr(rate_limiter.time, 'monotonic', lambda: now[0])
+    monkeypatch.setattr(rate_limiter.time, 'sleep', sleeps.append)
+    controller = rate_limiter.AIMDRateController('test', initial_rate=2.0, max_rate=4.0)
+    controller.wait()
+    controller.wait()
+    assert sleeps == [pytest.approx(0.5)]
+    controller.set_max_rate(0)
+    controller.wait()
+    assert len(sleeps) == 1
+
+
+def test_aimd_controller_async_acquire_shares_rate():
+    controller = rate_limiter.AIMDRateController('test', initial_rate=50, max_rate=50)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.gather(*(controller.acquire() for _ in range(5)))
+        return loop.time() - start
+    assert asyncio.run(run()) >= 0.075
+
+
+def test_site_controller_is_shared_per_site():
+    freida = rate_limiter.site_controller('freida', max_rate=3.0)
+    assert rate_limiter.site_controller('freida') is freida
+    assert freida.max_rate == 3.0
+    assert rate_limiter.site_controller('acgme') is not freida
@@ -0,0 +1,107 @@
+import json
+import resume
+import pytest
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+
+def test_compact_id_set_membership():
+    ids = resume.CompactIdSet(["1405621446", 1400500932, "  42 ", "abc-1", "42"])
+    assert "1405621446" in ids
+    assert 1405621446 in ids
+    assert "1400500932" in ids
+    assert "42" in ids
+    assert "abc-1" in ids
+    assert "43" not in ids
+    assert "abc-2" not in ids
+    assert len(ids) == 4
+
+
+def test_compact_id_set_adds_after_lookup():
+    ids = resume.CompactIdSet([5, 3])
+    assert 3 in ids
+    ids.add(1)
+    assert 1 in ids
+    assert 4 not in ids
+
+
+def test_load_completed_ids_from_csv_jsonl_and_checkpoints(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "out.csv").write_text("program_id,city\n111,A\n222,B\n")
+    (tmp_path / "out.jsonl").write_text(
+        json.dumps({"program_id": "333", "city": "C"}) + "\n" + '{"program_id": "44')
+    (tmp_path / "freida_partial_25.csv").write_text("program_id,city\n555,E\n")
+    completed = resume.load_completed_ids(
+        ["out.csv", "out.jsonl", "missing.csv"])
+    for program_id in ("111", "222", "333", "555"):
+        assert program_id in completed
+    assert "44" not in completed
+    completed = resume.load_completed_ids(
+        ["out.csv"], include_legacy_checkpoints=False)
+    assert "555" not in completed
+
+
+def test_read_program_ids_skips_blanks(tmp_path):
+    path = tmp_path / "ids.csv"
+    path.write_text("program_id\n1\n\n 2 \n")
+    assert list(resume.read_program_ids(str(path))) == ["1", "2"]
+
+
+def test_load_completed_ids_skips_missing_parquet_ids(tmp_path):
+    pytest.importorskip('pyarrow')
+    import pandas as pd
+    path = tmp_path / "out.parquet"
+    pd.DataFrame({
+        'program_id': pd.array(['1', None, '3'], dtype='string'),
+        'city': ['A', 'B', 'C'],
+    }).to_parquet(path)
+    completed = resume.load_completed_ids([str(path)], include_legacy_checkpoints=False)
+    assert len(completed) == 2
+
+
+def test_load_completed_ids_retries_failed_rows(tmp_path):
+    (tmp_path / "out.csv").write_text(
+        "program_id,source_url,city\n"
+        "111,https://freida.ama-assn.org/program/111,Austin\n"
+        "222,https://freida.ama-assn.org/program/222,\n")
+    (tmp_path / "out.jsonl").write_text(
+        json.dumps({"program_id": "333", "source_url": "u", "city": None}) + "\n")
+    completed = resume.load_completed_ids(
+        [str(tmp_path / "out.csv"), str(tmp_path / "out.jsonl")],
+        include_legacy_checkpoints=False)
+    assert "111" in completed
+    assert "222" not in completed
+    assert "333" not in completed
+
+
+def test_compact_output_keeps_last_row_per_id(tmp_path):
+    csv_path = tmp_path / "out.csv"
+    csv_path.write_text(
+        "program_id,city\n111,Austin\n222,\n333,\n222,Boston\n")
+    assert resume.compact_output(str(csv_path)) == 1
+    assert csv_path.read_text().splitlines() == [
+        "program_id,city", "111,Austin", "333,", "222,Boston"]
+    jsonl_path = tmp_path / "out.jsonl"
+    jsonl_path.write_text("".join(json.dumps(row) + "\n" for row in (
+        {"program_id": "1", "city": None}, {"program_id": "1", "city": "C"})))
+    assert resume.compact_output(str(jsonl_path)) == 1
+    assert [json.loads(line) for line in jsonl_path.read_text().splitlines()] == [
+        {"program_id": "1", "city": "C"}]
+    assert resume.compact_output(str(jsonl_path)) == 0
+    assert resume.compact_output(str(tmp_path / "missing.csv")) == 0
+
+
+def test_compact_output_parquet(tmp_path):
+    pytest.importorskip('pyarrow')
+    import sinks
+    path = str(tmp_path / "out.parquet")
+    with sinks.open_sink(path, 'parquet') as sink:
+        sink.write({"program_id": "1", "state": "TX"})
+        sink.write({"program_id": "2", "state": "MA", "pct_img": "12"})
+        sink.write({"program_id": "1", "state": "CA"})
+    assert resume.compact_output(path) == 1
+    df = resume.read_table(path)
+    assert df['program_id'].tolist() == ["2", "1"]
+    assert df['state'].tolist() == ["MA", "CA"]
+    assert df['pct_img'].dtype == 'Float64'
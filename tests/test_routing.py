@@ -0,0 +1,51 @@
+from unittest.mock import MagicMock
+import routing
+import pytest
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+
+def make_route(url, resource_type, top_level=False):
+    route = MagicMock()
+    route.request.url = url
+    route.request.resource_type = resource_type
+    route.request.frame.parent_frame = None if top_level else MagicMock()
+    return route
+
+
+def test_blocks_configured_resource_types():
+    blocker = routing.freida_blocker()
+    route = make_route("https://freida.ama-assn.org/logo.png", "image")
+    blocker.handle(route)
+    route.abort.assert_called_once()
+    route.fallback.assert_not_called()
+    assert blocker.blocked_requests["image"] == 1
+    assert blocker.estimated_bytes_saved == routing.TYPICAL_RESOURCE_BYTES["image"]
+
+
+def test_blocks_third_party_hosts_but_allows_first_party():
+    blocker = routing.freida_blocker()
+    tracker = make_route("https://www.google-analytics.com/collect", "script")
+    app = make_route("https://cdn.freida.ama-assn.org/main.js", "script")
+    blocker.handle(tracker)
+    blocker.handle(app)
+    tracker.abort.assert_called_once()
+    app.fallback.assert_called_once()
+    assert blocker.blocked_requests["third-party"] == 1
+    assert blocker.allowed_requests == 1
+
+
+def test_never_blocks_top_level_document():
+    blocker = routing.ResourceBlocker("x", ("example.org",), ("document",))
+    route = make_route("https://elsewhere.com/", "document", top_level=True)
+    blocker.handle(route)
+    route.fallback.assert_called_once()
+
+
+def test_acgme_keeps_stylesheets():
+    blocker = routing.acgme_blocker()
+    route = make_route("https://apps.acgme.org/site.css", "stylesheet")
+    blocker.handle(route)
+    route.fallback.assert_called_once()
+    assert "blocked 0 of 1 requests" in blocker.summary()
@@ -0,0 +1,63 @@
+import pandas as pd
+import pytest
+import schema
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+
+def test_column_dtypes_cover_expected_fields():
+    assert schema.column_dtype('pct_img') == 'Float64'
+    assert schema.column_dtype('state') == 'category'
+    assert schema.column_dtype('program_id') == 'string'
+    assert schema.TABLE_FIELDS[0] == schema.YEAR_FIELD
+
+
+def test_apply_schema_types_columns():
+    df = pd.DataFrame({
+        'program_id': [1405621446, 1405621447],
+        'state': ['CA', 'CA'],
+        'pct_img': ['12.5', 'n/a'],
+        'visa_statuses_accepted': [['H1', 'J1'], None],
+        'extra': ['x', 'y'],
+    })
+    typed = schema.apply_schema(df)
+    assert str(typed['pct_img'].dtype) == 'Float64'
+    assert typed['pct_img'][0] == pytest.approx(12.5)
+    assert pd.isna(typed['pct_img'][1])
+    assert str(typed['state'].dtype) == 'category'
+    assert typed['program_id'][0] == '1405621446'
+    assert typed['visa_statuses_accepted'][0] == '["H1", "J1"]'
+    assert typed['extra'].dtype == df['extra'].dtype
+
+
+def test_table_paths(tmp_path):
+    csv_path = str(tmp_path / "out.csv")
+    assert schema.table_path(csv_path, 'parquet') == str(tmp_path / "out.parquet")
+    assert schema.existing_table(csv_path) == csv_path
+    (tmp_path / "out.parquet").write_bytes(b"")
+    assert schema.existing_table(csv_path) == str(tmp_path / "out.parquet")
+
+
+def test_csv_round_trip(tmp_path):
+    path = str(tmp_path / "out.csv")
+    schema.write_table(pd.DataFrame({'program_id': ['1'], 'city': [None]}), path)
+    assert list(schema.iter_table_records(path)) == [{'program_id': '1', 'city': None}]
+
+
+def test_parquet_round_trip(tmp_path):
+    pytest.importorskip('pyarrow')
+    path = str(tmp_path / "out.parquet")
+    df = pd.DataFrame({
+        'program_id': ['1', '2'],
+        'state': ['CA', 'NY'],
+        'first_year_positions': ['4', None],
+    })
+    schema.write_table(df, path)
+    loaded = schema.read_table(path)
+    assert str(loaded['state'].dtype) == 'category'
+    assert loaded['first_year_positions'].dtype.kind == 'f'
+    assert list(schema.iter_table_records(path)) == [
+        {'program_id': '1', 'state': 'CA', 'first_year_positions': '4'},
+        {'program_id': '2', 'state': 'NY', 'first_year_positions': None},
+    ]
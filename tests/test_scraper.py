@@ -253,3 +253,176 @@ def test_extract_program_detail_missing_ng_state(monkeypatch):
         assert isinstance(e, ValueError)
     else:
         assert "error" in result or result["program_id"] == "00000"
+
+
+def minimal_program_html(program_id="55555"):
+    state = {"key": {"b": {"data": [{
+        "type": "node--program",
+        "attributes": {"field_program_id": program_id, "title": "HTTP Program"},
+        "relationships": {}}], "included": []}}}
+    return '<html><body><script id="ng-state" type="application/json">' + \
+        json.dumps(state) + '</script></body></html>'
+
+
+def test_fetch_program_detail_http_parses_ng_state(monkeypatch):
+    monkeypatch.setattr(
+        'scraper.fetch_html', lambda session, url, **kwargs: minimal_program_html())
+    fallback = MagicMock()
+    result = scraper.fetch_program_detail(MagicMock(), "55555", fallback)
+    assert result["program_id"] == "55555"
+    assert result["program_name_suffix"] == "HTTP Program"
+    fallback.assert_not_called()
+
+
+def test_fetch_program_detail_falls_back_to_browser(monkeypatch):
+    monkeypatch.setattr(
+        'scraper.fetch_html', lambda session, url, **kwargs: '<html></html>')
+    page = MagicMock()
+    page.content.return_value = minimal_program_html("44444")
+    result = scraper.fetch_program_detail(MagicMock(), "44444", lambda: page)
+    assert result["program_id"] == "44444"
+    page.goto.assert_called_once()
+
+
+def test_fetch_program_detail_without_fallback_returns_error(monkeypatch):
+    monkeypatch.setattr(
+        'scraper.fetch_html', lambda session, url, **kwargs: '<html></html>')
+    result = scraper.fetch_program_detail(MagicMock(), "33333")
+    assert result["program_id"] == "33333"
+    assert "ng-state" in result["error"]
+
+
+def make_api_response(payload):
+    response = MagicMock()
+    response.ok = True
+    response.request.resource_type = "fetch"
+    response.url = "https://freida.ama-assn.org/jsonapi/node/program?filter=1"
+    response.json.return_value = payload
+    return response
+
+
+def test_extract_program_detail_from_api_response():
+    page = MagicMock()
+    api_payload = {"data": {
+        "type": "node--program",
+        "attributes": {"field_program_id": "22222", "title": "API Program"},
+        "relationships": {}}, "included": []}
+    handlers = []
+    page.on.side_effect = lambda event, handler: handlers.append(handler)
+
+    def fake_goto(url, wait_until=None):
+        for handler in handlers:
+            handler(make_api_response(api_payload))
+        return MagicMock()
+    page.goto.side_effect = fake_goto
+    result = scraper.extract_program_detail_from_response(page, "22222")
+    assert result["program_name_suffix"] == "API Program"
+    page.content.assert_not_called()
+    page.remove_listener.assert_called_once()
+
+
+def test_extract_program_detail_from_document_response():
+    page = MagicMock()
+    document = MagicMock()
+    document.text.return_value = minimal_program_html("11111")
+    page.goto.return_value = document
+    result = scraper.extract_program_detail_from_response(page, "11111")
+    assert result["program_id"] == "11111"
+    page.content.assert_not_called()
+    page.wait_for_event.assert_not_called()
+
+
+def test_extract_program_detail_from_response_waits_for_api_call():
+    page = MagicMock()
+    document = MagicMock()
+    document.text.return_value = "<html></html>"
+    page.goto.return_value = document
+    page.wait_for_event.return_value = make_api_response({"data": [{
+        "type": "node--program",
+        "attributes": {"field_program_id": "12121"}}]})
+    result = scraper.extract_program_detail_from_response(page, "12121")
+    assert result["program_id"] == "12121"
+    page.wait_for_event.assert_called_once()
+
+
+def test_find_program_payload_skips_unrelated_entries():
+    program = {"type": "node--program", "attributes": {}}
+    state = {
+        "a": "not a dict",
+        "b": {"b": "no api data"},
+        "c": {"b": {"data": [{"type": "taxonomy_term"}]}},
+        "d": {"b": {"data": [{"type": "node--survey"}, program], "included": []}},
+    }
+    api_data, node = scraper.find_program_payload(state)
+    assert node is program
+    assert api_data is state["d"]["b"]
+    assert scraper.find_program_payload({"x": {"b": {"data": []}}}) == (None, None)
+
+
+def test_parse_program_html_keeps_raw_state_text_in_debug(monkeypatch):
+    monkeypatch.setattr('scraper.DEBUG_MODE', True)
+    html = minimal_program_html("66666")
+    result = scraper.parse_program_html(html, "https://example/program/66666")
+    assert result["raw_ng_state_json"] in html
+    monkeypatch.setattr('scraper.DEBUG_MODE', False)
+    result = scraper.parse_program_html(html, "https://example/program/66666")
+    assert result["raw_ng_state_json"] is None
+
+
+def test_extract_program_detail_no_js_reads_raw_document():
+    page = MagicMock()
+    page.goto.return_value.text.return_value = minimal_program_html("22222")
+    fallback = MagicMock()
+    result = scraper.extract_program_detail_no_js(page, "22222", fallback)
+    assert result["program_id"] == "22222"
+    page.wait_for_selector.assert_not_called()
+    fallback.assert_not_called()
+
+
+def test_extract_program_detail_no_js_falls_back_to_full_render():
+    page = MagicMock()
+    page.goto.return_value.text.return_value = '<html></html>'
+    render_page = MagicMock()
+    render_page.content.return_value = minimal_program_html("66666")
+    result = scraper.extract_program_detail_no_js(page, "66666", lambda: render_page)
+    assert result["program_id"] == "66666"
+    render_page.wait_for_selector.assert_called_once()
+
+
+def test_extract_program_detail_from_response_ignores_other_programs():
+    page = MagicMock()
+    handlers = []
+    page.on.side_effect = lambda event, handler: handlers.append(handler)
+    other = make_api_response({"data": [{
+        "type": "node--program", "attributes": {"field_program_id": "99999"}}]})
+    own = make_api_response({"data": [{
+        "type": "node--program", "attributes": {"field_program_id": "12121"}}]})
+
+    def fake_goto(url, wait_until=None):
+        for handler in handlers:
+            handler(other)
+        document = MagicMock()
+        document.text.return_value = "<html></html>"
+        return document
+    page.goto.side_effect = fake_goto
+    page.wait_for_event.side_effect = [other, own]
+    result = scraper.extract_program_detail_from_response(page, "12121")
+    assert result["program_id"] == "12121"
+    assert page.wait_for_event.call_count == 2
+
+
+def test_extract_program_detail_from_response_sees_api_call_during_document_parse():
+    page = MagicMock()
+    handlers = []
+    page.on.side_effect = lambda event, handler: handlers.append(handler)
+    own = make_api_response({"data": [{
+        "type": "node--program", "attributes": {"field_program_id": "12121"}}]})
+
+    def fake_text():
+        for handler in handlers:
+            handler(own)
+        return "<html></html>"
+    page.goto.return_value.text.side_effect = fake_text
+    result = scraper.extract_program_detail_from_response(page, "12121")
+    assert result["program_id"] == "12121"
+    page.wait_for_event.assert_not_called()
@@ -0,0 +1,78 @@
+import csv
+import json
+from unittest.mock import patch
+import sinks
+import pytest
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+
+def test_csv_sink_writes_header_once_and_expected_columns(tmp_path):
+    path = tmp_path / "out.csv"
+    with sinks.CsvSink(str(path)) as sink:
+        sink.write({"program_id": "1", "city": "A", "error": "ignored"})
+    with sinks.CsvSink(str(path), append=True) as sink:
+        sink.write({"program_id": "2"})
+    with open(path, newline="", encoding="utf-8") as file_obj:
+        rows = list(csv.DictReader(file_obj))
+    assert [row["program_id"] for row in rows] == ["1", "2"]
+    assert list(rows[0].keys()) == sinks.EXPECTED_FIELDS
+    assert rows[0]["city"] == "A"
+    assert rows[1]["city"] == ""
+
+
+def test_jsonl_sink_writes_one_object_per_line(tmp_path):
+    path = tmp_path / "out.jsonl"
+    with sinks.open_sink(str(path), 'jsonl', fields=["program_id", "state"]) as sink:
+        sink.write({"program_id": "1", "state": "TX"})
+        sink.write({"program_id": "2"})
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"program_id": "1", "state": "TX"}, {"program_id": "2", "state": None}]
+
+
+def test_sink_fsyncs_at_interval_and_bounds_window(tmp_path):
+    with patch('sinks.os.fsync') as mock_fsync:
+        sink = sinks.CsvSink(str(tmp_path / "out.csv"), fsync_every=2, window=3)
+        for n in range(5):
+            sink.write({"program_id": str(n)})
+        assert mock_fsync.call_count == 2
+        sink.close()
+        assert mock_fsync.call_count == 3
+    assert sink.count == 5
+    assert [row["program_id"] for row in sink.recent] == ["2", "3", "4"]
+
+
+def test_parquet_sink_writes_typed_columns_and_appends(tmp_path):
+    pytest.importorskip('pyarrow')
+    import pandas as pd
+    path = str(tmp_path / "out.parquet")
+    with sinks.open_sink(path, 'parquet') as sink:
+        sink.write({"program_id": "1", "state": "TX", "pct_img": "7.5"})
+    assert not os.path.exists(path + ".tmp")
+    with sinks.ParquetSink(path, append=True) as sink:
+        sink.write({"program_id": "2", "state": "TX"})
+    df = pd.read_parquet(path)
+    assert list(df.columns) == sinks.EXPECTED_FIELDS
+    assert list(df["program_id"]) == ["1", "2"]
+    assert str(df["state"].dtype) == "category"
+    assert df["pct_img"][0] == pytest.approx(7.5)
+
+
+def test_parquet_sink_parts_survive_interruption(tmp_path):
+    pytest.importorskip('pyarrow')
+    import resume
+    path = str(tmp_path / "out.parquet")
+    sink = sinks.ParquetSink(path, fsync_every=2)
+    for n in range(5):
+        sink.write({"program_id": str(n), "city": "A"})
+    # Simulate a crash: the sink is never closed
+    assert len(sinks.parquet_part_files(path)) == 2
+    completed = resume.load_completed_ids([path], include_legacy_checkpoints=False)
+    assert len(completed) == 4
+    with sinks.ParquetSink(path, append=True) as sink:
+        sink.write({"program_id": "9", "city": "B"})
+    import pandas as pd
+    assert list(pd.read_parquet(path)["program_id"]) == ["0", "1", "2", "3", "9"]
+    assert not os.path.exists(path + ".parts")
@@ -0,0 +1,128 @@
+import csv
+import state_store
+import pytest
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8") as file_obj:
+        return list(csv.DictReader(file_obj))
+
+
+def test_upsert_and_acgme_status(tmp_path):
+    with state_store.StateStore(str(tmp_path / "state.db")) as store:
+        store.write({"program_id": "1", "city": "A"})
+        store.write({"program_id": 2, "error": "timeout"})
+        store.upsert_program({"program_id": "1", "city": "B"})
+        assert store.count == 2
+        assert store.counts() == {'total': 2, 'pending': 2, 'done': 0, 'failed': 0}
+
+        store.set_acgme_result("1", "2001 - 2002")
+        store.set_acgme_result("2.0", None)
+        assert store.acgme_ids(('done',)) == ["1"]
+        assert store.acgme_ids(('failed',)) == ["2"]
+        # A later failed attempt does not lose an already found year
+        store.set_acgme_result("1", "")
+        assert store.acgme_ids(('done',)) == ["1"]
+        assert store.acgme_ids(('pending', 'failed'), ["2", "3"]) == ["2"]
+
+
+def test_journal_mode_is_wal(tmp_path):
+    store = state_store.StateStore(str(tmp_path / "state.db"))
+    mode = store._conn.execute("PRAGMA journal_mode").fetchone()[0]
+    store.close()
+    assert mode == "wal"
+
+
+def test_import_and_export_round_trip(tmp_path):
+    source = tmp_path / "with_year.csv"
+    source.write_text(
+        "acgme_first_academic_year,program_id,city\n"
+        "1999 - 2000,111,Austin\n"
+        ",222,Boston\n")
+    outputs = {name: str(tmp_path / f"{name}.csv")
+               for name in ("output", "with_year", "success", "failed")}
+    with state_store.StateStore(str(tmp_path / "state.db")) as store:
+        assert store.import_csv(str(source)) == 2
+        store.set_acgme_result("222", "2010 - 2011")
+        store.upsert_program({"program_id": "333", "city": "Chicago"})
+        written = store.export(
+            outputs["output"], outputs["with_year"], outputs["success"], outputs["failed"])
+    assert written[outputs["with_year"]] == 3
+    output_rows = read_csv(outputs["output"])
+    assert list(output_rows[0].keys()) == state_store.EXPECTED_FIELDS
+    assert [row["city"] for row in output_rows] == ["Austin", "Boston", "Chicago"]
+    success = read_csv(outputs["success"])
+    assert [(r["program_id"], r["acgme_first_academic_year"]) for r in success] == [
+        ("111", "1999 - 2000"), ("222", "2010 - 2011")]
+    assert [r["program_id"] for r in read_csv(outputs["failed"])] == ["333"]
+
+
+def test_normalize_program_id():
+    assert state_store.normalize_program_id(1405621446) == "1405621446"
+    assert state_store.normalize_program_id(1405621446.0) == "1405621446"
+    assert state_store.normalize_program_id(" abc ") == "abc"
+
+
+def test_upsert_tracks_changed_and_fingerprint(tmp_path):
+    store = state_store.StateStore(str(tmp_path / "state.db"))
+    record = {"program_id": "1", "city": "A", "data_last_updated": "2024-01-01"}
+    assert store.upsert_program(record) is True
+    assert store.upsert_program(dict(record, raw_ng_state_json="{}")) is False
+    assert store.upsert_program(dict(record, city="B")) is True
+    store.upsert_program({"program_id": "2", "error": "boom"})
+    assert store.changed_values() == {"1": "2024-01-01"}
+    store.write(dict(record, city="B"))
+    assert (store.count, store.content_changes) == (1, 0)
+    store.close()
+
+
+def test_opening_old_database_adds_columns(tmp_path):
+    import sqlite3
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        "CREATE TABLE programs (program_id TEXT PRIMARY KEY, record TEXT NOT NULL,"
+        " freida_status TEXT NOT NULL DEFAULT 'done', freida_error TEXT,"
+        " acgme_status TEXT NOT NULL DEFAULT 'pending', acgme_first_academic_year TEXT,"
+        " acgme_attempts INTEGER NOT NULL DEFAULT 0, updated_at REAL NOT NULL);")
+    conn.close()
+    store = state_store.StateStore(path)
+    store.upsert_program({"program_id": "1", "data_last_updated": "2024-01-01"})
+    assert store.changed_values() == {"1": "2024-01-01"}
+    store.close()
+
+
+def test_parquet_export_and_import(tmp_path):
+    pytest.importorskip('pyarrow')
+    import pandas as pd
+    parquet_path = str(tmp_path / "with_year.parquet")
+    with state_store.StateStore(str(tmp_path / "state.db")) as store:
+        store.upsert_program({"program_id": "111", "state": "TX", "pct_do": "5"})
+        store.set_acgme_result("111", "1999 - 2000")
+        written = store.export(None, parquet_path, None, None)
+    assert written == {parquet_path: 1}
+    df = pd.read_parquet(parquet_path)
+    assert str(df["state"].dtype) == "category"
+    assert df["pct_do"][0] == pytest.approx(5.0)
+    with state_store.StateStore(str(tmp_path / "copy.db")) as store:
+        assert store.import_csv(parquet_path) == 1
+        assert store.counts()['done'] == 1
+
+
+def test_error_upsert_keeps_good_record(tmp_path):
+    output = str(tmp_path / "output.csv")
+    with state_store.StateStore(str(tmp_path / "state.db")) as store:
+        record = {"program_id": "1", "city": "Austin", "data_last_updated": "2024-01-01"}
+        store.upsert_program(record)
+        assert store.upsert_program(
+            {"program_id": "1", "source_url": "u", "error": "timeout"}) is False
+        status, error = store._conn.execute(
+            "SELECT freida_status, freida_error FROM programs").fetchone()
+        assert (status, error) == ("error", "timeout")
+        assert store.upsert_program(record) is False
+        store.upsert_program({"program_id": "1", "error": "timeout"})
+        store.export(output, None, None, None)
+    assert [row["city"] for row in read_csv(output)] == ["Austin"]
@@ -71,3 +71,33 @@ def test_extract_contact_details_no_data():
     for suffix in [
             'first_name', 'last_name', 'degrees', 'address', 'email', 'phone']:
         assert extracted[f"contact_{suffix}"] is None
+
+
+def test_included_index_lookup():
+    included = [
+        {"type": "person", "id": "1", "foo": "first"},
+        {"type": "person", "id": "1", "foo": "duplicate"},
+        {"type": "org", "id": "1"},
+        "not-a-node",
+    ]
+    index = utils.IncludedIndex(included)
+    assert len(index) == 2
+    assert index.get("person", "1")["foo"] == "first"
+    assert index.get("org", "1") == {"type": "org", "id": "1"}
+    assert index.get("org", "2") is None
+    assert index.get(None, "1") is None
+
+
+def test_find_included_node_accepts_index():
+    index = utils.IncludedIndex([{"type": "person", "id": "1", "foo": "bar"}])
+    assert utils.find_included_node("person", "1", index)["foo"] == "bar"
+
+
+def test_extract_contact_details_with_index():
+    survey_rels = {"contact": {"data": {"type": "person", "id": "1"}}}
+    index = utils.IncludedIndex([{"type": "person", "id": "1", "attributes": {
+        "field_first_name": "A", "field_address": None}}])
+    extracted = {}
+    utils.extract_contact_details("contact", survey_rels, index, extracted)
+    assert extracted["contact_first_name"] == "A"
+    assert extracted["contact_address"] is None
@@ -5,14 +5,39 @@ Utility functions for extracting nodes and contact details from FREIDA JSON stru
 """
 
 
+class IncludedIndex:
+    """
+    Lookup table over a JSON:API `included` list, keyed by (type, id).
+    Build it once per payload and pass it wherever an included list is expected.
+    """
+
+    def __init__(self, included_list):
+        self._nodes = {}
+        for node in included_list or []:
+            if isinstance(node, dict):
+                # Keep the first occurrence, matching a linear scan
+                self._nodes.setdefault((node.get('type'), node.get('id')), node)
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def get(self, type_name, node_id):
+        """
+        Returns the node with the given type and id, or None.
+        """
+        if not type_name or not node_id:
+            return None
+        return self._nodes.get((type_name, node_id))
+
+
 def find_included_node(type_name, node_id, included_list):
     """
     Finds and returns a node from included_list matching the given type and id.
+    included_list may be a plain list or a prebuilt IncludedIndex.
     """
-    for node in included_list:
-        if node.get('type') == type_name and node.get('id') == node_id:
-            return node
-    return None
+    if not isinstance(included_list, IncludedIndex):
+        included_list = IncludedIndex(included_list)
+    return included_list.get(type_name, node_id)
 
 
 def extract_contact_details(
@@ -22,6 +47,7 @@ def extract_contact_details(
         extracted_data):
     """
     Extracts contact details for a given ref_key from survey relationships and updates extracted_data dict.
+    included_nodes may be a plain list or a prebuilt IncludedIndex.
     """
     ref = survey_rels.get(ref_key, {}).get('data', {})
     if isinstance(ref, dict):